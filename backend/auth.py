@@ -1,21 +1,43 @@
 """
 Sistema de Autenticación JWT
 """
+import time
 from datetime import datetime, timedelta
 from typing import Optional
-import sqlite3
 from sqlite3 import IntegrityError
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from bounded_executor import BoundedExecutor, ExecutorSaturadoError
+from cache import TTLCache
 from config import settings
+from connection_pool import pool
+from database_service import db_service, async_db_service
 
 # Configuración de seguridad
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+# EventSource y los enlaces de descarga no pueden enviar cabeceras: aceptan
+# ?token= con un token temporal limitado a ese uso (ver create_stream_token)
+security_opcional = HTTPBearer(auto_error=False)
+
+# Usuarios activos ya autenticados, por username. Los cambios hechos desde otro
+# proceso (p. ej. update_admin_password.py) se ven en el servidor al expirar el TTL.
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+
+# bcrypt consume ~100-300 ms de CPU por operación: se ejecuta en hilos propios
+# para no bloquear el event loop ni los hilos de la base de datos
+password_hasher = BoundedExecutor(
+    "bcrypt",
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -28,6 +50,18 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def run_password_hashing(func, *args):
+    """Ejecuta una operación bcrypt en el pool dedicado, con back-pressure"""
+    try:
+        return await password_hasher.run(func, *args)
+    except ExecutorSaturadoError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiadas solicitudes de autenticación, intenta de nuevo",
+            headers={"Retry-After": "1"},
+        )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crea un token JWT"""
     to_encode = data.copy()
@@ -36,11 +70,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # iat: permite revocar las sesiones anteriores a usuarios.sesiones_desde
+    to_encode.update({"exp": expire, "iat": int(time.time())})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
+def create_stream_token(username: str, uso: str) -> str:
+    """Token de STREAM_TOKEN_EXPIRE_SECONDS que solo vale en la query de `uso`.
+    
+    La URL queda en el historial, el Referer y los logs del proxy: ahí no va
+    el token de sesión, que vale 24 horas para toda la API.
+    """
+    return create_access_token(
+        data={"sub": username, "uso": uso},
+        expires_delta=timedelta(seconds=settings.STREAM_TOKEN_EXPIRE_SECONDS),
+    )
+
+
 def verify_token(token: str) -> dict:
     """Verifica y decodifica un token JWT"""
     try:
@@ -61,60 +108,141 @@ def verify_token(token: str) -> dict:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Obtiene el usuario actual desde el token"""
-    token = credentials.credentials
+    return await _usuario_desde_token(credentials.credentials)
+
+
+def get_current_user_stream(uso: str):
+    """Dependencia como get_current_user; sin cabecera acepta ?token= temporal de `uso`"""
+    async def dependencia(
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_opcional),
+        token: Optional[str] = Query(None),
+    ):
+        if credentials is not None:
+            return await _usuario_desde_token(credentials.credentials)
+        if not token:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+        return await _usuario_desde_token(token, uso)
+    
+    return dependencia
+
+
+async def _usuario_desde_token(token: str, uso: Optional[str] = None) -> dict:
     payload = verify_token(token)
     username = payload.get("sub")
     
-    conn = sqlite3.connect(settings.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM usuarios WHERE username = ? AND activo = 1", (username,))
-    user = cursor.fetchone()
-    conn.close()
+    # El token de sesión no entra por la query y el temporal no sirve como sesión
+    if payload.get("uso") != uso:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token no válido para esta operación"
+        )
     
+    user = user_cache.get(username)
     if user is None:
+        user = await async_db_service.get_usuario_activo(username)
+        
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Usuario no encontrado"
+            )
+        
+        # El hash de la contraseña no se queda en memoria
+        user = {k: v for k, v in user.items() if k != "password_hash"}
+        # La entrada nunca sobrevive al token que la originó
+        restante = payload["exp"] - time.time() if "exp" in payload else settings.USER_CACHE_TTL_SECONDS
+        user_cache.set(username, user, ttl=min(settings.USER_CACHE_TTL_SECONDS, restante))
+    
+    if user.get("sesiones_desde") and payload.get("iat", 0) < user["sesiones_desde"]:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuario no encontrado"
+            detail="Sesión revocada, inicia sesión de nuevo"
         )
-    
     return dict(user)
 
 
+def invalidate_user_cache(username: str):
+    """Descarta el usuario de la caché tras cambios de contraseña, rol o estado"""
+    user_cache.invalidate(username)
+
+
 def authenticate_user(username: str, password: Optional[str]):
     """Autentica un usuario con verificación opcional de contraseña"""
-    conn = sqlite3.connect(settings.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM usuarios WHERE username = ? AND activo = 1", (username,))
-    user = cursor.fetchone()
-    conn.close()
+    user = db_service.get_usuario_activo(username)
     
     if not user:
         return False
     
     if password is None:
         # Permite autenticación sin contraseña (ej. WebAuthn)
-        return dict(user)
+        return user
     
     if not verify_password(password, user["password_hash"]):
         return False
     
-    return dict(user)
+    return user
+
+
+async def authenticate_user_async(username: str, password: str):
+    """Como authenticate_user, sin bloquear el event loop"""
+    user = await async_db_service.get_usuario_activo(username)
+    
+    if not user:
+        return False
+    
+    if not await run_password_hashing(verify_password, password, user["password_hash"]):
+        return False
+    
+    return user
 
 
 def users_exist() -> bool:
     """Verifica si existen usuarios registrados"""
-    conn = sqlite3.connect(settings.DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM usuarios")
-    count = cursor.fetchone()[0]
-    conn.close()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM usuarios")
+        count = cursor.fetchone()[0]
     return count > 0
 
 
+def _insert_user(
+    username: str,
+    password_hash: str,
+    nombre_completo: str,
+    email: Optional[str],
+    rol: str,
+    activo: bool,
+):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                INSERT INTO usuarios (username, password_hash, nombre_completo, email, rol, activo)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    username,
+                    password_hash,
+                    nombre_completo,
+                    email,
+                    rol,
+                    1 if activo else 0,
+                ),
+            )
+            conn.commit()
+            invalidate_user_cache(username)
+            user_id = cursor.lastrowid
+            cursor.execute("SELECT * FROM usuarios WHERE id = ?", (user_id,))
+            user = cursor.fetchone()
+            return dict(user)
+        except IntegrityError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El nombre de usuario ya está en uso",
+            )
+
+
 def create_user(
     username: str,
     password: str,
@@ -124,35 +252,21 @@ def create_user(
     activo: bool = True,
 ):
     """Crea un usuario nuevo"""
-    conn = sqlite3.connect(settings.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     password_hash = get_password_hash(password)
-    
-    try:
-        cursor.execute(
-            """
-            INSERT INTO usuarios (username, password_hash, nombre_completo, email, rol, activo)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                username,
-                password_hash,
-                nombre_completo,
-                email,
-                rol,
-                1 if activo else 0,
-            ),
-        )
-        conn.commit()
-        user_id = cursor.lastrowid
-        cursor.execute("SELECT * FROM usuarios WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
-        return dict(user)
-    except IntegrityError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El nombre de usuario ya está en uso",
-        )
-    finally:
-        conn.close()
+    return _insert_user(username, password_hash, nombre_completo, email, rol, activo)
+
+
+async def create_user_async(
+    username: str,
+    password: str,
+    nombre_completo: str,
+    email: Optional[str] = None,
+    rol: str = "superadmin",
+    activo: bool = True,
+):
+    """Como create_user, con el hash calculado en el pool de bcrypt"""
+    password_hash = await run_password_hashing(get_password_hash, password)
+    return await async_db_service.run(
+        _insert_user, username, password_hash, nombre_completo, email, rol, activo
+    )
+
@@ -0,0 +1,65 @@
+"""
+Microbenchmark del calendario laboral.
+
+Compara el conteo de días laborables día por día (el bucle que usaba
+`/api/notificaciones/automaticas`) contra el índice acumulado de
+`calendario`, para rangos de distintas longitudes. El bucle no conoce los
+feriados, así que solo se compara tiempo, no resultado.
+
+Uso:
+    python benchmark_calendario.py
+    python benchmark_calendario.py --repeticiones 20000
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from calendario import calendario
+
+
+def contar_dias_laborables_bucle(fecha_inicio, fecha_fin):
+    dias_laborables = 0
+    fecha_actual = fecha_inicio
+    while fecha_actual <= fecha_fin:
+        if fecha_actual.weekday() < 5:  # 0-4 = Lunes a Viernes
+            dias_laborables += 1
+        fecha_actual += timedelta(days=1)
+    return dias_laborables
+
+
+def medir(func, rangos):
+    inicio = time.perf_counter()
+    for fecha_inicio, fecha_fin in rangos:
+        func(fecha_inicio, fecha_fin)
+    return (time.perf_counter() - inicio) / len(rangos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de conteo de días laborables")
+    parser.add_argument("--repeticiones", type=int, default=5000)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(args.semilla)
+    hoy = date.today()
+    # Construir los índices antes de medir (se hace una vez por año)
+    calendario.contar(hoy - timedelta(days=3 * 365), hoy)
+
+    print(f"{'rango':>10} {'bucle':>12} {'calendario':>12} {'aceleración':>12}")
+    for dias in (7, 30, 90, 365, 3 * 365):
+        rangos = [
+            (hoy - timedelta(days=dias + aleatorio.randint(0, 30)), hoy)
+            for _ in range(args.repeticiones)
+        ]
+        bucle = medir(contar_dias_laborables_bucle, rangos)
+        indice = medir(calendario.contar, rangos)
+        print(
+            f"{dias:>6} días {bucle * 1e6:>9.2f} µs {indice * 1e6:>9.2f} µs "
+            f"{bucle / indice:>11.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
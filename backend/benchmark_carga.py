@@ -0,0 +1,169 @@
+"""
+Benchmark de carga contra un servidor en ejecución.
+
+Mide throughput y latencias de `/api/clientes` y
+`/api/licencias/verify/{key}` con N peticiones concurrentes. Para comparar
+dos versiones (por ejemplo antes/después de la capa asíncrona) se ejecuta
+contra cada servidor con los mismos parámetros.
+
+El escenario `login` mide la latencia de `/api/licencias/verify` mientras
+una ráfaga de inicios de sesión concurrentes ejercita bcrypt.
+
+Uso:
+    python benchmark_carga.py --url http://localhost:8000 --password admin123
+    python benchmark_carga.py --concurrencia 100 --peticiones 5000 --escenario verify
+    python benchmark_carga.py --escenario login --logins 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+async def obtener_token(session, url, username, password):
+    async with session.post(
+        f"{url}/api/auth/login", json={"username": username, "password": password}
+    ) as resp:
+        resp.raise_for_status()
+        return (await resp.json())["access_token"]
+
+
+async def obtener_licencia(session, url, headers):
+    async with session.get(f"{url}/api/clientes", headers=headers) as resp:
+        resp.raise_for_status()
+        clientes = await resp.json()
+    if clientes:
+        return clientes[0]["licencia_key"]
+    return "AS-0000000000000000"
+
+
+async def ejecutar(session, nombre, url_objetivo, headers, peticiones, concurrencia):
+    """Lanza `peticiones` GET con `concurrencia` clientes simultáneos"""
+    latencias = []
+    errores = 0
+    pendientes = iter(range(peticiones))
+
+    async def trabajador():
+        nonlocal errores
+        for _ in pendientes:
+            inicio = time.perf_counter()
+            try:
+                async with session.get(url_objetivo, headers=headers) as resp:
+                    await resp.read()
+                    if resp.status != 200:
+                        errores += 1
+            except aiohttp.ClientError:
+                errores += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+
+    return {
+        "escenario": nombre,
+        "peticiones": peticiones,
+        "errores": errores,
+        "duracion_s": duracion,
+        "req_s": peticiones / duracion if duracion else 0.0,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p95_ms": percentil(latencias, 95) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "media_ms": statistics.fmean(latencias) * 1000 if latencias else 0.0,
+    }
+
+
+async def rafaga_logins(url, username, password, cantidad):
+    """Lanza `cantidad` inicios de sesión simultáneos; devuelve {status: conteo}"""
+    async def login(session):
+        try:
+            async with session.post(
+                f"{url}/api/auth/login", json={"username": username, "password": password}
+            ) as resp:
+                await resp.read()
+                return resp.status
+        except aiohttp.ClientError:
+            return "error"
+
+    # Sesión propia para no competir por el límite de conexiones del escenario
+    conteo = {}
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=cantidad)) as session:
+        for codigo in await asyncio.gather(*(login(session) for _ in range(cantidad))):
+            conteo[codigo] = conteo.get(codigo, 0) + 1
+    return conteo
+
+
+def imprimir(resultado):
+    print(
+        f"{resultado['escenario']:<10} {resultado['peticiones']:>7} req  "
+        f"{resultado['req_s']:>9.1f} req/s  "
+        f"p50 {resultado['p50_ms']:>7.2f} ms  "
+        f"p95 {resultado['p95_ms']:>7.2f} ms  "
+        f"p99 {resultado['p99_ms']:>7.2f} ms  "
+        f"errores {resultado['errores']}"
+    )
+
+
+async def main_async(args):
+    limite = aiohttp.TCPConnector(limit=args.concurrencia)
+    async with aiohttp.ClientSession(connector=limite) as session:
+        token = await obtener_token(session, args.url, args.username, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+        licencia = args.licencia or await obtener_licencia(session, args.url, headers)
+
+        escenarios = {
+            "clientes": (f"{args.url}/api/clientes", headers),
+            "verify": (f"{args.url}/api/licencias/verify/{licencia}", None),
+        }
+
+        if args.escenario == "login":
+            url_verify, _ = escenarios["verify"]
+            print(f"Servidor: {args.url}  concurrencia: {args.concurrencia}  logins: {args.logins}")
+            await ejecutar(session, "verify", url_verify, None, args.concurrencia, args.concurrencia)
+            imprimir(await ejecutar(session, "verify", url_verify, None, args.peticiones, args.concurrencia))
+            resultado, logins = await asyncio.gather(
+                ejecutar(session, "verify+login", url_verify, None, args.peticiones, args.concurrencia),
+                rafaga_logins(args.url, args.username, args.password, args.logins),
+            )
+            imprimir(resultado)
+            print(f"logins por código de estado: {logins}")
+            return
+        seleccion = escenarios if args.escenario == "todos" else {args.escenario: escenarios[args.escenario]}
+
+        print(f"Servidor: {args.url}  concurrencia: {args.concurrencia}")
+        for nombre, (url_objetivo, cabeceras) in seleccion.items():
+            # Calentamiento para abrir conexiones HTTP y del pool SQLite
+            await ejecutar(session, nombre, url_objetivo, cabeceras, args.concurrencia, args.concurrencia)
+            imprimir(await ejecutar(
+                session, nombre, url_objetivo, cabeceras, args.peticiones, args.concurrencia
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de la API")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base del servidor")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--licencia", default=None, help="Licencia a verificar (por defecto la del primer cliente)")
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--peticiones", type=int, default=2000)
+    parser.add_argument(
+        "--escenario", choices=["todos", "clientes", "verify", "login"], default="todos"
+    )
+    parser.add_argument("--logins", type=int, default=50, help="Inicios de sesión en la ráfaga (escenario login)")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Pool de hilos acotado con cola limitada
+Para trabajo de CPU costoso (bcrypt) que no debe ejecutarse en el event loop
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorSaturadoError(RuntimeError):
+    """La cola del pool está llena; el llamador debe reintentar más tarde"""
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.run_total = 0.0
+
+    async def run(self, func, *args, **kwargs):
+        """Ejecuta `func` en el pool; rechaza de inmediato si la cola está llena"""
+        with self._lock:
+            if self._active >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturadoError(f"Pool '{self.name}' saturado")
+            self._active += 1
+            self.submitted += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            executor = self._executor
+
+        encolado = time.perf_counter()
+
+        def medir():
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                fin = time.perf_counter()
+                with self._lock:
+                    espera = inicio - encolado
+                    self.queue_wait_total += espera
+                    self.queue_wait_max = max(self.queue_wait_max, espera)
+                    self.run_total += fin - inicio
+
+        def liberar(_futuro):
+            with self._lock:
+                self._active -= 1
+                self.completed += 1
+
+        try:
+            futuro = executor.submit(medir)
+        except RuntimeError:
+            liberar(None)
+            raise
+        # El lugar se libera cuando termina el trabajo en el hilo, no cuando se
+        # deja de esperarlo: si el cliente se desconecta, bcrypt sigue ocupando
+        # el worker y la cola no debe admitir más de max_queue por eso
+        futuro.add_done_callback(liberar)
+        return await asyncio.wrap_future(futuro)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_wait_avg_ms": round(self.queue_wait_total * 1000 / self.completed, 3) if self.completed else 0.0,
+                "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+                "run_avg_ms": round(self.run_total * 1000 / self.completed, 3) if self.completed else 0.0,
+            }
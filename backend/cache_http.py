@@ -0,0 +1,93 @@
+"""
+Caché HTTP de respuestas de lectura (ETag / If-None-Match)
+El ETag sale de la versión de datos (`version_datos`, que los triggers suben
+en cada escritura de clientes y pagos) y del día, porque varios cálculos
+dependen de la fecha. El cuerpo ya serializado se guarda por URL y versión,
+así una lectura repetida no vuelve a consultar ni a pasar por Pydantic.
+"""
+import functools
+from datetime import date
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from cache import TTLCache
+from config import settings
+
+# Obliga al navegador a revalidar siempre, pero le deja reutilizar su copia con 304
+CACHE_CONTROL = "private, no-cache"
+
+
+@functools.lru_cache(maxsize=None)
+def _adaptador(tipo) -> TypeAdapter:
+    return TypeAdapter(tipo)
+
+
+class ConEncabezados(NamedTuple):
+    """Resultado de `producir` con encabezados propios (p. ej. el cursor de la siguiente página)"""
+    datos: Any
+    encabezados: dict
+
+
+def coincide(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara If-None-Match con el ETag (comparación débil, admite lista y '*')"""
+    if not if_none_match:
+        return False
+    for candidato in if_none_match.split(','):
+        candidato = candidato.strip()
+        if candidato == '*' or candidato.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class CacheRespuestas:
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.not_modified = 0
+
+    @staticmethod
+    def etag(version: int, hoy: Optional[date] = None) -> str:
+        return f'"{version}-{(hoy or date.today()).isoformat()}"'
+
+    async def responder(
+        self,
+        request: Request,
+        version: int,
+        tipo: Any,
+        producir: Callable[[], Awaitable[Any]],
+    ) -> Response:
+        """304 si el cliente ya tiene esta versión; si no, el cuerpo cacheado o uno nuevo.
+
+        `version` se lee antes de producir los datos: si otra escritura entra
+        en medio, el cuerpo guardado es más nuevo que su etiqueta y la
+        siguiente versión lo reemplaza, nunca al revés.
+        """
+        etag = self.etag(version)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if coincide(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        clave = (request.url.path, request.url.query, etag)
+        guardado = self._cache.get(clave)
+        if guardado is None:
+            datos = await producir()
+            extra = {}
+            if isinstance(datos, ConEncabezados):
+                datos, extra = datos
+            # Igual que response_model: validar contra el modelo y serializar solo sus campos
+            adaptador = _adaptador(tipo)
+            guardado = (adaptador.dump_json(adaptador.validate_python(datos)), extra)
+            self._cache.set(clave, guardado)
+        cuerpo, extra = guardado
+        return Response(content=cuerpo, media_type="application/json", headers={**headers, **extra})
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "not_modified": self.not_modified}
+
+
+cache_respuestas = CacheRespuestas(
+    maxsize=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
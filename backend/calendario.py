@@ -0,0 +1,171 @@
+"""
+Calendario laboral
+Días laborables (lunes a viernes sin feriados dominicanos) con un índice
+acumulado por año, para contar y sumar días laborables sin recorrer fechas
+"""
+import json
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+FERIADOS_PATH = Path(__file__).resolve().parent / "data" / "feriados_rd.json"
+
+
+def domingo_de_pascua(anio: int) -> date:
+    """Domingo de Pascua (calendario gregoriano, algoritmo de Meeus/Jones/Butcher)"""
+    a = anio % 19
+    b, c = divmod(anio, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+
+def trasladar_feriado(fecha: date) -> date:
+    """Ley 139-97: martes/miércoles al lunes anterior, jueves/viernes al lunes siguiente"""
+    dia_semana = fecha.weekday()
+    if dia_semana in (1, 2):
+        return fecha - timedelta(days=dia_semana)
+    if dia_semana in (3, 4):
+        return fecha + timedelta(days=7 - dia_semana)
+    return fecha
+
+
+class _IndiceAnual:
+    """Índice de un año: laborables acumulados por día y posición de cada laborable"""
+
+    __slots__ = ("inicio", "acumulado", "laborables", "feriados")
+
+    def __init__(self, anio: int, feriados: Dict[date, str]):
+        self.inicio = date(anio, 1, 1).toordinal()
+        fin = date(anio + 1, 1, 1).toordinal()
+        self.feriados = feriados
+        # acumulado[i] = laborables entre el 1 de enero y el día i del año (exclusive)
+        self.acumulado = [0]
+        # laborables[k] = día del año (desde 0) del k-ésimo laborable
+        self.laborables = []
+        for ordinal in range(self.inicio, fin):
+            dia = date.fromordinal(ordinal)
+            if dia.weekday() < 5 and dia not in feriados:
+                self.laborables.append(ordinal - self.inicio)
+            self.acumulado.append(len(self.laborables))
+
+    @property
+    def total(self) -> int:
+        return len(self.laborables)
+
+
+class CalendarioLaboral:
+    def __init__(self, feriados_path: Path = FERIADOS_PATH):
+        self.feriados_path = Path(feriados_path)
+        self._datos = None
+        self._indices = {}
+        self._lock = threading.Lock()
+
+    def _cargar_datos(self) -> dict:
+        if self._datos is None:
+            with open(self.feriados_path, encoding="utf-8") as f:
+                self._datos = json.load(f)
+        return self._datos
+
+    def _calcular_feriados(self, anio: int) -> Dict[date, str]:
+        datos = self._cargar_datos()
+        feriados = {}
+        for feriado in datos.get("fijos", []):
+            mes, dia = (int(parte) for parte in feriado["fecha"].split("-"))
+            fecha = date(anio, mes, dia)
+            if feriado.get("trasladable"):
+                fecha = trasladar_feriado(fecha)
+            feriados[fecha] = feriado["nombre"]
+
+        pascua = domingo_de_pascua(anio)
+        for feriado in datos.get("pascua", []):
+            feriados[pascua + timedelta(days=feriado["dias"])] = feriado["nombre"]
+
+        for fecha, nombre in datos.get("adicionales", {}).items():
+            fecha = date.fromisoformat(fecha)
+            if fecha.year == anio:
+                feriados[fecha] = nombre
+        return feriados
+
+    def _indice(self, anio: int) -> _IndiceAnual:
+        indice = self._indices.get(anio)
+        if indice is None:
+            with self._lock:
+                indice = self._indices.get(anio)
+                if indice is None:
+                    indice = _IndiceAnual(anio, self._calcular_feriados(anio))
+                    self._indices[anio] = indice
+        return indice
+
+    def _antes_de(self, fecha: date) -> tuple:
+        """(índice del año, laborables del año anteriores a `fecha`)"""
+        indice = self._indice(fecha.year)
+        return indice, indice.acumulado[fecha.toordinal() - indice.inicio]
+
+    def recargar(self):
+        """Vuelve a leer el archivo de feriados y descarta los índices"""
+        with self._lock:
+            self._datos = None
+            self._indices = {}
+
+    def feriados(self, anio: int) -> Dict[date, str]:
+        return dict(sorted(self._indice(anio).feriados.items()))
+
+    def es_feriado(self, fecha: date) -> Optional[str]:
+        """Nombre del feriado o None"""
+        return self._indice(fecha.year).feriados.get(fecha)
+
+    def es_laborable(self, fecha: date) -> bool:
+        return fecha.weekday() < 5 and fecha not in self._indice(fecha.year).feriados
+
+    def contar(self, inicio: date, fin: date) -> int:
+        """Días laborables entre `inicio` y `fin`, ambos inclusive"""
+        if fin < inicio:
+            return 0
+        _, antes_inicio = self._antes_de(inicio)
+        _, antes_fin = self._antes_de(fin)
+        total = antes_fin - antes_inicio + (1 if self.es_laborable(fin) else 0)
+        # Un año completo por cada cambio de año del rango
+        for anio in range(inicio.year, fin.year):
+            total += self._indice(anio).total
+        return total
+
+    def sumar(self, fecha: date, dias: int) -> date:
+        """El `dias`-ésimo laborable después de `fecha` (antes, si es negativo).
+
+        Con `dias` = 0 devuelve `fecha` si es laborable, si no el laborable siguiente.
+        """
+        indice, posicion = self._antes_de(fecha)
+        # `posicion` es el número del laborable de `fecha` o, si no lo es, del siguiente
+        if dias > 0 and not self.es_laborable(fecha):
+            dias -= 1
+        posicion += dias
+        # posicion: número del laborable buscado dentro del año de `fecha`, puede salirse del año
+        anio = fecha.year
+        while posicion >= indice.total:
+            posicion -= indice.total
+            anio += 1
+            indice = self._indice(anio)
+        while posicion < 0:
+            anio -= 1
+            indice = self._indice(anio)
+            posicion += indice.total
+        return date.fromordinal(indice.inicio + indice.laborables[posicion])
+
+    def fecha_limite(self, hoy: date, dias: int) -> date:
+        """Fecha más reciente, anterior a `hoy`, con al menos `dias` laborables hasta `hoy` inclusive"""
+        if dias <= 0:
+            return hoy - timedelta(days=1)
+        ultimo = hoy if self.es_laborable(hoy) else self.sumar(hoy, -1)
+        limite = self.sumar(ultimo, -(dias - 1))
+        return min(limite, hoy - timedelta(days=1))
+
+
+calendario = CalendarioLaboral()
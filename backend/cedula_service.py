@@ -0,0 +1,234 @@
+"""
+Consulta de cédulas (JCE)
+Cliente HTTP asíncrono con conexiones reutilizadas, caché persistente en SQLite
+(incluidas las cédulas no encontradas) y un circuit breaker por proveedor
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from urllib.parse import urlparse
+
+import aiohttp
+import anyio
+
+from config import settings
+from connection_pool import pool
+
+
+class CedulaInvalidaError(ValueError):
+    """La cédula no tiene 11 dígitos"""
+
+
+def normalizar_cedula(cedula: str) -> str:
+    digitos = ''.join(c for c in cedula if c.isdigit())
+    if len(digitos) != 11:
+        raise CedulaInvalidaError("La cédula debe tener 11 dígitos")
+    return digitos
+
+
+def _fecha_sql(momento: datetime) -> str:
+    # Mismo formato UTC que CURRENT_TIMESTAMP de SQLite
+    return momento.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _extraer_persona(data: dict) -> Optional[dict]:
+    """Normaliza la respuesta de cualquiera de los proveedores; None si no trae datos"""
+    if 'valid' in data:
+        if not data.get('valid'):
+            return None
+        data = data.get('data') or {}
+    elif 'nombres' not in data:
+        return None
+    return {
+        "nombres": data.get('nombres', ''),
+        "apellido1": data.get('apellido1', ''),
+        "apellido2": data.get('apellido2', ''),
+        "nombre_completo": f"{data.get('nombres', '')} {data.get('apellido1', '')} {data.get('apellido2', '')}".strip(),
+        "foto": data.get('foto')
+    }
+
+
+class ProveedorNoDisponibleError(RuntimeError):
+    """Timeout, error de red o respuesta 5xx: cuenta como fallo para el breaker"""
+
+
+class CircuitBreaker:
+    """Abierto tras `max_fallos` fallos seguidos; a los `reset_seconds` deja pasar una prueba"""
+
+    def __init__(self, max_fallos: int = 3, reset_seconds: float = 60.0):
+        self.max_fallos = max_fallos
+        self.reset_seconds = reset_seconds
+        self.fallos = 0
+        self.abierto_desde = None
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+        self.rechazos = 0
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self.abierto_desde is None:
+                return True
+            if time.monotonic() - self.abierto_desde >= self.reset_seconds and not self._prueba_en_curso:
+                # Semiabierto: una sola solicitud de prueba
+                self._prueba_en_curso = True
+                return True
+            self.rechazos += 1
+            return False
+
+    def exito(self):
+        with self._lock:
+            self.fallos = 0
+            self.abierto_desde = None
+            self._prueba_en_curso = False
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            self._prueba_en_curso = False
+            if self.abierto_desde is not None or self.fallos >= self.max_fallos:
+                self.abierto_desde = time.monotonic()
+
+    def liberar(self):
+        """La solicitud terminó sin veredicto (cancelada): otra puede hacer la prueba"""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    @property
+    def estado(self) -> str:
+        if self.abierto_desde is None:
+            return "cerrado"
+        if time.monotonic() - self.abierto_desde >= self.reset_seconds:
+            return "semiabierto"
+        return "abierto"
+
+
+class CedulaService:
+    def __init__(self, pool, proveedores: list):
+        self.pool = pool
+        self.proveedores = list(proveedores)
+        self.breakers = {
+            url: CircuitBreaker(settings.CEDULA_BREAKER_FAILURES, settings.CEDULA_BREAKER_RESET_SECONDS)
+            for url in self.proveedores
+        }
+        self._session = None
+        self._loop = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Sesión compartida (pool de conexiones keep-alive) del event loop actual"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.CEDULA_MAX_CONNECTIONS),
+                timeout=aiohttp.ClientTimeout(total=settings.CEDULA_TIMEOUT_SECONDS),
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ==================== CACHÉ ====================
+
+    def _leer_cache(self, cedula: str) -> Optional[dict]:
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT encontrada, datos FROM cedulas_cache
+                WHERE cedula = ? AND expira > ?
+            """, (cedula, _fecha_sql(datetime.now(timezone.utc))))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return {"encontrada": bool(row['encontrada']), "datos": json.loads(row['datos']) if row['datos'] else None}
+
+    def _guardar_cache(self, cedula: str, datos: Optional[dict], proveedor: Optional[str]):
+        horas = settings.CEDULA_CACHE_TTL_HOURS if datos else settings.CEDULA_NEGATIVE_TTL_HOURS
+        expira = datetime.now(timezone.utc) + timedelta(hours=horas)
+        with self.pool.connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO cedulas_cache (cedula, encontrada, datos, proveedor, fecha_consulta, expira)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+            """, (cedula, 1 if datos else 0, json.dumps(datos) if datos else None, proveedor, _fecha_sql(expira)))
+            conn.commit()
+
+    # ==================== PROVEEDORES ====================
+
+    async def _consultar_proveedor(self, url: str, cedula: str) -> Optional[dict]:
+        """Datos de la persona, None si el proveedor responde que no existe"""
+        session = self._get_session()
+        try:
+            async with session.get(url.format(cedula=cedula)) as response:
+                if response.status >= 500:
+                    raise ProveedorNoDisponibleError(f"HTTP {response.status}")
+                if response.status != 200:
+                    return None
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise ProveedorNoDisponibleError(str(e) or type(e).__name__)
+        return _extraer_persona(data) if isinstance(data, dict) else None
+
+    async def consultar(self, cedula: str) -> dict:
+        cedula = normalizar_cedula(cedula)
+
+        cache = await anyio.to_thread.run_sync(self._leer_cache, cedula)
+        if cache is not None:
+            self.hits += 1
+            if cache['encontrada']:
+                return {"success": True, "data": cache['datos']}
+            return {"success": False, "message": "Cédula no encontrada"}
+        self.misses += 1
+
+        disponibles = 0
+        for url in self.proveedores:
+            breaker = self.breakers[url]
+            if not breaker.permitir():
+                continue
+            try:
+                persona = await self._consultar_proveedor(url, cedula)
+            except ProveedorNoDisponibleError:
+                breaker.fallo()
+                continue
+            except BaseException:
+                # Cancelación o error inesperado: sin esto la prueba del
+                # semiabierto quedaría en curso y el proveedor no volvería
+                breaker.liberar()
+                raise
+            breaker.exito()
+            disponibles += 1
+            if persona:
+                await anyio.to_thread.run_sync(self._guardar_cache, cedula, persona, urlparse(url).netloc)
+                return {"success": True, "data": persona}
+
+        if disponibles == 0:
+            # Sin respuesta válida de nadie: no se cachea como inexistente
+            return {"success": False, "message": "Servicio de consulta de cédulas no disponible"}
+
+        await anyio.to_thread.run_sync(self._guardar_cache, cedula, None, None)
+        return {"success": False, "message": "Cédula no encontrada"}
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "proveedores": {
+                url: {
+                    "estado": breaker.estado,
+                    "fallos": breaker.fallos,
+                    "rechazos": breaker.rechazos,
+                }
+                for url, breaker in self.breakers.items()
+            },
+        }
+
+
+cedula_service = CedulaService(pool, settings.CEDULA_PROVIDER_URLS)
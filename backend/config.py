@@ -9,9 +9,60 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "anthony_system_secret_key_change_in_production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 horas
+    # Tokens temporales de ?token= (descargas, EventSource); se validan al abrir la conexión
+    STREAM_TOKEN_EXPIRE_SECONDS: int = 60
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_ENTRIES: int = 256
+    PASSWORD_HASH_WORKERS: int = 2  # hilos dedicados a bcrypt
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # solicitudes en espera antes de responder 503
+    
+    # Leases de licencia: clave privada PEM (o ruta a un .pem) para firmarlos.
+    # Vacía = se genera una en database/license_lease_key.pem al primer arranque
+    LICENSE_LEASE_PRIVATE_KEY: str = ""
+    LICENSE_LEASE_ALGORITHM: str = "ES256"
+    LICENSE_LEASE_MINUTES: int = 1440  # 24 horas
     
     # Base de datos
     DATABASE_PATH: str = "database/anthony_system.db"
+    DB_POOL_SIZE: int = 8
+    DB_POOL_TIMEOUT: float = 10.0  # segundos esperando una conexión libre
+    DB_BUSY_TIMEOUT_MS: int = 5000
+    DB_MMAP_SIZE: int = 268435456  # 256 MB
+    DB_CACHE_SIZE_KB: int = 16384  # 16 MB por conexión
+    
+    # Respuestas de lectura cacheadas por versión de datos (ETag)
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256
+    RESPONSE_CACHE_TTL_SECONDS: float = 300.0
+    
+    # Licencias
+    LICENSE_CACHE_TTL_SECONDS: float = 60.0
+    LICENSE_CACHE_MAX_ENTRIES: int = 10000
+    HEARTBEAT_FLUSH_INTERVAL_SECONDS: float = 30.0
+    HEARTBEAT_FLUSH_MAX_PENDING: int = 500
+    LICENSE_BATCH_MAX_KEYS: int = 500
+    
+    # Consulta de cédulas: URLs de proveedores en orden de preferencia ({cedula} = 11 dígitos)
+    CEDULA_PROVIDER_URLS: list = [
+        "https://api.digital.gob.do/v3/cedulas/{cedula}/validate",
+        "https://api.adamix.net/apec/cedula/{cedula}",
+    ]
+    CEDULA_TIMEOUT_SECONDS: float = 5.0
+    CEDULA_MAX_CONNECTIONS: int = 20
+    CEDULA_CACHE_TTL_HOURS: float = 720.0  # 30 días
+    CEDULA_NEGATIVE_TTL_HOURS: float = 24.0  # cédulas no encontradas
+    CEDULA_BREAKER_FAILURES: int = 3  # fallos seguidos antes de saltar el proveedor
+    CEDULA_BREAKER_RESET_SECONDS: float = 60.0
+    
+    # Feed de eventos (SSE)
+    EVENTOS_POLL_INTERVAL_SECONDS: float = 1.0
+    EVENTOS_BUFFER_SIZE: int = 1000  # eventos recientes en memoria para reanudar
+    EVENTOS_QUEUE_SIZE: int = 256  # pendientes por conexión antes de cortarla
+    EVENTOS_MAX_REPLAY: int = 1000
+    EVENTOS_RETENTION_HOURS: float = 24.0
+    EVENTOS_KEEPALIVE_SECONDS: float = 15.0
+    
+    # Exportación CSV / XLSX
+    EXPORT_BATCH_SIZE: int = 1000  # filas por consulta; la memoria no depende del total
     
     # CORS
     CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173"]
@@ -21,6 +72,26 @@ class Settings(BaseSettings):
     TWILIO_AUTH_TOKEN: str = ""
     TWILIO_WHATSAPP_FROM: str = "whatsapp:+14155238886"
     WHATSAPP_ENABLED: bool = False
+    WHATSAPP_MAX_CONCURRENCY: int = 8  # envíos simultáneos a Twilio
+    WHATSAPP_MESSAGES_PER_SECOND: float = 10.0
+    WHATSAPP_SEND_TIMEOUT_SECONDS: float = 15.0  # por mensaje
+    
+    # Plantillas de mensajes
+    PLANTILLAS_IDIOMA: str = "es"
+    PLANTILLAS_CACHE_TTL_SECONDS: float = 60.0  # cambios hechos en otro worker tardan esto en verse
+    
+    # Outbox de notificaciones
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_MAX_ATTEMPTS: int = 6
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 30.0  # se duplica en cada reintento
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 3600.0
+    
+    # Tareas programadas (barridos de mora, licencias y recordatorios)
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK_SECONDS: float = 60.0
+    SCHEDULER_SWEEP_INTERVAL_SECONDS: float = 900.0
+    NOTIFICACIONES_HORA: int = 9  # hora local a partir de la cual se encolan los avisos del día
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,184 @@
+"""
+Pool de conexiones SQLite
+Conexiones de larga duración reutilizadas entre peticiones
+"""
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import settings
+
+
+class PoolTimeoutError(RuntimeError):
+    """No se obtuvo una conexión libre dentro del tiempo de espera"""
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        db_path: str,
+        size: int = 8,
+        timeout: float = 10.0,
+        mmap_size: int = 0,
+        cache_size_kb: int = 0,
+        busy_timeout_ms: int = 5000,
+    ):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre una conexión nueva y aplica los pragmas una sola vez"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if self.mmap_size:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if self.cache_size_kb:
+            # Valor negativo = tamaño en KiB en lugar de páginas
+            conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if conn is not None:
+                self._in_use += 1
+                self._checkouts += 1
+                return conn
+
+        if create:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._in_use += 1
+                self._checkouts += 1
+            return conn
+
+        # Pool agotado: esperar a que se libere una conexión
+        inicio = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(
+                f"No hay conexiones disponibles tras {self.timeout}s (tamaño del pool: {self.size})"
+            )
+        espera = time.perf_counter() - inicio
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._waits += 1
+            self._wait_total += espera
+            self._wait_max = max(self._wait_max, espera)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, broken: bool = False):
+        with self._lock:
+            self._in_use -= 1
+        if broken:
+            try:
+                conn.close()
+            finally:
+                with self._lock:
+                    self._created -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Presta una conexión del pool; se devuelve al salir del bloque.
+
+        Si el bloque lanza una excepción se hace rollback. Cualquier
+        transacción que quede abierta sin commit también se descarta, igual
+        que ocurría al cerrar una conexión sin confirmar.
+        """
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                broken = True
+            raise
+        finally:
+            if not broken and conn.in_transaction:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    broken = True
+            self._release(conn, broken)
+
+    def close_all(self):
+        """Cierra las conexiones inactivas (al apagar la aplicación)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> dict:
+        """Estadísticas del pool para monitoreo en tiempo de ejecución"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_avg_ms": round(self._wait_total * 1000 / self._waits, 3) if self._waits else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+                "timeouts": self._timeouts,
+            }
+
+
+pool = ConnectionPool(
+    settings.DATABASE_PATH,
+    size=settings.DB_POOL_SIZE,
+    timeout=settings.DB_POOL_TIMEOUT,
+    mmap_size=settings.DB_MMAP_SIZE,
+    cache_size_kb=settings.DB_CACHE_SIZE_KB,
+    busy_timeout_ms=settings.DB_BUSY_TIMEOUT_MS,
+)
@@ -2,30 +2,25 @@
 Inicializador de Base de Datos
 Anthony System - Sistema de Gestión de Rentas
 """
-import sqlite3
-import os
+import sys
 from pathlib import Path
 
-def init_database():
-    """Inicializa la base de datos con el esquema"""
-    # Crear directorio si no existe
-    db_dir = Path(__file__).parent
-    db_path = db_dir / "anthony_system.db"
-    
-    # Leer el esquema SQL
-    schema_path = db_dir / "schema.sql"
-    with open(schema_path, 'r', encoding='utf-8') as f:
-        schema_sql = f.read()
-    
-    # Crear/conectar a la base de datos
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Ejecutar el esquema
-    cursor.executescript(schema_sql)
-    
-    conn.commit()
-    conn.close()
+# Permite ejecutarlo como script desde backend/ (config está un nivel arriba)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings
+from database import migraciones
+
+
+def init_database(diferir_en_linea: bool = False) -> str:
+    """Crea o actualiza la base de datos aplicando las migraciones pendientes.
+
+    Con `diferir_en_linea=True` (arranque del servidor) las migraciones de
+    índices marcadas `-- en-linea` se aplican en segundo plano.
+    """
+    db_path = settings.DATABASE_PATH
+    resultado = migraciones.aplicar(db_path, incluir_en_linea=not diferir_en_linea)
+    migraciones.aplicar_en_segundo_plano(db_path, resultado["pendientes_en_linea"])
     
     print(f"✅ Base de datos inicializada: {db_path}")
     return db_path
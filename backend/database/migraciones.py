@@ -0,0 +1,240 @@
+"""
+Migraciones de esquema
+Archivos ordenados en `database/migrations/NNNN_nombre.sql` (o `.py` con una
+función `migrar(conn)`). La tabla `schema_version` guarda las aplicadas y
+`PRAGMA user_version` la última, así que un arranque sin cambios pendientes
+solo lee la cabecera de la base.
+
+Un `.sql` que incluya la línea `-- en-linea` (solo para CREATE INDEX) no
+bloquea el arranque: se aplica en segundo plano con el servidor ya atendiendo.
+
+    python database/migraciones.py estado
+    python database/migraciones.py aplicar
+"""
+import argparse
+import hashlib
+import importlib.util
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+DIRECTORIO = Path(__file__).resolve().parent / "migrations"
+
+_NOMBRE = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+
+
+class Migracion:
+    def __init__(self, ruta: Path):
+        coincidencia = _NOMBRE.match(ruta.name)
+        self.ruta = ruta
+        self.version = int(coincidencia.group(1))
+        self.nombre = coincidencia.group(2)
+        self.tipo = coincidencia.group(3)
+        self.contenido = ruta.read_text(encoding="utf-8")
+        self.checksum = hashlib.sha256(self.contenido.encode("utf-8")).hexdigest()
+        self.en_linea = self.tipo == "sql" and any(
+            linea.strip() == "-- en-linea" for linea in self.contenido.splitlines()
+        )
+
+    def __repr__(self):
+        return f"{self.version:04d}_{self.nombre}"
+
+
+def descubrir(directorio: Path = DIRECTORIO) -> List[Migracion]:
+    migraciones = [Migracion(ruta) for ruta in directorio.iterdir() if _NOMBRE.match(ruta.name)]
+    migraciones.sort(key=lambda m: m.version)
+    versiones = [m.version for m in migraciones]
+    if len(versiones) != len(set(versiones)):
+        raise RuntimeError(f"Versiones de migración repetidas en {directorio}")
+    return migraciones
+
+
+def _conectar(db_path: str) -> sqlite3.Connection:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    # Modo autocommit: cada migración abre su propia transacción
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    return conn
+
+
+def _crear_tabla_versiones(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            fecha_aplicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duracion_ms REAL
+        )
+    """)
+
+
+def _aplicadas(conn: sqlite3.Connection) -> dict:
+    return {
+        version: checksum
+        for version, checksum in conn.execute("SELECT version, checksum FROM schema_version")
+    }
+
+
+def _aplicar_una(conn: sqlite3.Connection, migracion: Migracion) -> bool:
+    """Aplica una migración en su propia transacción; False si otro proceso se adelantó.
+
+    El registro en schema_version va primero: con BEGIN IMMEDIATE, un segundo
+    proceso espera el bloqueo y luego choca con la clave primaria.
+    """
+    inicio = time.perf_counter()
+    registro = (migracion.version, migracion.nombre, migracion.checksum)
+    try:
+        if migracion.tipo == "sql":
+            # nombre (\w+) y checksum (hex) no necesitan escaparse
+            conn.executescript(
+                "BEGIN IMMEDIATE;\n"
+                "INSERT INTO schema_version (version, nombre, checksum) "
+                f"VALUES ({migracion.version}, '{migracion.nombre}', '{migracion.checksum}');\n"
+                f"{migracion.contenido}\n;\nCOMMIT;"
+            )
+        else:
+            spec = importlib.util.spec_from_file_location(f"migracion_{migracion.version:04d}", migracion.ruta)
+            modulo = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(modulo)
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO schema_version (version, nombre, checksum) VALUES (?, ?, ?)", registro)
+            modulo.migrar(conn)
+            conn.execute("COMMIT")
+    except sqlite3.IntegrityError:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (migracion.version,)).fetchone():
+            return False
+        raise
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+    duracion = round((time.perf_counter() - inicio) * 1000, 3)
+    conn.execute("UPDATE schema_version SET duracion_ms = ? WHERE version = ?", (duracion, migracion.version))
+    print(f"✅ Migración {migracion} aplicada ({duracion} ms)")
+    return True
+
+
+def _marcar_version(conn: sqlite3.Connection, migraciones: List[Migracion]):
+    """Guarda la última versión en la cabecera solo si no queda ninguna pendiente"""
+    aplicadas = _aplicadas(conn)
+    if all(m.version in aplicadas for m in migraciones):
+        conn.execute(f"PRAGMA user_version = {migraciones[-1].version}")
+
+
+def aplicar(db_path: str, incluir_en_linea: bool = True, directorio: Path = DIRECTORIO) -> dict:
+    """Aplica las migraciones pendientes en orden.
+
+    Con `incluir_en_linea=False` deja las marcadas `-- en-linea` para
+    `aplicar_en_segundo_plano` y las devuelve en `pendientes_en_linea`.
+    """
+    migraciones = descubrir(directorio)
+    if not migraciones:
+        return {"aplicadas": [], "pendientes_en_linea": []}
+
+    conn = _conectar(db_path)
+    try:
+        # Camino rápido: nada nuevo desde el último arranque
+        if conn.execute("PRAGMA user_version").fetchone()[0] == migraciones[-1].version:
+            return {"aplicadas": [], "pendientes_en_linea": []}
+
+        _crear_tabla_versiones(conn)
+        ya_aplicadas = _aplicadas(conn)
+        aplicadas = []
+        pendientes_en_linea = []
+        for migracion in migraciones:
+            if migracion.version in ya_aplicadas:
+                if ya_aplicadas[migracion.version] != migracion.checksum:
+                    print(f"⚠️  La migración {migracion} cambió después de aplicarse")
+                continue
+            if migracion.en_linea and not incluir_en_linea:
+                pendientes_en_linea.append(migracion)
+                continue
+            if _aplicar_una(conn, migracion):
+                aplicadas.append(migracion)
+
+        _marcar_version(conn, migraciones)
+        return {"aplicadas": aplicadas, "pendientes_en_linea": pendientes_en_linea}
+    finally:
+        conn.close()
+
+
+def aplicar_en_segundo_plano(db_path: str, migraciones: List[Migracion]) -> Optional[threading.Thread]:
+    """Aplica las migraciones en línea (índices) sin bloquear el arranque.
+
+    SQLite no crea índices de forma concurrente: durante cada CREATE INDEX las
+    escrituras esperan (busy_timeout), pero con WAL las lecturas siguen
+    atendiéndose con normalidad.
+    """
+    if not migraciones:
+        return None
+
+    def ejecutar():
+        conn = _conectar(db_path)
+        try:
+            for migracion in migraciones:
+                _aplicar_una(conn, migracion)
+            _marcar_version(conn, descubrir(migraciones[0].ruta.parent))
+        except Exception as e:
+            print(f"⚠️  Error al aplicar migraciones en línea: {e}")
+        finally:
+            conn.close()
+
+    hilo = threading.Thread(target=ejecutar, name="migraciones-en-linea", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def estado(db_path: str, directorio: Path = DIRECTORIO) -> dict:
+    migraciones = descubrir(directorio)
+    conn = _conectar(db_path)
+    try:
+        _crear_tabla_versiones(conn)
+        ya_aplicadas = _aplicadas(conn)
+        return {
+            "user_version": conn.execute("PRAGMA user_version").fetchone()[0],
+            "ultima": migraciones[-1].version if migraciones else 0,
+            "aplicadas": [str(m) for m in migraciones if m.version in ya_aplicadas],
+            "pendientes": [str(m) for m in migraciones if m.version not in ya_aplicadas],
+            "modificadas": [
+                str(m) for m in migraciones
+                if m.version in ya_aplicadas and ya_aplicadas[m.version] != m.checksum
+            ],
+        }
+    finally:
+        conn.close()
+
+
+def main():
+    # Permite ejecutarlo como script desde backend/ (config está un nivel arriba)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from config import settings
+
+    parser = argparse.ArgumentParser(description="Migraciones de esquema")
+    parser.add_argument("accion", choices=["estado", "aplicar"])
+    parser.add_argument("--db", default=settings.DATABASE_PATH, help="Ruta de la base de datos")
+    args = parser.parse_args()
+
+    if args.accion == "aplicar":
+        resultado = aplicar(args.db)
+        print(f"✅ Migraciones aplicadas: {len(resultado['aplicadas'])}")
+        return
+
+    resultado = estado(args.db)
+    for nombre in resultado["aplicadas"]:
+        print(f"  ✔ {nombre}")
+    for nombre in resultado["pendientes"]:
+        print(f"  · {nombre} (pendiente)")
+    for nombre in resultado["modificadas"]:
+        print(f"  ⚠️  {nombre} cambió después de aplicarse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+-- ============================================
+-- ANTHONY SYSTEM - Base de Datos
+-- Sistema de Gestión de Rentas
+-- ============================================
+-- Esquema base. Todo es IF NOT EXISTS: también se aplica sobre bases creadas
+-- antes de existir las migraciones. Los cambios posteriores van en archivos
+-- nuevos de este directorio, nunca editando uno ya publicado.
+
+-- Tabla de clientes que rentan el sistema
+CREATE TABLE IF NOT EXISTS clientes_renta (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre_empresa TEXT NOT NULL,
+    contacto_nombre TEXT NOT NULL,
+    telefono TEXT NOT NULL,
+    telefono_e164 TEXT,
+    email TEXT,
+    cedula TEXT,
+    plan TEXT NOT NULL CHECK(plan IN ('Basico', 'Premium', 'Empresarial')),
+    precio_mensual REAL NOT NULL,
+    fecha_inicio DATE NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'Activo' CHECK(estado IN ('Activo', 'Suspendido', 'Cancelado')),
+    licencia_key TEXT UNIQUE NOT NULL,
+    estado_pago TEXT CHECK(estado_pago IN ('al_dia', 'por_vencer', 'atrasado')),
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ultima_modificacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla de pagos de renta mensuales
+CREATE TABLE IF NOT EXISTS pagos_renta (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cliente_renta_id INTEGER NOT NULL,
+    monto REAL NOT NULL,
+    fecha_pago DATE NOT NULL,
+    fecha_vencimiento DATE NOT NULL,
+    metodo_pago TEXT CHECK(metodo_pago IN ('Efectivo', 'Transferencia', 'Tarjeta')),
+    referencia TEXT,
+    estado TEXT NOT NULL DEFAULT 'Pendiente' CHECK(estado IN ('Pagado', 'Pendiente', 'Atrasado')),
+    dias_atraso INTEGER DEFAULT 0,
+    notas TEXT,
+    registrado_por TEXT,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cliente_renta_id) REFERENCES clientes_renta(id) ON DELETE CASCADE
+);
+
+-- Tabla de licencias
+CREATE TABLE IF NOT EXISTS licencias (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cliente_renta_id INTEGER NOT NULL,
+    licencia_key TEXT UNIQUE NOT NULL,
+    fecha_activacion DATE NOT NULL,
+    fecha_expiracion DATE NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'Activa' CHECK(estado IN ('Activa', 'Suspendida', 'Expirada')),
+    dispositivo_id TEXT,
+    ultima_conexion TIMESTAMP,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cliente_renta_id) REFERENCES clientes_renta(id) ON DELETE CASCADE
+);
+
+-- Licencias revocadas (alimenta la lista que consultan los leases sin conexión)
+CREATE TABLE IF NOT EXISTS licencias_revocadas (
+    licencia_key TEXT PRIMARY KEY,
+    motivo TEXT,
+    fecha_revocacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla de usuarios administradores
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    nombre_completo TEXT NOT NULL,
+    email TEXT,
+    rol TEXT DEFAULT 'admin' CHECK(rol IN ('admin', 'superadmin')),
+    activo INTEGER DEFAULT 1,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Tabla de notificaciones
+CREATE TABLE IF NOT EXISTS notificaciones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cliente_renta_id INTEGER NOT NULL,
+    tipo TEXT NOT NULL CHECK(tipo IN ('vencimiento', 'atraso', 'pago_recibido', 'suspension')),
+    mensaje TEXT NOT NULL,
+    leida INTEGER DEFAULT 0,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cliente_renta_id) REFERENCES clientes_renta(id) ON DELETE CASCADE
+);
+
+-- Outbox de notificaciones: cola persistente que envía un hilo en segundo plano
+CREATE TABLE IF NOT EXISTS notificaciones_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT UNIQUE NOT NULL,
+    cliente_renta_id INTEGER NOT NULL,
+    tipo TEXT NOT NULL CHECK(tipo IN ('mora', 'pago_recibido', 'recordatorio')),
+    telefono TEXT NOT NULL,
+    mensaje TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'Pendiente' CHECK(estado IN ('Pendiente', 'Enviando', 'Enviado', 'Fallido')),
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    bloqueado_hasta TIMESTAMP,
+    ultimo_error TEXT,
+    message_sid TEXT,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_envio TIMESTAMP,
+    FOREIGN KEY (cliente_renta_id) REFERENCES clientes_renta(id) ON DELETE CASCADE
+);
+
+-- Tareas programadas: watermark y bloqueo entre workers
+CREATE TABLE IF NOT EXISTS tareas_programadas (
+    nombre TEXT PRIMARY KEY,
+    watermark TEXT,
+    lock_owner TEXT,
+    lock_expira TIMESTAMP,
+    ultima_ejecucion TIMESTAMP,
+    ultimo_error TEXT
+);
+
+-- Plantillas de mensajes editadas desde la aplicación (sobrescriben backend/plantillas/)
+CREATE TABLE IF NOT EXISTS plantillas_mensajes (
+    tipo TEXT NOT NULL,
+    idioma TEXT NOT NULL DEFAULT 'es',
+    cuerpo TEXT NOT NULL,
+    fecha_modificacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tipo, idioma)
+);
+
+-- Caché de consultas de cédula (encontrada = 0: no existe, caché negativa)
+CREATE TABLE IF NOT EXISTS cedulas_cache (
+    cedula TEXT PRIMARY KEY,
+    encontrada INTEGER NOT NULL,
+    datos TEXT,
+    proveedor TEXT,
+    fecha_consulta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expira TIMESTAMP NOT NULL
+);
+
+-- Feed de cambios para /api/events (se purga tras EVENTOS_RETENTION_HOURS)
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Resumen del dashboard, mantenido por los triggers de abajo (ver resumen.py)
+CREATE TABLE IF NOT EXISTS resumen_mensual (
+    mes TEXT PRIMARY KEY,  -- YYYY-MM de fecha_vencimiento
+    cobrado REAL NOT NULL DEFAULT 0,
+    pendiente REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS resumen_clientes (
+    id INTEGER PRIMARY KEY CHECK(id = 1),
+    total_activos INTEGER NOT NULL DEFAULT 0,
+    ingresos_proyectados REAL NOT NULL DEFAULT 0,
+    al_dia INTEGER NOT NULL DEFAULT 0,
+    por_vencer INTEGER NOT NULL DEFAULT 0,
+    atrasados INTEGER NOT NULL DEFAULT 0,
+    fecha_estados DATE  -- día para el que se clasificó a los clientes
+);
+
+-- Aporte de un pago: su monto a cobrado o pendiente en el mes de su vencimiento
+CREATE TRIGGER IF NOT EXISTS trg_resumen_pago_insert AFTER INSERT ON pagos_renta
+BEGIN
+    INSERT INTO resumen_mensual (mes, cobrado, pendiente)
+    VALUES (
+        substr(NEW.fecha_vencimiento, 1, 7),
+        CASE WHEN NEW.estado = 'Pagado' THEN NEW.monto ELSE 0 END,
+        CASE WHEN NEW.estado IN ('Pendiente', 'Atrasado') THEN NEW.monto ELSE 0 END
+    )
+    ON CONFLICT(mes) DO UPDATE SET
+        cobrado = cobrado + excluded.cobrado,
+        pendiente = pendiente + excluded.pendiente;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resumen_pago_update
+AFTER UPDATE OF estado, monto, fecha_vencimiento ON pagos_renta
+BEGIN
+    UPDATE resumen_mensual SET
+        cobrado = cobrado - CASE WHEN OLD.estado = 'Pagado' THEN OLD.monto ELSE 0 END,
+        pendiente = pendiente - CASE WHEN OLD.estado IN ('Pendiente', 'Atrasado') THEN OLD.monto ELSE 0 END
+    WHERE mes = substr(OLD.fecha_vencimiento, 1, 7);
+    INSERT INTO resumen_mensual (mes, cobrado, pendiente)
+    VALUES (
+        substr(NEW.fecha_vencimiento, 1, 7),
+        CASE WHEN NEW.estado = 'Pagado' THEN NEW.monto ELSE 0 END,
+        CASE WHEN NEW.estado IN ('Pendiente', 'Atrasado') THEN NEW.monto ELSE 0 END
+    )
+    ON CONFLICT(mes) DO UPDATE SET
+        cobrado = cobrado + excluded.cobrado,
+        pendiente = pendiente + excluded.pendiente;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resumen_pago_delete AFTER DELETE ON pagos_renta
+BEGIN
+    UPDATE resumen_mensual SET
+        cobrado = cobrado - CASE WHEN OLD.estado = 'Pagado' THEN OLD.monto ELSE 0 END,
+        pendiente = pendiente - CASE WHEN OLD.estado IN ('Pendiente', 'Atrasado') THEN OLD.monto ELSE 0 END
+    WHERE mes = substr(OLD.fecha_vencimiento, 1, 7);
+END;
+
+-- Aporte de un cliente: solo cuenta si está Activo
+CREATE TRIGGER IF NOT EXISTS trg_resumen_cliente_insert AFTER INSERT ON clientes_renta
+BEGIN
+    UPDATE resumen_clientes SET
+        total_activos = total_activos + (NEW.estado IS 'Activo'),
+        ingresos_proyectados = ingresos_proyectados + CASE WHEN NEW.estado = 'Activo' THEN NEW.precio_mensual ELSE 0 END,
+        al_dia = al_dia + (NEW.estado IS 'Activo' AND NEW.estado_pago IS 'al_dia'),
+        por_vencer = por_vencer + (NEW.estado IS 'Activo' AND NEW.estado_pago IS 'por_vencer'),
+        atrasados = atrasados + (NEW.estado IS 'Activo' AND NEW.estado_pago IS 'atrasado')
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resumen_cliente_update
+AFTER UPDATE OF estado, precio_mensual, estado_pago ON clientes_renta
+BEGIN
+    UPDATE resumen_clientes SET
+        total_activos = total_activos + (NEW.estado IS 'Activo') - (OLD.estado IS 'Activo'),
+        ingresos_proyectados = ingresos_proyectados
+            + CASE WHEN NEW.estado = 'Activo' THEN NEW.precio_mensual ELSE 0 END
+            - CASE WHEN OLD.estado = 'Activo' THEN OLD.precio_mensual ELSE 0 END,
+        al_dia = al_dia
+            + (NEW.estado IS 'Activo' AND NEW.estado_pago IS 'al_dia')
+            - (OLD.estado IS 'Activo' AND OLD.estado_pago IS 'al_dia'),
+        por_vencer = por_vencer
+            + (NEW.estado IS 'Activo' AND NEW.estado_pago IS 'por_vencer')
+            - (OLD.estado IS 'Activo' AND OLD.estado_pago IS 'por_vencer'),
+        atrasados = atrasados
+            + (NEW.estado IS 'Activo' AND NEW.estado_pago IS 'atrasado')
+            - (OLD.estado IS 'Activo' AND OLD.estado_pago IS 'atrasado')
+    WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resumen_cliente_delete AFTER DELETE ON clientes_renta
+BEGIN
+    UPDATE resumen_clientes SET
+        total_activos = total_activos - (OLD.estado IS 'Activo'),
+        ingresos_proyectados = ingresos_proyectados - CASE WHEN OLD.estado = 'Activo' THEN OLD.precio_mensual ELSE 0 END,
+        al_dia = al_dia - (OLD.estado IS 'Activo' AND OLD.estado_pago IS 'al_dia'),
+        por_vencer = por_vencer - (OLD.estado IS 'Activo' AND OLD.estado_pago IS 'por_vencer'),
+        atrasados = atrasados - (OLD.estado IS 'Activo' AND OLD.estado_pago IS 'atrasado')
+    WHERE id = 1;
+END;
+
+-- Versión de los datos de clientes y pagos: la suben los triggers de abajo y
+-- de ella salen los ETag de las lecturas. Empieza en un valor aleatorio para que
+-- una base recreada no repita ETags que los navegadores ya tengan guardados
+CREATE TABLE IF NOT EXISTS version_datos (
+    id INTEGER PRIMARY KEY CHECK(id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO version_datos (id, version) VALUES (1, abs(random() % 1000000000));
+
+CREATE TRIGGER IF NOT EXISTS trg_version_cliente_insert AFTER INSERT ON clientes_renta
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_cliente_update AFTER UPDATE ON clientes_renta
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_cliente_delete AFTER DELETE ON clientes_renta
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_pago_insert AFTER INSERT ON pagos_renta
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_pago_update AFTER UPDATE ON pagos_renta
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_version_pago_delete AFTER DELETE ON pagos_renta
+BEGIN
+    UPDATE version_datos SET version = version + 1 WHERE id = 1;
+END;
+
+-- Índices para mejorar rendimiento
+CREATE INDEX IF NOT EXISTS idx_clientes_estado ON clientes_renta(estado);
+CREATE INDEX IF NOT EXISTS idx_clientes_licencia ON clientes_renta(licencia_key);
+CREATE INDEX IF NOT EXISTS idx_pagos_cliente ON pagos_renta(cliente_renta_id);
+CREATE INDEX IF NOT EXISTS idx_pagos_estado ON pagos_renta(estado);
+CREATE INDEX IF NOT EXISTS idx_pagos_fecha ON pagos_renta(fecha_vencimiento);
+CREATE INDEX IF NOT EXISTS idx_pagos_fecha_pago ON pagos_renta(fecha_pago);
+-- Paginación por keyset de /api/pagos sobre (fecha_vencimiento, id); sin filtros
+-- basta idx_pagos_fecha, que ya termina en rowid (= id)
+CREATE INDEX IF NOT EXISTS idx_pagos_cliente_vencimiento ON pagos_renta(cliente_renta_id, fecha_vencimiento, id);
+CREATE INDEX IF NOT EXISTS idx_pagos_estado_vencimiento ON pagos_renta(estado, fecha_vencimiento, id);
+CREATE INDEX IF NOT EXISTS idx_licencias_key ON licencias(licencia_key);
+CREATE INDEX IF NOT EXISTS idx_licencias_cliente ON licencias(cliente_renta_id);
+CREATE INDEX IF NOT EXISTS idx_licencias_estado_expiracion ON licencias(estado, fecha_expiracion);
+CREATE INDEX IF NOT EXISTS idx_revocadas_fecha ON licencias_revocadas(fecha_revocacion);
+CREATE INDEX IF NOT EXISTS idx_notificaciones_leida ON notificaciones(leida);
+CREATE INDEX IF NOT EXISTS idx_outbox_estado_intento ON notificaciones_outbox(estado, proximo_intento);
+CREATE INDEX IF NOT EXISTS idx_eventos_fecha ON eventos(fecha);
+
+-- No se inserta usuario por defecto; el primer administrador se crea desde la aplicación.
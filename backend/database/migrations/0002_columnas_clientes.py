@@ -0,0 +1,15 @@
+"""
+Columnas de clientes_renta agregadas después de crear la tabla.
+En bases nuevas ya vienen en 0001; en las anteriores se agregan aquí.
+"""
+
+
+def migrar(conn):
+    columnas = {row[1] for row in conn.execute("PRAGMA table_info(clientes_renta)")}
+    if 'telefono_e164' not in columnas:
+        conn.execute("ALTER TABLE clientes_renta ADD COLUMN telefono_e164 TEXT")
+    if 'estado_pago' not in columnas:
+        conn.execute(
+            "ALTER TABLE clientes_renta ADD COLUMN estado_pago TEXT "
+            "CHECK(estado_pago IN ('al_dia', 'por_vencer', 'atrasado'))"
+        )
@@ -0,0 +1,57 @@
+-- Índices compuestos y de cobertura para las consultas reales de
+-- database_service.py. Se comprueban con `python verificar_planes.py`.
+-- en-linea
+
+-- Pagos abiertos de cada cliente: el próximo vencimiento de get_clientes /
+-- get_cliente sale de la primera entrada, y la clasificación (MIN) y el cierre
+-- de pendientes al registrar un pago se resuelven sin tocar la tabla.
+-- Parcial: solo guarda los pagos Pendiente/Atrasado, una fracción del historial.
+CREATE INDEX IF NOT EXISTS idx_pagos_abiertos_cliente
+    ON pagos_renta(cliente_renta_id, fecha_vencimiento, estado, monto)
+    WHERE estado IN ('Pendiente', 'Atrasado');
+
+-- Keyset de /api/pagos sobre (fecha_vencimiento, id) y tasa de cobro por
+-- rango de vencimiento (cubre estado y monto). Reemplaza a idx_pagos_fecha.
+CREATE INDEX IF NOT EXISTS idx_pagos_vencimiento_cubre
+    ON pagos_renta(fecha_vencimiento, id, estado, monto);
+DROP INDEX IF EXISTS idx_pagos_fecha;
+
+-- Barridos de atrasos y recordatorios por estado y vencimiento; la mora
+-- (GROUP BY cliente con el monto del pago más antiguo) queda cubierta.
+-- Reemplaza a idx_pagos_estado_vencimiento.
+CREATE INDEX IF NOT EXISTS idx_pagos_estado_vencimiento_cubre
+    ON pagos_renta(estado, fecha_vencimiento, id, cliente_renta_id, monto);
+DROP INDEX IF EXISTS idx_pagos_estado_vencimiento;
+
+-- Ingresos mensuales por fecha de pago. Reemplaza a idx_pagos_fecha_pago.
+CREATE INDEX IF NOT EXISTS idx_pagos_fecha_pago_cubre
+    ON pagos_renta(fecha_pago, estado, monto);
+DROP INDEX IF EXISTS idx_pagos_fecha_pago;
+
+-- Ingresos por método: estado = 'Pagado' y rango de fecha_pago
+CREATE INDEX IF NOT EXISTS idx_pagos_estado_fecha_pago
+    ON pagos_renta(estado, fecha_pago, metodo_pago, monto);
+
+-- Ingresos por plan: LEFT JOIN por cliente con estado y rango de fecha_pago
+CREATE INDEX IF NOT EXISTS idx_pagos_cliente_estado_pago
+    ON pagos_renta(cliente_renta_id, estado, fecha_pago, monto);
+
+-- Prefijos de idx_pagos_cliente_vencimiento / idx_pagos_estado_vencimiento_cubre
+DROP INDEX IF EXISTS idx_pagos_cliente;
+DROP INDEX IF EXISTS idx_pagos_estado;
+
+-- Listado de clientes ordenado por nombre, con o sin filtro de estado.
+-- Reemplaza a idx_clientes_estado.
+CREATE INDEX IF NOT EXISTS idx_clientes_estado_nombre ON clientes_renta(estado, nombre_empresa);
+CREATE INDEX IF NOT EXISTS idx_clientes_nombre ON clientes_renta(nombre_empresa);
+DROP INDEX IF EXISTS idx_clientes_estado;
+
+-- Ingresos por plan recorre clientes agrupados por plan
+CREATE INDEX IF NOT EXISTS idx_clientes_plan ON clientes_renta(plan);
+
+-- Clientes pendientes de normalizar el teléfono (vacío en régimen normal)
+CREATE INDEX IF NOT EXISTS idx_clientes_sin_e164 ON clientes_renta(id) WHERE telefono_e164 IS NULL;
+
+-- licencia_key ya es UNIQUE en ambas tablas: SQLite mantiene su propio índice
+DROP INDEX IF EXISTS idx_clientes_licencia;
+DROP INDEX IF EXISTS idx_licencias_key;
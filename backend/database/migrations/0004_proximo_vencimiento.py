@@ -0,0 +1,32 @@
+"""
+Próximo vencimiento desnormalizado en clientes_renta.
+`proximo_vencimiento` y `proximo_pago_id` apuntan al pago Pendiente/Atrasado
+más antiguo del cliente; database_service los mantiene al crear clientes y
+registrar pagos. Aquí se agregan las columnas y se rellenan las filas
+existentes con un solo UPDATE.
+"""
+
+
+def migrar(conn):
+    columnas = {row[1] for row in conn.execute("PRAGMA table_info(clientes_renta)")}
+    if 'proximo_vencimiento' not in columnas:
+        conn.execute("ALTER TABLE clientes_renta ADD COLUMN proximo_vencimiento DATE")
+    if 'proximo_pago_id' not in columnas:
+        conn.execute("ALTER TABLE clientes_renta ADD COLUMN proximo_pago_id INTEGER")
+
+    conn.execute("""
+        UPDATE clientes_renta SET (proximo_vencimiento, proximo_pago_id) = (
+            SELECT fecha_vencimiento, id FROM pagos_renta
+            WHERE cliente_renta_id = clientes_renta.id AND estado IN ('Pendiente', 'Atrasado')
+            ORDER BY fecha_vencimiento LIMIT 1
+        )
+    """)
+
+    # Listado ordenado o filtrado por vencimiento, con y sin filtro de estado
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_clientes_vencimiento ON clientes_renta(proximo_vencimiento)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_clientes_estado_vencimiento "
+        "ON clientes_renta(estado, proximo_vencimiento)"
+    )
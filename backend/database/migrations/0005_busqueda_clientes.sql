@@ -0,0 +1,66 @@
+-- Búsqueda de clientes (FTS5) por empresa, contacto, teléfono y cédula.
+-- Tabla sin contenido propio (content=''): solo guarda el índice y la
+-- búsqueda devuelve ids de clientes_renta. La columna `digitos` lleva el
+-- teléfono y la cédula sin separadores, y los últimos 7 dígitos del teléfono,
+-- para encontrar "8095551234", "555-1234" o "5551234" por igual.
+-- Los triggers la mantienen en la misma transacción que cada escritura.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(
+    nombre_empresa, contacto_nombre, telefono, cedula, digitos,
+    content='',
+    tokenize="unicode61 remove_diacritics 2",
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_insert
+AFTER INSERT ON clientes_renta
+BEGIN
+    INSERT INTO clientes_fts (rowid, nombre_empresa, contacto_nombre, telefono, cedula, digitos)
+    SELECT NEW.id, NEW.nombre_empresa, NEW.contacto_nombre, NEW.telefono, COALESCE(NEW.cedula, ''),
+           tel || ' ' || substr(tel, -7) || ' ' || ced
+    FROM (SELECT
+        replace(replace(replace(replace(replace(replace(NEW.telefono, '-', ''), ' ', ''), '(', ''), ')', ''), '+', ''), '.', '') AS tel,
+        replace(replace(replace(COALESCE(NEW.cedula, ''), '-', ''), ' ', ''), '.', '') AS ced
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_delete
+AFTER DELETE ON clientes_renta
+BEGIN
+    INSERT INTO clientes_fts (clientes_fts, rowid, nombre_empresa, contacto_nombre, telefono, cedula, digitos)
+    SELECT 'delete', OLD.id, OLD.nombre_empresa, OLD.contacto_nombre, OLD.telefono, COALESCE(OLD.cedula, ''),
+           tel || ' ' || substr(tel, -7) || ' ' || ced
+    FROM (SELECT
+        replace(replace(replace(replace(replace(replace(OLD.telefono, '-', ''), ' ', ''), '(', ''), ')', ''), '+', ''), '.', '') AS tel,
+        replace(replace(replace(COALESCE(OLD.cedula, ''), '-', ''), ' ', ''), '.', '') AS ced
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_update
+AFTER UPDATE OF nombre_empresa, contacto_nombre, telefono, cedula ON clientes_renta
+BEGIN
+    INSERT INTO clientes_fts (clientes_fts, rowid, nombre_empresa, contacto_nombre, telefono, cedula, digitos)
+    SELECT 'delete', OLD.id, OLD.nombre_empresa, OLD.contacto_nombre, OLD.telefono, COALESCE(OLD.cedula, ''),
+           tel || ' ' || substr(tel, -7) || ' ' || ced
+    FROM (SELECT
+        replace(replace(replace(replace(replace(replace(OLD.telefono, '-', ''), ' ', ''), '(', ''), ')', ''), '+', ''), '.', '') AS tel,
+        replace(replace(replace(COALESCE(OLD.cedula, ''), '-', ''), ' ', ''), '.', '') AS ced
+    );
+    INSERT INTO clientes_fts (rowid, nombre_empresa, contacto_nombre, telefono, cedula, digitos)
+    SELECT NEW.id, NEW.nombre_empresa, NEW.contacto_nombre, NEW.telefono, COALESCE(NEW.cedula, ''),
+           tel || ' ' || substr(tel, -7) || ' ' || ced
+    FROM (SELECT
+        replace(replace(replace(replace(replace(replace(NEW.telefono, '-', ''), ' ', ''), '(', ''), ')', ''), '+', ''), '.', '') AS tel,
+        replace(replace(replace(COALESCE(NEW.cedula, ''), '-', ''), ' ', ''), '.', '') AS ced
+    );
+END;
+
+-- Clientes ya existentes
+INSERT INTO clientes_fts (rowid, nombre_empresa, contacto_nombre, telefono, cedula, digitos)
+SELECT id, nombre_empresa, contacto_nombre, telefono, COALESCE(cedula, ''),
+       tel || ' ' || substr(tel, -7) || ' ' || ced
+FROM (SELECT id, nombre_empresa, contacto_nombre, telefono, cedula,
+    replace(replace(replace(replace(replace(replace(telefono, '-', ''), ' ', ''), '(', ''), ')', ''), '+', ''), '.', '') AS tel,
+    replace(replace(replace(COALESCE(cedula, ''), '-', ''), ' ', ''), '.', '') AS ced
+    FROM clientes_renta
+);
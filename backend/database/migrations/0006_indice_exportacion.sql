@@ -0,0 +1,9 @@
+-- Exportación de pagos por lotes con keyset sobre (fecha_pago, id).
+-- en-linea
+
+-- Cada lote sigue al anterior en el índice sin ordenar nada; estado y monto
+-- siguen cubiertos para los ingresos mensuales por fecha de pago.
+-- Reemplaza a idx_pagos_fecha_pago_cubre.
+CREATE INDEX IF NOT EXISTS idx_pagos_fecha_pago_id
+    ON pagos_renta(fecha_pago, id, estado, monto);
+DROP INDEX IF EXISTS idx_pagos_fecha_pago_cubre;
@@ -0,0 +1,11 @@
+"""
+Revocación de sesiones por usuario.
+Los tokens emitidos antes de `usuarios.sesiones_desde` (segundos Unix) dejan de
+valer; update_admin_password.py la actualiza al cambiar la contraseña.
+"""
+
+
+def migrar(conn):
+    columnas = {row[1] for row in conn.execute("PRAGMA table_info(usuarios)")}
+    if 'sesiones_desde' not in columnas:
+        conn.execute("ALTER TABLE usuarios ADD COLUMN sesiones_desde INTEGER")
@@ -0,0 +1,5 @@
+-- Eventos de licencias sin claves.
+-- licencias_verificadas y licencias_expiradas publicaban la lista de
+-- licencia_key en el feed SSE; se borran los ya guardados para que no se
+-- vuelvan a enviar al reanudar.
+DELETE FROM eventos WHERE tipo IN ('licencias_verificadas', 'licencias_expiradas');
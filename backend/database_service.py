@@ -2,125 +2,284 @@
 Servicio de Base de Datos
 Operaciones CRUD y lógica de negocio
 """
+import base64
+import functools
+import re
 import sqlite3
 from datetime import date, datetime, timedelta
 from typing import List, Optional
 import secrets
+
+import anyio
+
+from cache import TTLCache
+from calendario import calendario
 from config import settings
+from connection_pool import pool
+from heartbeat_buffer import HeartbeatBuffer
+import license_lease
+import eventos
+import outbox
+import resumen
+from whatsapp_service import formatear_telefono, telefono_destino, whatsapp_service
+
+# Marca para distinguir "licencia inexistente en caché" de "no está en caché"
+_LICENCIA_INEXISTENTE = object()
+
+# Columnas de un cliente en listados y detalle; el primer parámetro es la fecha
+# de hoy y los días hasta el vencimiento salen de SQL (NULL sin pago abierto)
+_COLUMNAS_CLIENTE = """
+    c.*, c.proximo_vencimiento AS proximo_pago,
+    CAST(julianday(c.proximo_vencimiento) - julianday(?) AS INTEGER) AS dias_hasta_vencimiento
+"""
+
+# Orden de /api/clientes; siempre termina en el id para que el keyset sea estable
+_ORDEN_CLIENTES = {
+    'nombre': "c.nombre_empresa, c.id",
+    'vencimiento': "c.proximo_vencimiento, c.id",
+    'recientes': "c.id DESC",
+}
+
+
+def _consulta_fts(texto: str) -> Optional[str]:
+    """Convierte lo escrito en una consulta FTS5: cada palabra como prefijo, todas requeridas.
+
+    Las palabras van entre comillas, así ningún carácter del usuario se
+    interpreta como sintaxis de FTS5.
+    """
+    palabras = re.findall(r"\w+", texto)
+    if not palabras:
+        return None
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
 
 class DatabaseService:
     def __init__(self):
         self.db_path = settings.DATABASE_PATH
+        self.pool = pool
+        self.license_cache = TTLCache(
+            maxsize=settings.LICENSE_CACHE_MAX_ENTRIES,
+            ttl=settings.LICENSE_CACHE_TTL_SECONDS,
+        )
+        self.heartbeats = HeartbeatBuffer(
+            self.pool,
+            flush_interval=settings.HEARTBEAT_FLUSH_INTERVAL_SECONDS,
+            max_pending=settings.HEARTBEAT_FLUSH_MAX_PENDING,
+        )
+        self.outbox = outbox.NotificationOutbox(
+            self.pool,
+            whatsapp_service,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            poll_interval=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            backoff_base=settings.OUTBOX_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.OUTBOX_BACKOFF_MAX_SECONDS,
+        )
     
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Conexión prestada del pool, usar como `with self.get_connection() as conn:`"""
+        return self.pool.connection()
+    
+    def get_version_datos(self) -> int:
+        """Versión actual de clientes y pagos (la suben los triggers en cada escritura)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM version_datos WHERE id = 1")
+            return cursor.fetchone()['version']
+    
+    def get_usuario_activo(self, username: str) -> Optional[dict]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM usuarios WHERE username = ? AND activo = 1", (username,))
+            row = cursor.fetchone()
+        return dict(row) if row else None
     
     def generate_license_key(self) -> str:
         return f"AS-{secrets.token_hex(8).upper()}"
     
     def create_cliente(self, cliente_data: dict) -> dict:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
         
-        licencia_key = self.generate_license_key()
+            licencia_key = self.generate_license_key()
         
-        cursor.execute("""
-            INSERT INTO clientes_renta 
-            (nombre_empresa, contacto_nombre, telefono, email, cedula, plan, precio_mensual, fecha_inicio, licencia_key)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            cliente_data['nombre_empresa'],
-            cliente_data['contacto_nombre'],
-            cliente_data['telefono'],
-            cliente_data.get('email'),
-            cliente_data.get('cedula'),
-            cliente_data['plan'],
-            cliente_data['precio_mensual'],
-            cliente_data['fecha_inicio'],
-            licencia_key
-        ))
-        
-        cliente_id = cursor.lastrowid
-        fecha_exp = datetime.strptime(cliente_data['fecha_inicio'], '%Y-%m-%d').date() + timedelta(days=30)
+            cursor.execute("""
+                INSERT INTO clientes_renta 
+                (nombre_empresa, contacto_nombre, telefono, telefono_e164, email, cedula, plan, precio_mensual, fecha_inicio, licencia_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                cliente_data['nombre_empresa'],
+                cliente_data['contacto_nombre'],
+                cliente_data['telefono'],
+                formatear_telefono(cliente_data['telefono']),
+                cliente_data.get('email'),
+                cliente_data.get('cedula'),
+                cliente_data['plan'],
+                cliente_data['precio_mensual'],
+                cliente_data['fecha_inicio'],
+                licencia_key
+            ))
         
-        cursor.execute("""
-            INSERT INTO licencias 
-            (cliente_renta_id, licencia_key, fecha_activacion, fecha_expiracion, estado)
-            VALUES (?, ?, ?, ?, 'Activa')
-        """, (cliente_id, licencia_key, cliente_data['fecha_inicio'], fecha_exp))
+            cliente_id = cursor.lastrowid
+            fecha_exp = datetime.strptime(cliente_data['fecha_inicio'], '%Y-%m-%d').date() + timedelta(days=30)
         
-        cursor.execute("""
-            INSERT INTO pagos_renta 
-            (cliente_renta_id, monto, fecha_pago, fecha_vencimiento, estado)
-            VALUES (?, ?, ?, ?, 'Pendiente')
-        """, (cliente_id, cliente_data['precio_mensual'], cliente_data['fecha_inicio'], fecha_exp))
-        
-        conn.commit()
-        cursor.execute("SELECT * FROM clientes_renta WHERE id = ?", (cliente_id,))
-        cliente = dict(cursor.fetchone())
-        conn.close()
+            cursor.execute("""
+                INSERT INTO licencias 
+                (cliente_renta_id, licencia_key, fecha_activacion, fecha_expiracion, estado)
+                VALUES (?, ?, ?, ?, 'Activa')
+            """, (cliente_id, licencia_key, cliente_data['fecha_inicio'], fecha_exp))
+        
+            cursor.execute("""
+                INSERT INTO pagos_renta 
+                (cliente_renta_id, monto, fecha_pago, fecha_vencimiento, estado)
+                VALUES (?, ?, ?, ?, 'Pendiente')
+            """, (cliente_id, cliente_data['precio_mensual'], cliente_data['fecha_inicio'], fecha_exp))
+            self._actualizar_proximo_vencimiento(cursor, cliente_id)
+            resumen.clasificar_cliente(cursor, cliente_id)
+            eventos.registrar(cursor, 'cliente_creado', {
+                "cliente_id": cliente_id, "nombre_empresa": cliente_data['nombre_empresa']
+            })
+        
+            conn.commit()
+            cursor.execute("SELECT * FROM clientes_renta WHERE id = ?", (cliente_id,))
+            cliente = dict(cursor.fetchone())
+        eventos.bus_eventos.notificar()
         return cliente
     
-    def get_clientes(self, estado: Optional[str] = None) -> List[dict]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def normalizar_telefonos(self, lote: int = 500) -> int:
+        """Completa telefono_e164 en clientes guardados antes de existir la columna"""
+        actualizados = 0
+        while True:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT id, telefono FROM clientes_renta WHERE telefono_e164 IS NULL LIMIT ?", (lote,)
+                )
+                filas = cursor.fetchall()
+                cursor.executemany(
+                    "UPDATE clientes_renta SET telefono_e164 = ? WHERE id = ?",
+                    [(formatear_telefono(f['telefono']), f['id']) for f in filas],
+                )
+                conn.commit()
+            actualizados += len(filas)
+            if len(filas) < lote:
+                return actualizados
+    
+    def _actualizar_proximo_vencimiento(self, cursor, cliente_id: int):
+        """Apunta proximo_vencimiento / proximo_pago_id al pago abierto más antiguo del cliente"""
+        cursor.execute("""
+            UPDATE clientes_renta SET (proximo_vencimiento, proximo_pago_id) = (
+                SELECT fecha_vencimiento, id FROM pagos_renta
+                WHERE cliente_renta_id = clientes_renta.id AND estado IN ('Pendiente', 'Atrasado')
+                ORDER BY fecha_vencimiento LIMIT 1
+            )
+            WHERE id = ?
+        """, (cliente_id,))
+    
+    def get_clientes(
+        self,
+        q: Optional[str] = None,
+        estado: Optional[str] = None,
+        plan: Optional[str] = None,
+        estado_pago: Optional[str] = None,
+        vence_en_dias: Optional[int] = None,
+        orden: str = 'nombre',
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> dict:
+        """Búsqueda de clientes con filtros, orden y paginación por keyset en SQL.
         
-        query = """
-            SELECT c.*, 
-                   (SELECT fecha_vencimiento FROM pagos_renta 
-                    WHERE cliente_renta_id = c.id AND estado = 'Pendiente' 
-                    ORDER BY fecha_vencimiento ASC LIMIT 1) as proximo_pago
-            FROM clientes_renta c
+        `q` busca por prefijo en empresa, contacto, teléfono y cédula con el
+        índice FTS5 `clientes_fts`. `vence_en_dias` deja solo los que tienen un
+        pago abierto que vence en los próximos N días, incluidos los ya
+        vencidos. Sin `limit` devuelve todos en una sola página.
         """
-        
+        hoy = date.today()
+        condiciones = []
+        params = [hoy.isoformat()]
+        consulta = _consulta_fts(q) if q else None
+        if consulta:
+            condiciones.append("c.id IN (SELECT rowid FROM clientes_fts WHERE clientes_fts MATCH ?)")
+            params.append(consulta)
         if estado:
-            query += " WHERE c.estado = ?"
-            cursor.execute(query + " ORDER BY c.nombre_empresa", (estado,))
-        else:
-            cursor.execute(query + " ORDER BY c.nombre_empresa")
+            condiciones.append("c.estado = ?")
+            params.append(estado)
+        if plan:
+            condiciones.append("c.plan = ?")
+            params.append(plan)
+        if estado_pago:
+            condiciones.append("c.estado_pago = ?")
+            params.append(estado_pago)
+        if vence_en_dias is not None:
+            condiciones.append("c.proximo_vencimiento <= ?")
+            params.append((hoy + timedelta(days=vence_en_dias)).isoformat())
+        if cursor:
+            condicion, valores = self._condicion_cursor_clientes(orden, cursor)
+            condiciones.append(condicion)
+            params.extend(valores)
         
-        clientes = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        limite = ""
+        if limit is not None:
+            limite = "LIMIT ?"
+            params.append(limit + 1)
+        with self.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT {_COLUMNAS_CLIENTE}
+                FROM clientes_renta c
+                {where}
+                ORDER BY {_ORDEN_CLIENTES[orden]}
+                {limite}
+            """, params)
+            clientes = [dict(row) for row in cur.fetchall()]
         
-        today = date.today()
-        for cliente in clientes:
-            if cliente['proximo_pago']:
-                proximo = datetime.strptime(cliente['proximo_pago'], '%Y-%m-%d').date()
-                cliente['dias_hasta_vencimiento'] = (proximo - today).days
+        siguiente = None
+        if limit is not None and len(clientes) > limit:
+            clientes = clientes[:limit]
+            ultimo = clientes[-1]
+            if orden == 'nombre':
+                siguiente = self._encode_cursor(ultimo['id'], ultimo['nombre_empresa'])
+            elif orden == 'vencimiento':
+                siguiente = self._encode_cursor(ultimo['id'], ultimo['proximo_vencimiento'] or '')
             else:
-                cliente['dias_hasta_vencimiento'] = None
+                siguiente = self._encode_cursor(ultimo['id'])
+        return {"clientes": clientes, "siguiente_cursor": siguiente}
+    
+    def _condicion_cursor_clientes(self, orden: str, cursor: str) -> tuple:
+        """Condición de keyset para continuar después del último cliente de la página.
         
-        return clientes
+        El cursor empieza por el id; el resto es el valor de la columna de
+        orden (un nombre puede contener el separador).
+        """
+        valores = self._decode_cursor(cursor)
+        if not valores[0].isdigit() or (orden != 'recientes' and len(valores) < 2):
+            raise ValueError("Cursor inválido")
+        cliente_id = int(valores[0])
+        valor = '|'.join(valores[1:])
+        if orden == 'nombre':
+            return "(c.nombre_empresa, c.id) > (?, ?)", [valor, cliente_id]
+        if orden == 'vencimiento':
+            if not valor:
+                # Los clientes sin pago abierto (NULL) van primero
+                return (
+                    "((c.proximo_vencimiento IS NULL AND c.id > ?) OR c.proximo_vencimiento IS NOT NULL)",
+                    [cliente_id],
+                )
+            return "(c.proximo_vencimiento, c.id) > (?, ?)", [valor, cliente_id]
+        return "c.id < ?", [cliente_id]
     
     def get_cliente(self, cliente_id: int) -> Optional[dict]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT c.*, 
-                   (SELECT fecha_vencimiento FROM pagos_renta 
-                    WHERE cliente_renta_id = c.id AND estado = 'Pendiente' 
-                    ORDER BY fecha_vencimiento ASC LIMIT 1) as proximo_pago
-            FROM clientes_renta c WHERE c.id = ?
-        """, (cliente_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            cliente = dict(row)
-            if cliente['proximo_pago']:
-                proximo = datetime.strptime(cliente['proximo_pago'], '%Y-%m-%d').date()
-                cliente['dias_hasta_vencimiento'] = (proximo - date.today()).days
-            return cliente
-        return None
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT {_COLUMNAS_CLIENTE}
+                FROM clientes_renta c WHERE c.id = ?
+            """, (date.today().isoformat(), cliente_id))
+            row = cursor.fetchone()
+        return dict(row) if row else None
     
     def update_cliente(self, cliente_id: int, update_data: dict) -> Optional[dict]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         fields = []
         values = []
         for key, value in update_data.items():
@@ -131,96 +290,255 @@ class DatabaseService:
         if not fields:
             return self.get_cliente(cliente_id)
         
+        if update_data.get('telefono'):
+            fields.append("telefono_e164 = ?")
+            values.append(formatear_telefono(update_data['telefono']))
+        
         values.append(cliente_id)
         query = f"UPDATE clientes_renta SET {', '.join(fields)}, ultima_modificacion = CURRENT_TIMESTAMP WHERE id = ?"
         
-        cursor.execute(query, values)
-        conn.commit()
-        conn.close()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, values)
+            if cursor.rowcount:
+                tipo = 'cliente_suspendido' if update_data.get('estado') == 'Suspendido' else 'cliente_actualizado'
+                eventos.registrar(cursor, tipo, {"cliente_id": cliente_id, "campos": sorted(update_data)})
+            if update_data.get('estado') == 'Activo':
+                # Al reactivarse vuelve a contar en el resumen con su estado de pago actual
+                resumen.clasificar_cliente(cursor, cliente_id)
+                self._restaurar_licencias(cursor, cliente_id)
+            elif update_data.get('estado') in ('Suspendido', 'Cancelado'):
+                self._revocar_licencias(cursor, cliente_id, update_data['estado'])
+            conn.commit()
+        
+        eventos.bus_eventos.notificar()
+        if 'estado' in update_data or 'nombre_empresa' in update_data:
+            self.invalidar_licencias_cliente(cliente_id)
         
         return self.get_cliente(cliente_id)
     
     def create_pago(self, pago_data: dict, username: str) -> dict:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO pagos_renta 
-            (cliente_renta_id, monto, fecha_pago, fecha_vencimiento, metodo_pago, referencia, estado, notas, registrado_por)
-            VALUES (?, ?, ?, ?, ?, ?, 'Pagado', ?, ?)
-        """, (
-            pago_data['cliente_renta_id'], pago_data['monto'],
-            pago_data['fecha_pago'], pago_data['fecha_vencimiento'],
-            pago_data.get('metodo_pago'), pago_data.get('referencia'),
-            pago_data.get('notas'), username
-        ))
-        
-        pago_id = cursor.lastrowid
+            cursor.execute("""
+                INSERT INTO pagos_renta 
+                (cliente_renta_id, monto, fecha_pago, fecha_vencimiento, metodo_pago, referencia, estado, notas, registrado_por)
+                VALUES (?, ?, ?, ?, ?, ?, 'Pagado', ?, ?)
+            """, (
+                pago_data['cliente_renta_id'], pago_data['monto'],
+                pago_data['fecha_pago'], pago_data['fecha_vencimiento'],
+                pago_data.get('metodo_pago'), pago_data.get('referencia'),
+                pago_data.get('notas'), username
+            ))
         
-        cursor.execute("""
-            UPDATE pagos_renta SET estado = 'Pagado' 
-            WHERE cliente_renta_id = ? AND estado = 'Pendiente' AND fecha_vencimiento <= ?
-        """, (pago_data['cliente_renta_id'], pago_data['fecha_pago']))
+            pago_id = cursor.lastrowid
         
-        fecha_siguiente = datetime.strptime(pago_data['fecha_vencimiento'], '%Y-%m-%d').date() + timedelta(days=30)
-        cursor.execute("""
-            INSERT INTO pagos_renta 
-            (cliente_renta_id, monto, fecha_pago, fecha_vencimiento, estado)
-            VALUES (?, ?, ?, ?, 'Pendiente')
-        """, (pago_data['cliente_renta_id'], pago_data['monto'], fecha_siguiente, fecha_siguiente))
+            # Los vencidos que se saldan guardan sus días de atraso finales, aunque
+            # el barrido todavía no los haya marcado 'Atrasado'
+            fecha_pago = date.fromisoformat(pago_data['fecha_pago'])
+            cursor.execute("""
+                SELECT id, fecha_vencimiento FROM pagos_renta
+                WHERE cliente_renta_id = ? AND estado IN ('Pendiente', 'Atrasado') AND fecha_vencimiento < ?
+            """, (pago_data['cliente_renta_id'], pago_data['fecha_pago']))
+            cursor.executemany("UPDATE pagos_renta SET dias_atraso = ? WHERE id = ?", [
+                (calendario.contar(date.fromisoformat(f['fecha_vencimiento']), fecha_pago), f['id'])
+                for f in cursor.fetchall()
+            ])
+            cursor.execute("""
+                UPDATE pagos_renta SET estado = 'Pagado' 
+                WHERE cliente_renta_id = ? AND estado IN ('Pendiente', 'Atrasado') AND fecha_vencimiento <= ?
+            """, (pago_data['cliente_renta_id'], pago_data['fecha_pago']))
         
-        cursor.execute("""
-            UPDATE licencias SET fecha_expiracion = ?, estado = 'Activa'
-            WHERE cliente_renta_id = ?
-        """, (fecha_siguiente, pago_data['cliente_renta_id']))
+            fecha_siguiente = datetime.strptime(pago_data['fecha_vencimiento'], '%Y-%m-%d').date() + timedelta(days=30)
+            cursor.execute("""
+                INSERT INTO pagos_renta 
+                (cliente_renta_id, monto, fecha_pago, fecha_vencimiento, estado)
+                VALUES (?, ?, ?, ?, 'Pendiente')
+            """, (pago_data['cliente_renta_id'], pago_data['monto'], fecha_siguiente, fecha_siguiente))
         
-        cursor.execute("""
-            UPDATE clientes_renta SET estado = 'Activo'
-            WHERE id = ? AND estado = 'Suspendido'
-        """, (pago_data['cliente_renta_id'],))
-        
-        conn.commit()
-        cursor.execute("SELECT * FROM pagos_renta WHERE id = ?", (pago_id,))
-        pago = dict(cursor.fetchone())
-        conn.close()
+            cursor.execute("""
+                UPDATE licencias SET fecha_expiracion = ?, estado = 'Activa'
+                WHERE cliente_renta_id = ?
+            """, (fecha_siguiente, pago_data['cliente_renta_id']))
+        
+            cursor.execute("""
+                UPDATE clientes_renta SET estado = 'Activo'
+                WHERE id = ? AND estado = 'Suspendido'
+            """, (pago_data['cliente_renta_id'],))
+            self._restaurar_licencias(cursor, pago_data['cliente_renta_id'])
+            self._actualizar_proximo_vencimiento(cursor, pago_data['cliente_renta_id'])
+            resumen.clasificar_cliente(cursor, pago_data['cliente_renta_id'])
+            eventos.registrar(cursor, 'pago_registrado', {
+                "pago_id": pago_id,
+                "cliente_id": pago_data['cliente_renta_id'],
+                "monto": pago_data['monto'],
+                "fecha_pago": pago_data['fecha_pago'],
+                "proximo_vencimiento": fecha_siguiente.isoformat(),
+            })
+            
+            cursor.execute("SELECT * FROM clientes_renta WHERE id = ?", (pago_data['cliente_renta_id'],))
+            cliente = cursor.fetchone()
+            if cliente:
+                cliente = dict(cliente)
+                outbox.encolar(
+                    cursor, f"pago_recibido:{pago_id}", cliente['id'], 'pago_recibido',
+                    telefono_destino(cliente),
+                    whatsapp_service.mensaje_confirmacion_pago(
+                        cliente, pago_data['monto'], pago_data['fecha_pago'], cursor
+                    ),
+                )
+        
+            conn.commit()
+            cursor.execute("SELECT * FROM pagos_renta WHERE id = ?", (pago_id,))
+            pago = dict(cursor.fetchone())
+        
+        self.invalidar_licencias_cliente(pago_data['cliente_renta_id'])
+        self.outbox.notificar()
+        eventos.bus_eventos.notificar()
         return pago
     
     def get_pagos_cliente(self, cliente_id: int, limit: int = 6) -> List[dict]:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT * FROM pagos_renta 
-            WHERE cliente_renta_id = ? 
-            ORDER BY fecha_vencimiento DESC LIMIT ?
-        """, (cliente_id, limit))
+            cursor.execute("""
+                SELECT * FROM pagos_renta 
+                WHERE cliente_renta_id = ? 
+                ORDER BY fecha_vencimiento DESC LIMIT ?
+            """, (cliente_id, limit))
         
-        pagos = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+            pagos = [dict(row) for row in cursor.fetchall()]
+        return self._con_dias_atraso(pagos)
+    
+    @staticmethod
+    def _con_dias_atraso(pagos: List[dict], hoy: Optional[date] = None) -> List[dict]:
+        """dias_atraso de los pagos vencidos sin saldar se calcula al leer.
+        
+        Guardarlo obligaría a reescribir cada día todas las filas sin pagar; la
+        columna solo guarda el valor final, que create_pago fija al saldarlos.
+        Un 'Pendiente' ya vencido cuenta igual aunque el barrido no lo haya
+        marcado 'Atrasado' todavía.
+        """
+        hoy = hoy or date.today()
+        hoy_iso = hoy.isoformat()
+        for pago in pagos:
+            if pago['estado'] != 'Pagado' and pago['fecha_vencimiento'] < hoy_iso:
+                pago['dias_atraso'] = calendario.contar(date.fromisoformat(pago['fecha_vencimiento']), hoy)
         return pagos
     
-    def verify_license(self, licencia_key: str) -> dict:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    @staticmethod
+    def _encode_cursor(*valores) -> str:
+        return base64.urlsafe_b64encode('|'.join(str(v) for v in valores).encode()).decode()
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> List[str]:
+        try:
+            return base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Cursor inválido")
+    
+    def get_pagos(
+        self,
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None,
+        estado: Optional[str] = None,
+        metodo_pago: Optional[str] = None,
+        cliente_id: Optional[int] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> dict:
+        """Pagos de todos los clientes, del vencimiento más reciente al más antiguo.
         
-        cursor.execute("""
-            SELECT l.*, c.nombre_empresa, c.estado as cliente_estado
-            FROM licencias l
-            JOIN clientes_renta c ON l.cliente_renta_id = c.id
-            WHERE l.licencia_key = ?
-        """, (licencia_key,))
+        Paginación por keyset sobre (fecha_vencimiento, id): cada página cuesta
+        lo mismo sin importar cuánto historial haya antes.
+        """
+        condiciones = []
+        params = []
+        if desde:
+            condiciones.append("p.fecha_vencimiento >= ?")
+            params.append(desde)
+        if hasta:
+            condiciones.append("p.fecha_vencimiento <= ?")
+            params.append(hasta)
+        if estado:
+            condiciones.append("p.estado = ?")
+            params.append(estado)
+        if metodo_pago:
+            condiciones.append("p.metodo_pago = ?")
+            params.append(metodo_pago)
+        if cliente_id is not None:
+            condiciones.append("p.cliente_renta_id = ?")
+            params.append(cliente_id)
+        if cursor:
+            valores = self._decode_cursor(cursor)
+            if len(valores) != 2 or not valores[1].isdigit():
+                raise ValueError("Cursor inválido")
+            condiciones.append("(p.fecha_vencimiento, p.id) < (?, ?)")
+            params.extend([valores[0], int(valores[1])])
         
-        row = cursor.fetchone()
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        with self.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT p.*, c.nombre_empresa, c.plan
+                FROM pagos_renta p
+                JOIN clientes_renta c ON c.id = p.cliente_renta_id
+                {where}
+                ORDER BY p.fecha_vencimiento DESC, p.id DESC
+                LIMIT ?
+            """, params + [limit + 1])
+            pagos = [dict(row) for row in cur.fetchall()]
         
-        if not row:
-            conn.close()
-            return {"valid": False, "message": "Licencia no encontrada"}
+        siguiente = None
+        if len(pagos) > limit:
+            pagos = pagos[:limit]
+            ultimo = pagos[-1]
+            siguiente = self._encode_cursor(ultimo['fecha_vencimiento'], ultimo['id'])
+        return {"pagos": self._con_dias_atraso(pagos), "siguiente_cursor": siguiente}
+    
+    def _get_licencias(self, licencia_keys: List[str]) -> dict:
+        """Datos de verificación por licencia, desde caché o con una sola consulta para las faltantes"""
+        licencias = {}
+        faltantes = []
+        for licencia_key in licencia_keys:
+            licencia = self.license_cache.get(licencia_key)
+            if licencia is None:
+                faltantes.append(licencia_key)
+            else:
+                licencias[licencia_key] = None if licencia is _LICENCIA_INEXISTENTE else licencia
         
-        licencia = dict(row)
+        if faltantes:
+            encontradas = {}
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                # Lotes por debajo del límite de parámetros de SQLite
+                for i in range(0, len(faltantes), 500):
+                    lote = faltantes[i:i + 500]
+                    placeholders = ', '.join('?' for _ in lote)
+                    cursor.execute(f"""
+                        SELECT l.licencia_key, l.estado, l.fecha_expiracion, c.nombre_empresa, c.estado as cliente_estado
+                        FROM licencias l
+                        JOIN clientes_renta c ON l.cliente_renta_id = c.id
+                        WHERE l.licencia_key IN ({placeholders})
+                    """, lote)
+                    for row in cursor.fetchall():
+                        licencia = dict(row)
+                        encontradas[licencia.pop('licencia_key')] = licencia
+            
+            for licencia_key in faltantes:
+                licencia = encontradas.get(licencia_key)
+                self.license_cache.set(licencia_key, licencia if licencia else _LICENCIA_INEXISTENTE)
+                licencias[licencia_key] = licencia
         
-        cursor.execute("UPDATE licencias SET ultima_conexion = CURRENT_TIMESTAMP WHERE licencia_key = ?", (licencia_key,))
-        conn.commit()
-        conn.close()
+        return licencias
+    
+    def _get_licencia(self, licencia_key: str) -> Optional[dict]:
+        return self._get_licencias([licencia_key])[licencia_key]
+    
+    def _evaluar_licencia(self, licencia: Optional[dict]) -> dict:
+        if not licencia:
+            return {"valid": False, "message": "Licencia no encontrada"}
         
         if licencia['cliente_estado'] == 'Suspendido':
             return {"valid": False, "message": "Licencia suspendida por falta de pago"}
@@ -239,61 +557,602 @@ class DatabaseService:
             "expira": licencia['fecha_expiracion']
         }
     
+    def verify_license(self, licencia_key: str) -> dict:
+        licencia = self._get_licencia(licencia_key)
+        if licencia:
+            # ultima_conexion se escribe por lotes desde el buffer
+            self.heartbeats.record(licencia_key)
+        return self._evaluar_licencia(licencia)
+    
+    def verify_licenses(self, licencia_keys: List[str]) -> dict:
+        """Verifica varias licencias; devuelve {licencia_key: resultado de verify_license}"""
+        licencia_keys = list(dict.fromkeys(licencia_keys))
+        licencias = self._get_licencias(licencia_keys)
+        
+        self.heartbeats.record_many([key for key in licencia_keys if licencias[key]])
+        return {key: self._evaluar_licencia(licencias[key]) for key in licencia_keys}
+    
+    def emitir_lease(self, licencia_key: str, dispositivo_id: Optional[str] = None) -> dict:
+        """Emite un lease firmado si la licencia está vigente"""
+        licencia = self._get_licencia(licencia_key)
+        resultado = self._evaluar_licencia(licencia)
+        if licencia:
+            self.heartbeats.record(licencia_key)
+        if not resultado['valid']:
+            return resultado
+        return license_lease.emitir_lease(licencia_key, licencia, dispositivo_id)
+    
+    def renovar_lease(self, token: str) -> dict:
+        """Renueva un lease (aunque haya expirado) revalidando el estado actual de la licencia"""
+        claims = license_lease.decodificar_lease(token, verificar_expiracion=False)
+        return self.emitir_lease(claims['sub'], claims.get('dispositivo'))
+    
+    def get_licencias_revocadas(self, desde: Optional[str] = None) -> List[dict]:
+        """Revocadas identificadas por el hash de la clave (ver license_lease.hash_licencia)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if desde:
+                cursor.execute("""
+                    SELECT licencia_key, motivo, fecha_revocacion FROM licencias_revocadas
+                    WHERE fecha_revocacion > ? ORDER BY fecha_revocacion
+                """, (desde,))
+            else:
+                cursor.execute("""
+                    SELECT licencia_key, motivo, fecha_revocacion FROM licencias_revocadas
+                    ORDER BY fecha_revocacion
+                """)
+            filas = cursor.fetchall()
+        
+        return [
+            {
+                "licencia_hash": license_lease.hash_licencia(fila['licencia_key']),
+                "motivo": fila['motivo'],
+                "fecha_revocacion": fila['fecha_revocacion'],
+            }
+            for fila in filas
+        ]
+    
+    def _revocar_licencias(self, cursor, cliente_id: int, motivo: str):
+        cursor.execute("""
+            INSERT OR REPLACE INTO licencias_revocadas (licencia_key, motivo, fecha_revocacion)
+            SELECT licencia_key, ?, CURRENT_TIMESTAMP FROM licencias WHERE cliente_renta_id = ?
+        """, (motivo, cliente_id))
+    
+    def _restaurar_licencias(self, cursor, cliente_id: int):
+        cursor.execute("""
+            DELETE FROM licencias_revocadas
+            WHERE licencia_key IN (SELECT licencia_key FROM licencias WHERE cliente_renta_id = ?)
+        """, (cliente_id,))
+    
+    def invalidar_licencias_cliente(self, cliente_id: int):
+        """Descarta de la caché las licencias de un cliente tras un cambio de estado"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT licencia_key FROM licencias WHERE cliente_renta_id = ?", (cliente_id,))
+            keys = [row['licencia_key'] for row in cursor.fetchall()]
+        
+        for licencia_key in keys:
+            self.license_cache.invalidate(licencia_key)
+    
     def suspend_license(self, cliente_id: int) -> bool:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("UPDATE licencias SET estado = 'Suspendida' WHERE cliente_renta_id = ?", (cliente_id,))
-        cursor.execute("UPDATE clientes_renta SET estado = 'Suspendido' WHERE id = ?", (cliente_id,))
+            cursor.execute("UPDATE licencias SET estado = 'Suspendida' WHERE cliente_renta_id = ?", (cliente_id,))
+            cursor.execute("UPDATE clientes_renta SET estado = 'Suspendido' WHERE id = ?", (cliente_id,))
+            if cursor.rowcount:
+                eventos.registrar(cursor, 'cliente_suspendido', {"cliente_id": cliente_id})
+            self._revocar_licencias(cursor, cliente_id, 'Suspendido')
         
-        conn.commit()
-        conn.close()
+            conn.commit()
+        
+        eventos.bus_eventos.notificar()
+        self.invalidar_licencias_cliente(cliente_id)
         return True
     
-    def get_dashboard_data(self) -> dict:
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    # ==================== MORA ====================
+    
+    def get_clientes_en_mora(
+        self,
+        dias_minimos: int = 5,
+        hoy: Optional[date] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> dict:
+        """Clientes cuyo pago pendiente más antiguo lleva `dias_minimos` días laborables vencido.
         
-        mes_actual = date.today().replace(day=1)
-        cursor.execute("""
-            SELECT 
-                SUM(CASE WHEN estado = 'Pagado' THEN monto ELSE 0 END) as cobrado,
-                SUM(CASE WHEN estado = 'Pendiente' THEN monto ELSE 0 END) as pendiente
-            FROM pagos_renta WHERE fecha_vencimiento >= ?
-        """, (mes_actual,))
+        Los días laborables excluyen feriados (ver `calendario`). El umbral se
+        traduce a una fecha límite de vencimiento, de modo que la selección se
+        hace completa en SQL. Orden: el atraso más antiguo primero,
+        con paginación por keyset sobre (fecha_vencimiento, cliente id).
+        """
+        hoy = hoy or date.today()
+        limite = calendario.fecha_limite(hoy, dias_minimos).isoformat()
         
-        resumen = cursor.fetchone()
-        cobrado = resumen['cobrado'] or 0
-        pendiente = resumen['pendiente'] or 0
+        condiciones = []
+        params = [limite]
+        if cursor:
+            valores = self._decode_cursor(cursor)
+            if len(valores) != 2 or not valores[1].isdigit():
+                raise ValueError("Cursor inválido")
+            condiciones.append("(m.fecha_vencimiento, c.id) > (?, ?)")
+            params.extend([valores[0], int(valores[1])])
+        filtro_cursor = "".join(f" AND {condicion}" for condicion in condiciones)
         
-        today = date.today()
-        tres_dias = today + timedelta(days=3)
+        # Pendientes por cliente: en SQLite las columnas sin agregar toman los
+        # valores de la fila del MIN(), es decir, del pago más antiguo
+        pendientes = """
+            SELECT cliente_renta_id, MIN(fecha_vencimiento) AS fecha_vencimiento,
+                   id AS pago_id, monto AS monto_pendiente, COUNT(*) AS pagos_pendientes
+            FROM pagos_renta
+            WHERE estado IN ('Pendiente', 'Atrasado') AND fecha_vencimiento <= ?
+            GROUP BY cliente_renta_id
+        """
+        with self.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT c.*, m.fecha_vencimiento, m.pago_id, m.monto_pendiente, m.pagos_pendientes
+                FROM ({pendientes}) m
+                JOIN clientes_renta c ON c.id = m.cliente_renta_id
+                WHERE c.estado != 'Cancelado'{filtro_cursor}
+                ORDER BY m.fecha_vencimiento, c.id
+                LIMIT ?
+            """, params + [limit + 1])
+            clientes = [dict(row) for row in cur.fetchall()]
+            
+            total = None
+            if not cursor:
+                cur.execute(f"""
+                    SELECT COUNT(*) FROM ({pendientes}) m
+                    JOIN clientes_renta c ON c.id = m.cliente_renta_id
+                    WHERE c.estado != 'Cancelado'
+                """, (limite,))
+                total = cur.fetchone()[0]
         
-        cursor.execute("""
-            SELECT COUNT(*) as total FROM clientes_renta WHERE estado = 'Activo'
-        """)
-        total_clientes = cursor.fetchone()['total']
+        siguiente = None
+        if len(clientes) > limit:
+            clientes = clientes[:limit]
+            ultimo = clientes[-1]
+            siguiente = self._encode_cursor(ultimo['fecha_vencimiento'], ultimo['id'])
         
-        cursor.execute("""
-            SELECT SUM(precio_mensual) as total FROM clientes_renta WHERE estado = 'Activo'
-        """)
-        ingresos_proyectados = cursor.fetchone()['total'] or 0
+        for cliente in clientes:
+            vencimiento = date.fromisoformat(cliente['fecha_vencimiento'])
+            cliente['dias_mora'] = calendario.contar(vencimiento, hoy)
         
-        conn.close()
+        return {"total": total, "clientes": clientes, "siguiente_cursor": siguiente}
+    
+    # ==================== NOTIFICACIONES ====================
+    
+    def encolar_notificaciones_mora(self, dias_minimos: int = 5, hoy: Optional[date] = None) -> dict:
+        """Encola la notificación de mora de cada cliente atrasado.
+        
+        La clave de idempotencia incluye el pago y el día, así que repetir la
+        ejecución el mismo día no duplica mensajes.
+        """
+        hoy = hoy or date.today()
+        total = None
+        encolados = 0
+        cursor_pagina = None
+        while True:
+            pagina = self.get_clientes_en_mora(
+                dias_minimos=dias_minimos, hoy=hoy, limit=500, cursor=cursor_pagina
+            )
+            if total is None:
+                total = pagina['total']
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                for cliente in pagina['clientes']:
+                    encolados += outbox.encolar(
+                        cursor, f"mora:{cliente['pago_id']}:{hoy.isoformat()}", cliente['id'], 'mora',
+                        telefono_destino(cliente),
+                        whatsapp_service.mensaje_mora(
+                            cliente, cliente['dias_mora'], cliente['fecha_vencimiento'], cursor
+                        ),
+                    )
+                conn.commit()
+            cursor_pagina = pagina['siguiente_cursor']
+            if not cursor_pagina:
+                break
+        
+        self.outbox.notificar()
+        return {"total_clientes": total, "encolados": encolados, "duplicados": total - encolados}
+    
+    def encolar_recordatorios(self, dias_laborables: int = 3, hoy: Optional[date] = None) -> dict:
+        """Encola un recordatorio por cada pago pendiente que vence en los próximos días laborables"""
+        hoy = hoy or date.today()
+        hasta = calendario.sumar(hoy, dias_laborables)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.*, p.id AS pago_id, p.fecha_vencimiento
+                FROM pagos_renta p
+                JOIN clientes_renta c ON c.id = p.cliente_renta_id
+                WHERE p.estado = 'Pendiente' AND p.fecha_vencimiento > ? AND p.fecha_vencimiento <= ?
+                  AND c.estado = 'Activo'
+            """, (hoy.isoformat(), hasta.isoformat()))
+            pagos = [dict(row) for row in cursor.fetchall()]
+            
+            encolados = 0
+            for pago in pagos:
+                dias_restantes = (date.fromisoformat(pago['fecha_vencimiento']) - hoy).days
+                encolados += outbox.encolar(
+                    cursor, f"recordatorio:{pago['pago_id']}:{hoy.isoformat()}", pago['id'], 'recordatorio',
+                    telefono_destino(pago),
+                    whatsapp_service.mensaje_recordatorio(pago, dias_restantes, pago['fecha_vencimiento'], cursor),
+                )
+            conn.commit()
+        
+        self.outbox.notificar()
+        return {"total_pagos": len(pagos), "encolados": encolados, "duplicados": len(pagos) - encolados}
+    
+    # ==================== BARRIDOS PROGRAMADOS ====================
+    
+    def barrido_pagos_atrasados(self, watermark: Optional[str], hoy: Optional[date] = None, lote: int = 500) -> tuple:
+        """Marca como 'Atrasado' los pagos pendientes vencidos.
+        
+        `watermark` es el último día procesado; si ya es hoy no hay nada nuevo.
+        Se leen por idx_pagos_estado_vencimiento solo las filas aún 'Pendiente'
+        con vencimiento pasado: las que cruzaron la fecha desde la última
+        ejecución (o se registraron ya vencidas). Las que ya están atrasadas no
+        se tocan; dias_atraso se calcula al leer (ver _con_dias_atraso).
+        """
+        hoy = hoy or date.today()
+        if watermark and watermark >= hoy.isoformat():
+            return watermark, {"atrasados": 0}
+        
+        atrasados = 0
+        while True:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT id FROM pagos_renta
+                    WHERE estado = 'Pendiente' AND fecha_vencimiento < ?
+                    ORDER BY fecha_vencimiento, id
+                    LIMIT ?
+                """, (hoy.isoformat(), lote))
+                ids = [(f['id'],) for f in cursor.fetchall()]
+                cursor.executemany(
+                    "UPDATE pagos_renta SET estado = 'Atrasado' WHERE id = ? AND estado = 'Pendiente'", ids
+                )
+                conn.commit()
+            atrasados += len(ids)
+            if len(ids) < lote:
+                break
+        
+        return hoy.isoformat(), {"atrasados": atrasados}
+    
+    def barrido_licencias_expiradas(self, watermark: Optional[str], hoy: Optional[date] = None, lote: int = 500) -> tuple:
+        """Marca como 'Expirada' las licencias activas cuya fecha_expiracion ya pasó"""
+        hoy = hoy or date.today()
+        if watermark and watermark >= hoy.isoformat():
+            return watermark, {"expiradas": 0}
+        
+        expiradas = 0
+        while True:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT licencia_key, cliente_renta_id FROM licencias
+                    WHERE estado = 'Activa' AND fecha_expiracion < ?
+                    LIMIT ?
+                """, (hoy.isoformat(), lote))
+                filas = cursor.fetchall()
+                keys = [row['licencia_key'] for row in filas]
+                cursor.executemany("""
+                    UPDATE licencias SET estado = 'Expirada'
+                    WHERE licencia_key = ? AND estado = 'Activa'
+                """, [(key,) for key in keys])
+                if keys:
+                    # El feed llega a cada navegador: clientes afectados, nunca las claves
+                    eventos.registrar(cursor, 'licencias_expiradas', {
+                        "total": len(keys),
+                        "cliente_ids": sorted({row['cliente_renta_id'] for row in filas}),
+                    })
+                conn.commit()
+            for licencia_key in keys:
+                self.license_cache.invalidate(licencia_key)
+            expiradas += len(keys)
+            if len(keys) < lote:
+                break
+        
+        eventos.bus_eventos.notificar()
+        return hoy.isoformat(), {"expiradas": expiradas}
+    
+    def barrido_notificaciones(self, watermark: Optional[str], ahora: Optional[datetime] = None) -> tuple:
+        """Encola una vez al día, a partir de NOTIFICACIONES_HORA, los avisos de mora y los recordatorios"""
+        ahora = ahora or datetime.now()
+        hoy = ahora.date()
+        if (watermark and watermark >= hoy.isoformat()) or ahora.hour < settings.NOTIFICACIONES_HORA:
+            return watermark, None
+        
+        return hoy.isoformat(), {
+            "mora": self.encolar_notificaciones_mora(dias_minimos=5, hoy=hoy),
+            "recordatorios": self.encolar_recordatorios(dias_laborables=3, hoy=hoy),
+        }
+    
+    def preparar_resumen(self) -> bool:
+        """Construye el resumen del dashboard si la base aún no lo tiene"""
+        with self.get_connection() as conn:
+            return resumen.asegurar(conn)
+    
+    def barrido_estado_clientes(self, watermark: Optional[str], hoy: Optional[date] = None) -> tuple:
+        """Reclasifica una vez al día a los clientes en al_dia / por_vencer / atrasado"""
+        hoy = hoy or date.today()
+        if watermark and watermark >= hoy.isoformat():
+            return watermark, {"reclasificados": 0}
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cambios = resumen.clasificar_todos(cursor, hoy)
+            conn.commit()
+        return hoy.isoformat(), {"reclasificados": cambios}
+    
+    def get_dashboard_data(self) -> dict:
+        hoy = date.today()
+        with self.get_connection() as conn:
+            datos = resumen.leer(conn.cursor(), hoy.strftime('%Y-%m'))
+        
+        if datos is None or datos['fecha_estados'] != hoy.isoformat():
+            # Primer acceso del día sin que el barrido haya corrido todavía
+            self.preparar_resumen()
+            self.barrido_estado_clientes(None, hoy)
+            with self.get_connection() as conn:
+                datos = resumen.leer(conn.cursor(), hoy.strftime('%Y-%m'))
         
         return {
             "resumen_mes": {
-                "por_cobrar": cobrado + pendiente,
-                "cobrado": cobrado,
-                "pendiente": pendiente
+                "por_cobrar": round(datos['cobrado'] + datos['pendiente'], 2),
+                "cobrado": datos['cobrado'],
+                "pendiente": datos['pendiente']
             },
             "estado_clientes": {
-                "al_dia": 0,
-                "por_vencer": 0,
-                "atrasados": 0
+                "al_dia": datos['al_dia'],
+                "por_vencer": datos['por_vencer'],
+                "atrasados": datos['atrasados']
             },
-            "total_clientes": total_clientes,
-            "ingresos_proyectados": ingresos_proyectados
+            "total_clientes": datos['total_activos'],
+            "ingresos_proyectados": datos['ingresos_proyectados']
         }
 
+    # ==================== REPORTES ====================
+    
+    def get_ingresos_mensuales(self, desde: str, hasta: str) -> List[dict]:
+        """Montos por mes de fecha_pago y estado en el rango [desde, hasta]"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT strftime('%Y-%m', fecha_pago) as mes,
+                       COALESCE(SUM(CASE WHEN estado = 'Pagado' THEN monto END), 0) as cobrado,
+                       COALESCE(SUM(CASE WHEN estado = 'Pendiente' THEN monto END), 0) as pendiente,
+                       COALESCE(SUM(CASE WHEN estado = 'Atrasado' THEN monto END), 0) as atrasado,
+                       COUNT(*) as pagos
+                FROM pagos_renta
+                WHERE fecha_pago BETWEEN ? AND ?
+                GROUP BY mes
+                ORDER BY mes
+            """, (desde, hasta))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_ingresos_por_plan(self, desde: str, hasta: str) -> List[dict]:
+        """Ingresos cobrados por plan del cliente; incluye planes sin pagos en el rango"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.plan,
+                       COALESCE(SUM(p.monto), 0) as ingresos,
+                       COUNT(p.id) as pagos,
+                       COUNT(DISTINCT c.id) as clientes
+                FROM clientes_renta c
+                LEFT JOIN pagos_renta p
+                       ON p.cliente_renta_id = c.id
+                      AND p.estado = 'Pagado'
+                      AND p.fecha_pago BETWEEN ? AND ?
+                GROUP BY c.plan
+                ORDER BY c.plan
+            """, (desde, hasta))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_ingresos_por_metodo(self, desde: str, hasta: str) -> List[dict]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT metodo_pago, SUM(monto) as ingresos, COUNT(*) as pagos
+                FROM pagos_renta
+                WHERE estado = 'Pagado' AND fecha_pago BETWEEN ? AND ?
+                GROUP BY metodo_pago
+                ORDER BY ingresos DESC
+            """, (desde, hasta))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_tasa_cobro(self, desde: str, hasta: str) -> dict:
+        """Proporción cobrada de lo facturado con vencimiento en el rango"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COALESCE(SUM(monto), 0) as facturado,
+                       COALESCE(SUM(CASE WHEN estado = 'Pagado' THEN monto END), 0) as cobrado,
+                       COALESCE(SUM(CASE WHEN estado = 'Pendiente' THEN monto END), 0) as pendiente,
+                       COALESCE(SUM(CASE WHEN estado = 'Atrasado' THEN monto END), 0) as atrasado
+                FROM pagos_renta
+                WHERE fecha_vencimiento BETWEEN ? AND ?
+            """, (desde, hasta))
+            tasa = dict(cursor.fetchone())
+        
+        tasa['tasa_cobro'] = round(tasa['cobrado'] / tasa['facturado'], 4) if tasa['facturado'] else 0.0
+        return tasa
+    
+    def get_top_clientes(self, desde: str, hasta: str, limit: int = 10) -> List[dict]:
+        """Clientes que más pagaron en el rango de fecha_pago"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT c.id, c.nombre_empresa, c.plan,
+                       SUM(p.monto) as ingresos, COUNT(*) as pagos
+                FROM pagos_renta p
+                JOIN clientes_renta c ON c.id = p.cliente_renta_id
+                WHERE p.estado = 'Pagado' AND p.fecha_pago BETWEEN ? AND ?
+                GROUP BY p.cliente_renta_id
+                ORDER BY ingresos DESC
+                LIMIT ?
+            """, (desde, hasta, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_conteo_clientes(self) -> dict:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) as total,
+                       COALESCE(SUM(estado = 'Activo'), 0) as activos,
+                       COALESCE(SUM(estado = 'Suspendido'), 0) as suspendidos
+                FROM clientes_renta
+            """)
+            return dict(cursor.fetchone())
+    
+    def get_reporte_resumen(self, desde: str, hasta: str) -> dict:
+        return {
+            "desde": desde,
+            "hasta": hasta,
+            "ingresos_mensuales": self.get_ingresos_mensuales(desde, hasta),
+            "ingresos_por_plan": self.get_ingresos_por_plan(desde, hasta),
+            "ingresos_por_metodo": self.get_ingresos_por_metodo(desde, hasta),
+            "tasa_cobro": self.get_tasa_cobro(desde, hasta),
+            "top_clientes": self.get_top_clientes(desde, hasta),
+            "clientes": self.get_conteo_clientes(),
+        }
+    
+    # ==================== EXPORTACIÓN ====================
+    
+    def lote_exportacion_pagos(
+        self,
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None,
+        estado: Optional[str] = None,
+        metodo_pago: Optional[str] = None,
+        cliente_id: Optional[int] = None,
+        por: str = 'pago',
+        despues: Optional[tuple] = None,
+        lote: int = 1000,
+    ) -> tuple:
+        """Un lote de pagos para exportar, por fecha de pago o de vencimiento (`por`).
+        
+        Keyset sobre (fecha, id): cada lote toma la conexión solo lo que dura
+        su consulta. Devuelve (filas, clave del siguiente lote o None).
+        """
+        campo = {'pago': 'fecha_pago', 'vencimiento': 'fecha_vencimiento'}[por]
+        condiciones = []
+        params = []
+        if desde:
+            condiciones.append(f"p.{campo} >= ?")
+            params.append(desde)
+        if hasta:
+            condiciones.append(f"p.{campo} <= ?")
+            params.append(hasta)
+        if estado:
+            condiciones.append("p.estado = ?")
+            params.append(estado)
+        if metodo_pago:
+            condiciones.append("p.metodo_pago = ?")
+            params.append(metodo_pago)
+        if cliente_id is not None:
+            condiciones.append("p.cliente_renta_id = ?")
+            params.append(cliente_id)
+        if despues:
+            condiciones.append(f"(p.{campo}, p.id) > (?, ?)")
+            params.extend(despues)
+        
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT p.id, p.fecha_pago, p.fecha_vencimiento, c.nombre_empresa, c.plan,
+                       p.monto, p.estado, p.metodo_pago, p.referencia, p.dias_atraso,
+                       p.registrado_por
+                FROM pagos_renta p
+                JOIN clientes_renta c ON c.id = p.cliente_renta_id
+                {where}
+                ORDER BY p.{campo}, p.id
+                LIMIT ?
+            """, params + [lote])
+            filas = self._con_dias_atraso([dict(row) for row in cursor.fetchall()])
+        
+        siguiente = (filas[-1][campo], filas[-1]['id']) if len(filas) == lote else None
+        return filas, siguiente
+    
+    def lote_exportacion_clientes(
+        self,
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None,
+        estado: Optional[str] = None,
+        plan: Optional[str] = None,
+        despues: Optional[tuple] = None,
+        lote: int = 1000,
+    ) -> tuple:
+        """Un lote de clientes por id para exportar; `desde`/`hasta` filtran por fecha de inicio"""
+        condiciones = ["c.id > ?"]
+        params = [despues[0] if despues else 0]
+        if desde:
+            condiciones.append("c.fecha_inicio >= ?")
+            params.append(desde)
+        if hasta:
+            condiciones.append("c.fecha_inicio <= ?")
+            params.append(hasta)
+        if estado:
+            condiciones.append("c.estado = ?")
+            params.append(estado)
+        if plan:
+            condiciones.append("c.plan = ?")
+            params.append(plan)
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT c.id, c.nombre_empresa, c.contacto_nombre, c.telefono, c.email, c.cedula,
+                       c.plan, c.precio_mensual, c.fecha_inicio, c.estado, c.estado_pago,
+                       c.proximo_vencimiento, c.licencia_key
+                FROM clientes_renta c
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY c.id
+                LIMIT ?
+            """, params + [lote])
+            filas = [dict(row) for row in cursor.fetchall()]
+        
+        siguiente = (filas[-1]['id'],) if len(filas) == lote else None
+        return filas, siguiente
+
+
+class AsyncDatabaseService:
+    """Versión asíncrona de DatabaseService con la misma interfaz.
+
+    Cada llamada se ejecuta en un hilo de trabajo con una conexión del pool,
+    así el event loop queda libre mientras SQLite trabaja (sqlite3 libera el
+    GIL durante las consultas). El número de hilos se limita al tamaño del
+    pool para que ninguna petición quede bloqueada esperando conexión.
+    """
+    
+    def __init__(self, service: DatabaseService, max_workers: int):
+        self._service = service
+        self._max_workers = max_workers
+        self._limiter = None
+    
+    async def run(self, func, *args, **kwargs):
+        """Ejecuta una función síncrona en el pool de hilos de la base de datos"""
+        if self._limiter is None:
+            # CapacityLimiter necesita un event loop activo para crearse
+            self._limiter = anyio.CapacityLimiter(self._max_workers)
+        return await anyio.to_thread.run_sync(
+            functools.partial(func, *args, **kwargs), limiter=self._limiter
+        )
+    
+    def __getattr__(self, name):
+        attr = getattr(self._service, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+        
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        
+        return wrapper
+
 db_service = DatabaseService()
+async_db_service = AsyncDatabaseService(db_service, settings.DB_POOL_SIZE)
@@ -0,0 +1,234 @@
+"""
+Feed de cambios (Server-Sent Events)
+Los cambios se registran en la tabla `eventos` dentro de la transacción que los
+produce; un hilo por proceso lee los nuevos, los guarda en un buffer circular y
+los reparte a las conexiones SSE abiertas. Como el id sale de la base, un
+cliente puede reanudar con Last-Event-ID aunque se reconecte a otro worker.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from config import settings
+from connection_pool import pool
+
+TIPOS_EVENTO = {
+    'cliente_creado',
+    'cliente_actualizado',
+    'cliente_suspendido',
+    'pago_registrado',
+    'licencias_expiradas',
+}
+
+
+def _fecha_sql(momento: datetime) -> str:
+    # Mismo formato UTC que CURRENT_TIMESTAMP de SQLite
+    return momento.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def registrar(cursor, tipo: str, datos: dict):
+    """Registra un evento usando el cursor de la transacción en curso"""
+    if tipo not in TIPOS_EVENTO:
+        raise ValueError(f"Tipo de evento desconocido: {tipo}")
+    cursor.execute(
+        "INSERT INTO eventos (tipo, datos) VALUES (?, ?)",
+        (tipo, json.dumps(datos, separators=(',', ':'), default=str)),
+    )
+
+
+def formatear_sse(evento: dict) -> str:
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {evento['datos']}\n\n"
+
+
+class Suscripcion:
+    """Cola de una conexión SSE; se desborda en vez de crecer sin límite"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, limite: int):
+        self.loop = loop
+        self.limite = limite
+        self.cola = asyncio.Queue()
+        self.desbordada = False
+
+    def _entregar(self, lote: list):
+        # Corre en el event loop de la conexión (call_soon_threadsafe)
+        if self.desbordada:
+            return
+        if self.cola.qsize() + len(lote) > self.limite:
+            # Cliente lento: se cierra el stream y reanuda con Last-Event-ID
+            self.desbordada = True
+            self.cola.put_nowait(None)
+            return
+        for evento in lote:
+            self.cola.put_nowait(evento)
+
+
+class BusEventos:
+    def __init__(
+        self,
+        pool,
+        buffer_size: int = 1000,
+        poll_interval: float = 1.0,
+        queue_size: int = 256,
+        max_replay: int = 1000,
+        retention_hours: float = 24.0,
+    ):
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.max_replay = max_replay
+        self.retention_hours = retention_hours
+
+        self._buffer = deque(maxlen=buffer_size)
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.ultimo_id = 0
+        self._ultima_purga = 0.0
+
+        self.publicados = 0
+        self.desbordes = 0
+        self.replays_bd = 0
+        self.errors = 0
+
+    def _leer_desde(self, ultimo_id: int, limite: int) -> list:
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, tipo, datos FROM eventos WHERE id > ? ORDER BY id LIMIT ?",
+                (ultimo_id, limite),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def _id_actual(self) -> int:
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(id), 0) AS id FROM eventos")
+            return cursor.fetchone()['id']
+
+    def _purgar(self):
+        limite = datetime.now(timezone.utc) - timedelta(hours=self.retention_hours)
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM eventos WHERE fecha < ?", (_fecha_sql(limite),))
+            conn.commit()
+
+    def sondear(self) -> int:
+        """Lee los eventos nuevos y los reparte; devuelve cuántos había"""
+        nuevos = self._leer_desde(self.ultimo_id, 500)
+        if not nuevos:
+            return 0
+        with self._lock:
+            self._buffer.extend(nuevos)
+            self.ultimo_id = nuevos[-1]['id']
+            self.publicados += len(nuevos)
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, nuevos)
+            except RuntimeError:
+                # Event loop ya cerrado: la conexión se fue sin desuscribirse
+                self.desuscribir(suscripcion)
+        return len(nuevos)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                leidos = self.sondear()
+                if time.monotonic() - self._ultima_purga >= 3600:
+                    self._purgar()
+                    self._ultima_purga = time.monotonic()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️  Error al leer el feed de eventos: {e}")
+                leidos = 0
+            if leidos < 500:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def notificar(self):
+        """Despierta al hilo tras registrar eventos en este proceso"""
+        self._wake.set()
+
+    def suscribir(self) -> Suscripcion:
+        suscripcion = Suscripcion(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion: Suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+            if suscripcion.desbordada:
+                self.desbordes += 1
+
+    def pendientes(self, ultimo_id: int) -> Optional[list]:
+        """Eventos posteriores a `ultimo_id` ya vistos por este proceso.
+
+        Salen del buffer si lo cubre y si no de la tabla. None si faltan más de
+        `max_replay`: el cliente debe recargar todo en lugar de reanudar.
+        """
+        with self._lock:
+            hasta = self.ultimo_id
+            if self._buffer and self._buffer[0]['id'] <= ultimo_id + 1:
+                eventos = [e for e in self._buffer if e['id'] > ultimo_id]
+                return eventos if len(eventos) <= self.max_replay else None
+        if ultimo_id >= hasta:
+            return []
+        self.replays_bd += 1
+        eventos = [e for e in self._leer_desde(ultimo_id, self.max_replay + 1) if e['id'] <= hasta]
+        if eventos and eventos[0]['id'] > ultimo_id + 1:
+            # Los ids no tienen huecos (AUTOINCREMENT): faltan eventos ya purgados
+            return None
+        return eventos if len(eventos) <= self.max_replay else None
+
+    def start(self):
+        """Inicia la lectura del feed en segundo plano, a partir del último evento"""
+        if self._thread and self._thread.is_alive():
+            return
+        self.ultimo_id = self._id_actual()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="eventos-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+        # Cierra los streams abiertos; los clientes reanudarán con Last-Event-ID
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.cola.put_nowait, None)
+            except RuntimeError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "ultimo_id": self.ultimo_id,
+                "buffer": len(self._buffer),
+                "conexiones": len(self._suscripciones),
+                "publicados": self.publicados,
+                "desbordes": self.desbordes,
+                "replays_bd": self.replays_bd,
+                "errors": self.errors,
+            }
+
+
+bus_eventos = BusEventos(
+    pool,
+    buffer_size=settings.EVENTOS_BUFFER_SIZE,
+    poll_interval=settings.EVENTOS_POLL_INTERVAL_SECONDS,
+    queue_size=settings.EVENTOS_QUEUE_SIZE,
+    max_replay=settings.EVENTOS_MAX_REPLAY,
+    retention_hours=settings.EVENTOS_RETENTION_HOURS,
+)
@@ -0,0 +1,148 @@
+"""
+Exportación de pagos y clientes (CSV / XLSX)
+Las filas se leen por lotes con keyset y se escriben a medida que llegan, así
+la memoria del servidor no depende del tamaño del rango exportado.
+
+El CSV se descarga mientras se genera. El XLSX (openpyxl en modo write-only)
+va escribiendo las filas en un archivo temporal; como el formato es un zip que
+solo queda completo al cerrarlo, se envía por partes al terminar.
+"""
+import csv
+import io
+import tempfile
+from datetime import date
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+import anyio
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+
+# (campo, encabezado) en el orden del archivo
+COLUMNAS_PAGOS = [
+    ("id", "ID"),
+    ("fecha_pago", "Fecha de pago"),
+    ("fecha_vencimiento", "Vencimiento"),
+    ("nombre_empresa", "Cliente"),
+    ("plan", "Plan"),
+    ("monto", "Monto"),
+    ("estado", "Estado"),
+    ("metodo_pago", "Método"),
+    ("referencia", "Referencia"),
+    ("dias_atraso", "Días de atraso"),
+    ("registrado_por", "Registrado por"),
+]
+
+COLUMNAS_CLIENTES = [
+    ("id", "ID"),
+    ("nombre_empresa", "Empresa"),
+    ("contacto_nombre", "Contacto"),
+    ("telefono", "Teléfono"),
+    ("email", "Email"),
+    ("cedula", "Cédula"),
+    ("plan", "Plan"),
+    ("precio_mensual", "Precio mensual"),
+    ("fecha_inicio", "Fecha de inicio"),
+    ("estado", "Estado"),
+    ("estado_pago", "Estado de pago"),
+    ("proximo_vencimiento", "Próximo vencimiento"),
+    ("licencia_key", "Licencia"),
+]
+
+TIPOS_CONTENIDO = {
+    "csv": "text/csv",  # Starlette agrega charset=utf-8
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Columnas que en el XLSX se guardan como fecha y no como texto
+_FECHAS = {"fecha_pago", "fecha_vencimiento", "fecha_inicio", "proximo_vencimiento"}
+
+# Una celda de texto que empieza así se interpreta como fórmula al abrir el CSV
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+_BLOQUE_XLSX = 64 * 1024
+
+# Recibe la clave del último lote (None al empezar) y devuelve (filas, clave siguiente o None)
+ObtenerLote = Callable[[Optional[tuple]], Awaitable[Tuple[List[dict], Optional[tuple]]]]
+
+
+async def _lotes(obtener_lote: ObtenerLote) -> AsyncIterator[List[dict]]:
+    despues = None
+    while True:
+        filas, despues = await obtener_lote(despues)
+        if filas:
+            yield filas
+        if despues is None:
+            return
+
+
+def _celda_csv(valor):
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _celda_xlsx(campo: str, valor):
+    if valor and campo in _FECHAS:
+        return date.fromisoformat(valor[:10])
+    if isinstance(valor, str) and valor.startswith("="):
+        # openpyxl guarda como fórmula todo texto que empieza con "="
+        return "'" + valor
+    return valor
+
+
+async def generar_csv(columnas: list, obtener_lote: ObtenerLote) -> AsyncIterator[bytes]:
+    """CSV en UTF-8 con BOM (Excel lo abre con tildes y ñ), un bloque por lote"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write("\ufeff")
+    escritor.writerow([encabezado for _, encabezado in columnas])
+    yield buffer.getvalue().encode("utf-8")
+
+    async for filas in _lotes(obtener_lote):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([_celda_csv(fila[campo]) for campo, _ in columnas] for fila in filas)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _agregar_filas(hoja, columnas: list, filas: List[dict]):
+    for fila in filas:
+        hoja.append([_celda_xlsx(campo, fila[campo]) for campo, _ in columnas])
+
+
+async def generar_xlsx(columnas: list, obtener_lote: ObtenerLote, titulo: str) -> AsyncIterator[bytes]:
+    """Libro de una hoja en modo write-only; las filas no se acumulan en memoria"""
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(titulo)
+    hoja.freeze_panes = "A2"
+    hoja.append([encabezado for _, encabezado in columnas])
+
+    with tempfile.TemporaryFile() as archivo:
+        async for filas in _lotes(obtener_lote):
+            # openpyxl serializa cada fila en Python: fuera del event loop
+            await anyio.to_thread.run_sync(_agregar_filas, hoja, columnas, filas)
+        await anyio.to_thread.run_sync(libro.save, archivo)
+
+        archivo.seek(0)
+        while True:
+            bloque = await anyio.to_thread.run_sync(archivo.read, _BLOQUE_XLSX)
+            if not bloque:
+                return
+            yield bloque
+
+
+def respuesta(formato: str, nombre: str, columnas: list, obtener_lote: ObtenerLote) -> StreamingResponse:
+    """Descarga `nombre-AAAA-MM-DD.formato` generada por lotes"""
+    if formato == "xlsx":
+        cuerpo = generar_xlsx(columnas, obtener_lote, nombre.capitalize())
+    else:
+        cuerpo = generar_csv(columnas, obtener_lote)
+    return StreamingResponse(
+        cuerpo,
+        media_type=TIPOS_CONTENIDO[formato],
+        headers={
+            "Content-Disposition": f'attachment; filename="{nombre}-{date.today().isoformat()}.{formato}"',
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,111 @@
+"""
+Buffer de heartbeats de licencias (ultima_conexion)
+Acumula en memoria la última conexión de cada licencia y la escribe por lotes
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class HeartbeatBuffer:
+    def __init__(self, pool, flush_interval: float = 30.0, max_pending: int = 500):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.recorded = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+
+    @staticmethod
+    def _now() -> str:
+        # Mismo formato UTC que CURRENT_TIMESTAMP de SQLite
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def record(self, licencia_key: str):
+        """Registra una conexión; se escribe en el próximo flush"""
+        self.record_many([licencia_key])
+
+    def record_many(self, licencia_keys):
+        ahora = self._now()
+        with self._lock:
+            for licencia_key in licencia_keys:
+                self._pending[licencia_key] = ahora
+                self.recorded += 1
+            lleno = len(self._pending) >= self.max_pending
+        if lleno:
+            self.flush()
+
+    def flush(self) -> int:
+        """Escribe los heartbeats pendientes en una sola transacción"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                lote, self._pending = self._pending, {}
+
+            inicio = time.perf_counter()
+            try:
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.executemany(
+                        "UPDATE licencias SET ultima_conexion = ? WHERE licencia_key = ?",
+                        [(fecha, key) for key, fecha in lote.items()],
+                    )
+                    conn.commit()
+            except Exception:
+                # Devolver el lote sin pisar heartbeats más recientes
+                with self._lock:
+                    for key, fecha in lote.items():
+                        if self._pending.get(key, '') < fecha:
+                            self._pending[key] = fecha
+                    self.errors += 1
+                raise
+
+            with self._lock:
+                self.flushes += 1
+                self.rows_written += len(lote)
+                self.last_flush_ms = round((time.perf_counter() - inicio) * 1000, 3)
+            return len(lote)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️  Error al guardar heartbeats de licencias: {e}")
+
+    def start(self):
+        """Inicia el flush periódico en segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="heartbeat-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el flush periódico y escribe lo pendiente"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "recorded": self.recorded,
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "errors": self.errors,
+                "last_flush_ms": self.last_flush_ms,
+            }
@@ -0,0 +1,144 @@
+"""
+Leases de licencia firmados
+Tokens de corta duración que el sistema de escritorio valida localmente hasta
+su expiración, de modo que solo necesita contactar al servidor para renovarlos
+"""
+import hashlib
+import os
+import secrets
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import JWTError, jwk, jwt
+
+from config import settings
+
+LEASE_TYPE = "license_lease"
+
+
+class LeaseInvalidoError(ValueError):
+    """El lease no tiene una firma válida o no es un lease de licencia"""
+
+
+_CURVAS = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+
+
+def _archivo_clave() -> Path:
+    """Clave generada en el primer arranque, junto a la base de datos"""
+    return Path(settings.DATABASE_PATH).parent / "license_lease_key.pem"
+
+
+def _generar_clave(algoritmo: str) -> str:
+    """Par de claves nuevo en PEM (PKCS#8) para el algoritmo configurado"""
+    if algoritmo in _CURVAS:
+        privada = ec.generate_private_key(_CURVAS[algoritmo]())
+    else:
+        privada = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return privada.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode("utf-8")
+
+
+@lru_cache(maxsize=1)
+def _claves() -> tuple:
+    """(algoritmo, clave privada de firma, clave pública de verificación)"""
+    algoritmo = settings.LICENSE_LEASE_ALGORITHM
+    if not algoritmo.startswith(("ES", "RS", "PS")):
+        # El cliente de escritorio solo puede validar firmas con clave pública
+        raise ValueError(f"LICENSE_LEASE_ALGORITHM debe ser asimétrico, no {algoritmo}")
+    valor = settings.LICENSE_LEASE_PRIVATE_KEY.strip()
+    if valor and not valor.startswith("-----BEGIN"):
+        valor = Path(valor).read_text(encoding="utf-8")
+    valor = valor.replace("\\n", "\n")
+
+    if not valor:
+        # Sin clave configurada: se genera una vez y se reutiliza en cada
+        # arranque, para que los leases emitidos sigan siendo válidos
+        archivo = _archivo_clave()
+        if archivo.is_file():
+            valor = archivo.read_text(encoding="utf-8")
+        else:
+            valor = _generar_clave(algoritmo)
+            archivo.parent.mkdir(parents=True, exist_ok=True)
+            descriptor = os.open(archivo, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                f.write(valor)
+            print(f"🔑 Clave de leases generada en {archivo}")
+
+    publica = jwk.construct(valor, algoritmo).public_key().to_pem().decode("utf-8")
+    return algoritmo, valor, publica
+
+
+def hash_licencia(licencia_key: str) -> str:
+    """Identificador público de una licencia en la lista de revocación.
+
+    La clave es la credencial del cliente y no se publica: cada instalación
+    compara el SHA-256 (hex) de su propia clave con la lista.
+    """
+    return hashlib.sha256(licencia_key.encode("utf-8")).hexdigest()
+
+
+def clave_publica() -> dict:
+    """Datos que el cliente necesita para validar leases sin conexión"""
+    algoritmo, _, publica = _claves()
+    return {"algorithm": algoritmo, "public_key": publica}
+
+
+def emitir_lease(licencia_key: str, licencia: dict, dispositivo_id: Optional[str] = None) -> dict:
+    """Firma un lease para una licencia válida.
+
+    El lease nunca dura más allá del último día de `fecha_expiracion`.
+    """
+    ahora = datetime.now(timezone.utc).replace(microsecond=0)
+    fin_licencia = datetime.combine(
+        datetime.strptime(licencia["fecha_expiracion"], "%Y-%m-%d").date() + timedelta(days=1),
+        time.min,
+        tzinfo=timezone.utc,
+    )
+    expira = min(ahora + timedelta(minutes=settings.LICENSE_LEASE_MINUTES), fin_licencia)
+
+    claims = {
+        "typ": LEASE_TYPE,
+        "sub": licencia_key,
+        "jti": secrets.token_hex(8),
+        "iat": ahora,
+        "exp": expira,
+        "empresa": licencia["nombre_empresa"],
+        "estado": licencia["estado"],
+        "licencia_expira": licencia["fecha_expiracion"],
+    }
+    if dispositivo_id:
+        claims["dispositivo"] = dispositivo_id
+
+    algoritmo, clave, _ = _claves()
+    # Renovar cuando haya transcurrido el 80% de la vigencia
+    renovar = ahora + (expira - ahora) * 0.8
+    return {
+        "valid": True,
+        "lease": jwt.encode(claims, clave, algorithm=algoritmo),
+        "expira": expira.isoformat(),
+        "renovar_despues": renovar.replace(microsecond=0).isoformat(),
+    }
+
+
+def decodificar_lease(token: str, verificar_expiracion: bool = True) -> dict:
+    """Valida la firma de un lease y devuelve sus claims"""
+    algoritmo, _, publica = _claves()
+    try:
+        claims = jwt.decode(
+            token,
+            publica,
+            algorithms=[algoritmo],
+            options={"verify_exp": verificar_expiracion},
+        )
+    except JWTError as e:
+        raise LeaseInvalidoError(str(e))
+    if claims.get("typ") != LEASE_TYPE or not claims.get("sub"):
+        raise LeaseInvalidoError("No es un lease de licencia")
+    return claims
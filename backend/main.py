@@ -2,32 +2,55 @@
 Anthony System - API REST
 Sistema de Gestión de Rentas
 """
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from datetime import timedelta
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+from datetime import date, timedelta
 from typing import List, Optional
 
 from config import settings
 from models import *
 from auth import (
     authenticate_user,
+    authenticate_user_async,
     create_access_token,
+    create_stream_token,
     get_current_user,
+    get_current_user_stream,
     users_exist,
-    create_user
+    create_user,
+    create_user_async,
+    password_hasher,
+    user_cache
 )
-from database_service import db_service
+from database_service import db_service, async_db_service
+from connection_pool import pool
+from scheduler import scheduler
+import license_lease
+from plantillas import PlantillaInvalidaError, motor_plantillas
 import webauthn_service
+from cedula_service import CedulaInvalidaError, cedula_service
+from cache_http import ConEncabezados, cache_respuestas
+from eventos import bus_eventos, formatear_sse
+import exportacion
 
 # Inicializar base de datos y usuario admin al inicio
 def init_on_startup():
     """Inicializa la base de datos y crea el usuario admin si no existe"""
+    # Fuera del try: sin clave de leases válida el servidor no debe arrancar
+    license_lease.clave_publica()
     try:
         from database.init_db import init_database
         print("🚀 Inicializando base de datos...")
-        init_database()
+        # Los índices marcados "en línea" se crean en segundo plano
+        init_database(diferir_en_linea=True)
         print("✅ Base de datos inicializada")
+        normalizados = db_service.normalizar_telefonos()
+        if normalizados:
+            print(f"✅ Teléfonos normalizados a E.164: {normalizados}")
+        if db_service.preparar_resumen():
+            print("✅ Resumen del dashboard construido")
         
         if not users_exist():
             print("👤 Creando usuario administrador...")
@@ -44,13 +67,43 @@ def init_on_startup():
             print("✅ Usuario administrador ya existe")
     except Exception as e:
         print(f"⚠️  Error en inicialización: {e}")
+    
+    db_service.heartbeats.start()
+    bus_eventos.start()
+    # Sin WhatsApp las notificaciones quedan encoladas hasta habilitarlo
+    if settings.WHATSAPP_ENABLED:
+        db_service.outbox.start()
+    if settings.SCHEDULER_ENABLED:
+        intervalo = settings.SCHEDULER_SWEEP_INTERVAL_SECONDS
+        scheduler.registrar("pagos_atrasados", intervalo, db_service.barrido_pagos_atrasados)
+        scheduler.registrar("licencias_expiradas", intervalo, db_service.barrido_licencias_expiradas)
+        scheduler.registrar("notificaciones_diarias", intervalo, db_service.barrido_notificaciones)
+        scheduler.registrar("estado_clientes", intervalo, db_service.barrido_estado_clientes)
+        scheduler.start()
+
+def close_on_shutdown():
+    """Guarda los heartbeats pendientes y cierra el pool al detener el servidor"""
+    scheduler.stop()
+    bus_eventos.stop()
+    db_service.outbox.stop()
+    try:
+        db_service.heartbeats.stop()
+    except Exception as e:
+        print(f"⚠️  Error al guardar heartbeats: {e}")
+    password_hasher.shutdown()
+    pool.close_all()
+
+async def close_http_clients():
+    """Cierra las sesiones HTTP reutilizadas"""
+    await cedula_service.close()
 
 # Crear aplicación
 app = FastAPI(
     title="Anthony System API",
     description="Sistema de Gestión de Rentas",
     version="1.0.0",
-    on_startup=[init_on_startup]
+    on_startup=[init_on_startup],
+    on_shutdown=[close_http_clients, close_on_shutdown]
 )
 
 # Configurar CORS
@@ -60,6 +113,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ==================== AUTENTICACIÓN ====================
@@ -67,7 +121,7 @@ app.add_middleware(
 @app.get("/api/auth/setup-status", tags=["Autenticación"])
 async def setup_status():
     """Indica si es necesario crear el primer usuario"""
-    return {"requires_setup": not users_exist()}
+    return {"requires_setup": not await async_db_service.run(users_exist)}
 
 
 @app.post(
@@ -78,13 +132,13 @@ async def setup_status():
 )
 async def setup_admin(user_data: UserSetup):
     """Registrar el primer usuario administrador"""
-    if users_exist():
+    if await async_db_service.run(users_exist):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El sistema ya cuenta con usuarios registrados"
         )
     
-    user = create_user(
+    user = await create_user_async(
         username=user_data.username,
         password=user_data.password,
         nombre_completo=user_data.nombre_completo,
@@ -104,13 +158,13 @@ async def setup_admin(user_data: UserSetup):
 @app.post("/api/auth/login", response_model=Token, tags=["Autenticación"])
 async def login(user_data: UserLogin):
     """Iniciar sesión"""
-    if not users_exist():
+    if not await async_db_service.run(users_exist):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Configuración inicial pendiente"
         )
     
-    user = authenticate_user(user_data.username, user_data.password)
+    user = await authenticate_user_async(user_data.username, user_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -124,6 +178,14 @@ async def login(user_data: UserLogin):
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/api/auth/token-temporal", response_model=TokenTemporal, tags=["Autenticación"])
+async def token_temporal(uso: UsoTokenTemporal, current_user: dict = Depends(get_current_user)):
+    """Token de corta duración para el ?token= de descargas o del feed de eventos"""
+    return {
+        "token": create_stream_token(current_user["username"], uso.value),
+        "expira_en": settings.STREAM_TOKEN_EXPIRE_SECONDS,
+    }
+
 @app.get("/api/auth/me", response_model=User, tags=["Autenticación"])
 async def get_me(current_user: dict = Depends(get_current_user)):
     """Obtener usuario actual"""
@@ -136,34 +198,73 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         "activo": bool(current_user["activo"])
     }
 
+# ==================== CACHÉ HTTP ====================
+
+async def respuesta_cacheada(request: Request, tipo, producir):
+    """Respuesta con ETag de la versión de datos; 304 si el cliente ya la tiene"""
+    version = await async_db_service.get_version_datos()
+    return await cache_respuestas.responder(request, version, tipo, producir)
+
 # ==================== DASHBOARD ====================
 
 @app.get("/api/dashboard", response_model=DashboardData, tags=["Dashboard"])
-async def get_dashboard(current_user: dict = Depends(get_current_user)):
+async def get_dashboard(request: Request, current_user: dict = Depends(get_current_user)):
     """Obtener datos del dashboard"""
-    return db_service.get_dashboard_data()
+    return await respuesta_cacheada(request, DashboardData, async_db_service.get_dashboard_data)
 
 # ==================== CLIENTES ====================
 
 @app.get("/api/clientes", response_model=List[ClienteRenta], tags=["Clientes"])
 async def get_clientes(
+    request: Request,
+    q: Optional[str] = Query(None, max_length=100),
     estado: Optional[EstadoCliente] = None,
+    plan: Optional[PlanType] = None,
+    estado_pago: Optional[EstadoPagoCliente] = None,
+    vence_en_dias: Optional[int] = Query(None, ge=0),
+    orden: OrdenClientes = OrdenClientes.NOMBRE,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Obtener lista de clientes"""
-    clientes = db_service.get_clientes(estado.value if estado else None)
-    return clientes
+    """Buscar clientes (empresa, contacto, teléfono o cédula) con filtros y orden.
+    
+    Con `limit` la respuesta es una página; el cursor de la siguiente va en el
+    encabezado `X-Next-Cursor` (ausente en la última).
+    """
+    async def producir():
+        pagina = await async_db_service.get_clientes(
+            q=q,
+            estado=estado.value if estado else None,
+            plan=plan.value if plan else None,
+            estado_pago=estado_pago.value if estado_pago else None,
+            vence_en_dias=vence_en_dias,
+            orden=orden.value,
+            limit=limit,
+            cursor=cursor,
+        )
+        siguiente = pagina['siguiente_cursor']
+        return ConEncabezados(pagina['clientes'], {"X-Next-Cursor": siguiente} if siguiente else {})
+    
+    try:
+        return await respuesta_cacheada(request, List[ClienteRenta], producir)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/clientes/{cliente_id}", response_model=ClienteRenta, tags=["Clientes"])
 async def get_cliente(
+    request: Request,
     cliente_id: int,
     current_user: dict = Depends(get_current_user)
 ):
     """Obtener detalle de un cliente"""
-    cliente = db_service.get_cliente(cliente_id)
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
-    return cliente
+    async def producir():
+        cliente = await async_db_service.get_cliente(cliente_id)
+        if not cliente:
+            raise HTTPException(status_code=404, detail="Cliente no encontrado")
+        return cliente
+    
+    return await respuesta_cacheada(request, ClienteRenta, producir)
 
 @app.post("/api/clientes", response_model=ClienteRenta, tags=["Clientes"])
 async def create_cliente(
@@ -173,7 +274,7 @@ async def create_cliente(
     """Crear nuevo cliente"""
     cliente_data = cliente.model_dump()
     cliente_data['fecha_inicio'] = cliente_data['fecha_inicio'].isoformat()
-    return db_service.create_cliente(cliente_data)
+    return await async_db_service.create_cliente(cliente_data)
 
 @app.put("/api/clientes/{cliente_id}", response_model=ClienteRenta, tags=["Clientes"])
 async def update_cliente(
@@ -183,7 +284,7 @@ async def update_cliente(
 ):
     """Actualizar cliente"""
     update_data = {k: v for k, v in cliente.model_dump().items() if v is not None}
-    updated = db_service.update_cliente(cliente_id, update_data)
+    updated = await async_db_service.update_cliente(cliente_id, update_data)
     if not updated:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     return updated
@@ -194,7 +295,7 @@ async def suspend_cliente(
     current_user: dict = Depends(get_current_user)
 ):
     """Suspender acceso de un cliente"""
-    success = db_service.suspend_license(cliente_id)
+    success = await async_db_service.suspend_license(cliente_id)
     if not success:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
     return {"message": "Cliente suspendido exitosamente"}
@@ -203,12 +304,41 @@ async def suspend_cliente(
 
 @app.get("/api/clientes/{cliente_id}/pagos", response_model=List[PagoRenta], tags=["Pagos"])
 async def get_pagos_cliente(
+    request: Request,
     cliente_id: int,
     limit: int = 6,
     current_user: dict = Depends(get_current_user)
 ):
     """Obtener historial de pagos de un cliente"""
-    return db_service.get_pagos_cliente(cliente_id, limit)
+    return await respuesta_cacheada(
+        request, List[PagoRenta], lambda: async_db_service.get_pagos_cliente(cliente_id, limit)
+    )
+
+@app.get("/api/pagos", response_model=PaginaPagos, tags=["Pagos"])
+async def listar_pagos(
+    request: Request,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    estado: Optional[EstadoPago] = None,
+    metodo_pago: Optional[MetodoPago] = None,
+    cliente_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Listar pagos de todos los clientes (paginado con `siguiente_cursor`)"""
+    try:
+        return await respuesta_cacheada(request, PaginaPagos, lambda: async_db_service.get_pagos(
+            desde=desde.isoformat() if desde else None,
+            hasta=hasta.isoformat() if hasta else None,
+            estado=estado.value if estado else None,
+            metodo_pago=metodo_pago.value if metodo_pago else None,
+            cliente_id=cliente_id,
+            limit=limit,
+            cursor=cursor,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/pagos", response_model=PagoRenta, tags=["Pagos"])
 async def create_pago(
@@ -219,159 +349,259 @@ async def create_pago(
     pago_data = pago.model_dump()
     pago_data['fecha_pago'] = pago_data['fecha_pago'].isoformat()
     pago_data['fecha_vencimiento'] = pago_data['fecha_vencimiento'].isoformat()
-    return db_service.create_pago(pago_data, current_user["username"])
+    return await async_db_service.create_pago(pago_data, current_user["username"])
+
+# ==================== REPORTES ====================
+
+def rango_reporte(desde: Optional[date], hasta: Optional[date]) -> tuple:
+    """Rango por defecto: los últimos 6 meses completos hasta hoy"""
+    hasta = hasta or date.today()
+    if desde is None:
+        mes = hasta.month - 5
+        anio = hasta.year + (mes - 1) // 12
+        desde = date(anio, (mes - 1) % 12 + 1, 1)
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior a 'hasta'")
+    return desde.isoformat(), hasta.isoformat()
+
+@app.get("/api/reportes/resumen", response_model=ReporteResumen, tags=["Reportes"])
+async def reporte_resumen(
+    request: Request,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Todos los agregados de reportes en una sola solicitud"""
+    rango = rango_reporte(desde, hasta)
+    return await respuesta_cacheada(request, ReporteResumen, lambda: async_db_service.get_reporte_resumen(*rango))
+
+@app.get("/api/reportes/ingresos-mensuales", response_model=List[IngresoMensual], tags=["Reportes"])
+async def reporte_ingresos_mensuales(
+    request: Request,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Cobrado, pendiente y atrasado por mes"""
+    rango = rango_reporte(desde, hasta)
+    return await respuesta_cacheada(request, List[IngresoMensual], lambda: async_db_service.get_ingresos_mensuales(*rango))
+
+@app.get("/api/reportes/ingresos-por-plan", response_model=List[IngresoPorPlan], tags=["Reportes"])
+async def reporte_ingresos_por_plan(
+    request: Request,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Ingresos cobrados y clientes por plan"""
+    rango = rango_reporte(desde, hasta)
+    return await respuesta_cacheada(request, List[IngresoPorPlan], lambda: async_db_service.get_ingresos_por_plan(*rango))
+
+@app.get("/api/reportes/ingresos-por-metodo", response_model=List[IngresoPorMetodo], tags=["Reportes"])
+async def reporte_ingresos_por_metodo(
+    request: Request,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Ingresos cobrados por método de pago"""
+    rango = rango_reporte(desde, hasta)
+    return await respuesta_cacheada(request, List[IngresoPorMetodo], lambda: async_db_service.get_ingresos_por_metodo(*rango))
+
+@app.get("/api/reportes/tasa-cobro", response_model=TasaCobro, tags=["Reportes"])
+async def reporte_tasa_cobro(
+    request: Request,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Tasa de cobro sobre lo facturado con vencimiento en el rango"""
+    rango = rango_reporte(desde, hasta)
+    return await respuesta_cacheada(request, TasaCobro, lambda: async_db_service.get_tasa_cobro(*rango))
+
+# ==================== EXPORTACIÓN ====================
+
+@app.get("/api/export/pagos", tags=["Exportación"])
+async def exportar_pagos(
+    formato: FormatoExportacion = FormatoExportacion.CSV,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    por: FechaExportacion = Query(FechaExportacion.PAGO, description="Fecha a la que aplican desde/hasta"),
+    estado: Optional[EstadoPago] = None,
+    metodo_pago: Optional[MetodoPago] = None,
+    cliente_id: Optional[int] = None,
+    current_user: dict = Depends(get_current_user_stream("exportacion"))
+):
+    """Exportar pagos por fecha de pago o de vencimiento (CSV o XLSX, generado por lotes)"""
+    async def obtener_lote(despues):
+        return await async_db_service.lote_exportacion_pagos(
+            desde=desde.isoformat() if desde else None,
+            hasta=hasta.isoformat() if hasta else None,
+            estado=estado.value if estado else None,
+            metodo_pago=metodo_pago.value if metodo_pago else None,
+            cliente_id=cliente_id,
+            por=por.value,
+            despues=despues,
+            lote=settings.EXPORT_BATCH_SIZE,
+        )
+    
+    return exportacion.respuesta(formato.value, "pagos", exportacion.COLUMNAS_PAGOS, obtener_lote)
+
+@app.get("/api/export/clientes", tags=["Exportación"])
+async def exportar_clientes(
+    formato: FormatoExportacion = FormatoExportacion.CSV,
+    desde: Optional[date] = Query(None, description="Fecha de inicio desde"),
+    hasta: Optional[date] = Query(None, description="Fecha de inicio hasta"),
+    estado: Optional[EstadoCliente] = None,
+    plan: Optional[PlanType] = None,
+    current_user: dict = Depends(get_current_user_stream("exportacion"))
+):
+    """Exportar clientes (CSV o XLSX, generado por lotes)"""
+    async def obtener_lote(despues):
+        return await async_db_service.lote_exportacion_clientes(
+            desde=desde.isoformat() if desde else None,
+            hasta=hasta.isoformat() if hasta else None,
+            estado=estado.value if estado else None,
+            plan=plan.value if plan else None,
+            despues=despues,
+            lote=settings.EXPORT_BATCH_SIZE,
+        )
+    
+    return exportacion.respuesta(formato.value, "clientes", exportacion.COLUMNAS_CLIENTES, obtener_lote)
 
 # ==================== LICENCIAS ====================
 
 @app.get("/api/licencias/verify/{licencia_key}", tags=["Licencias"])
 async def verify_license(licencia_key: str):
     """Verificar estado de una licencia (endpoint público para el sistema de escritorio)"""
-    return db_service.verify_license(licencia_key)
+    return await async_db_service.verify_license(licencia_key)
+
+@app.post("/api/licencias/verify-batch", tags=["Licencias"])
+async def verify_licenses_batch(lote: VerificacionLicenciasLote):
+    """Verificar varias licencias en una sola solicitud (instalaciones multi-puesto y monitoreo)"""
+    if len(lote.licencia_keys) > settings.LICENSE_BATCH_MAX_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.LICENSE_BATCH_MAX_KEYS} licencias por solicitud"
+        )
+    return {"resultados": await async_db_service.verify_licenses(lote.licencia_keys)}
+
+@app.post("/api/licencias/lease", tags=["Licencias"])
+async def emitir_lease(solicitud: LeaseSolicitud):
+    """Emitir un lease firmado que el sistema de escritorio valida sin conexión hasta su expiración"""
+    return await async_db_service.emitir_lease(solicitud.licencia_key, solicitud.dispositivo_id)
+
+@app.post("/api/licencias/lease/renew", tags=["Licencias"])
+async def renovar_lease(renovacion: LeaseRenovacion):
+    """Renovar un lease revalidando el estado actual de la licencia"""
+    try:
+        return await async_db_service.renovar_lease(renovacion.lease)
+    except license_lease.LeaseInvalidoError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Lease inválido")
+
+@app.get("/api/licencias/lease/public-key", tags=["Licencias"])
+async def lease_public_key():
+    """Algoritmo y clave pública para validar leases localmente"""
+    return license_lease.clave_publica()
+
+@app.get("/api/licencias/revocadas", tags=["Licencias"])
+async def licencias_revocadas(desde: Optional[str] = None):
+    """Lista de revocación por hash SHA-256 de la clave (opcionalmente solo las posteriores a `desde`)"""
+    return {"revocadas": await async_db_service.get_licencias_revocadas(desde)}
 
 # ==================== CÉDULA JCE ====================
 
 @app.get("/api/cedula/{cedula}", tags=["Utilidades"])
 async def consultar_cedula(cedula: str):
     """Consultar cédula en la JCE"""
-    import requests
-    
     try:
-        # Limpiar cédula
-        cedula_limpia = cedula.replace('-', '')
-        
-        # Intentar con diferentes APIs
-        apis = [
-            f"https://api.digital.gob.do/v3/cedulas/{cedula_limpia}/validate",
-            f"https://api.adamix.net/apec/cedula/{cedula_limpia}",
-        ]
-        
-        for api_url in apis:
-            try:
-                response = requests.get(api_url, timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # Normalizar respuesta según la API
-                    if 'valid' in data and data.get('valid'):
-                        persona = data.get('data', {})
-                        return {
-                            "success": True,
-                            "data": {
-                                "nombres": persona.get('nombres', ''),
-                                "apellido1": persona.get('apellido1', ''),
-                                "apellido2": persona.get('apellido2', ''),
-                                "nombre_completo": f"{persona.get('nombres', '')} {persona.get('apellido1', '')} {persona.get('apellido2', '')}".strip(),
-                                "foto": persona.get('foto')
-                            }
-                        }
-                    elif 'nombres' in data:
-                        return {
-                            "success": True,
-                            "data": {
-                                "nombres": data.get('nombres', ''),
-                                "apellido1": data.get('apellido1', ''),
-                                "apellido2": data.get('apellido2', ''),
-                                "nombre_completo": f"{data.get('nombres', '')} {data.get('apellido1', '')} {data.get('apellido2', '')}".strip(),
-                                "foto": data.get('foto')
-                            }
-                        }
-            except:
-                continue
-        
-        return {"success": False, "message": "Cédula no encontrada"}
-    except Exception as e:
+        return await cedula_service.consultar(cedula)
+    except CedulaInvalidaError as e:
         return {"success": False, "message": str(e)}
 
 # ==================== NOTIFICACIONES AUTOMÁTICAS ====================
 
 @app.get("/api/notificaciones/automaticas", tags=["Notificaciones"])
-async def obtener_clientes_para_notificar():
-    """Obtener clientes que necesitan notificación automática (5 días laborables de mora)"""
-    from datetime import datetime, timedelta
-    
-    def calcular_proximo_vencimiento(fecha_inicio):
-        inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d')
-        hoy = datetime.now()
-        dias_desde_inicio = (hoy - inicio).days
-        meses_completos = dias_desde_inicio // 30
-        proximo_vencimiento = inicio + timedelta(days=(meses_completos + 1) * 30)
-        return proximo_vencimiento
-    
-    def contar_dias_laborables(fecha_inicio, fecha_fin):
-        dias_laborables = 0
-        fecha_actual = fecha_inicio
-        while fecha_actual <= fecha_fin:
-            if fecha_actual.weekday() < 5:  # 0-4 = Lunes a Viernes
-                dias_laborables += 1
-            fecha_actual += timedelta(days=1)
-        return dias_laborables
-    
-    clientes = db_service.get_all_clientes()
-    clientes_para_notificar = []
-    
-    for cliente in clientes:
-        proximo_vencimiento = calcular_proximo_vencimiento(cliente['fecha_inicio'])
-        hoy = datetime.now()
-        
-        # Solo si ya venció
-        if proximo_vencimiento < hoy:
-            dias_laborables_vencidos = contar_dias_laborables(proximo_vencimiento, hoy)
-            
-            # Si han pasado exactamente 5 días laborables o más
-            if dias_laborables_vencidos >= 5:
-                clientes_para_notificar.append({
-                    **cliente,
-                    'dias_mora': dias_laborables_vencidos,
-                    'fecha_vencimiento': proximo_vencimiento.strftime('%Y-%m-%d')
-                })
+async def obtener_clientes_para_notificar(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
+    """Obtener clientes que necesitan notificación automática (5 días laborables de mora)
     
-    return {
-        "total": len(clientes_para_notificar),
-        "clientes": clientes_para_notificar
-    }
+    Paginado: pasar `siguiente_cursor` como `cursor` para la página siguiente.
+    `total` solo se calcula en la primera página.
+    """
+    try:
+        return await async_db_service.get_clientes_en_mora(
+            dias_minimos=5, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/notificaciones/enviar-automaticas", tags=["Notificaciones"])
 async def enviar_notificaciones_automaticas():
-    """Enviar notificaciones automáticas a clientes con 5+ días de mora"""
-    from whatsapp_service import whatsapp_service
-    
-    resultado = await obtener_clientes_para_notificar()
-    
-    enviados = []
-    errores = []
-    
-    # Enviar por WhatsApp si está habilitado
-    if settings.WHATSAPP_ENABLED:
-        for cliente in resultado['clientes']:
-            resultado_envio = whatsapp_service.enviar_notificacion_mora(
-                cliente=cliente,
-                dias_mora=cliente['dias_mora'],
-                fecha_vencimiento=cliente['fecha_vencimiento']
-            )
-            
-            if resultado_envio['success']:
-                enviados.append({
-                    "cliente": cliente['nombre_empresa'],
-                    "telefono": cliente['telefono'],
-                    "message_sid": resultado_envio.get('message_sid')
-                })
-            else:
-                errores.append({
-                    "cliente": cliente['nombre_empresa'],
-                    "error": resultado_envio.get('error', 'Error desconocido')
-                })
+    """Encolar notificaciones automáticas a clientes con 5+ días de mora
     
+    El envío lo hace el outbox en segundo plano, con reintentos; repetir la
+    llamada el mismo día no duplica mensajes.
+    """
+    resultado = await async_db_service.encolar_notificaciones_mora(dias_minimos=5)
+    return {
+        "success": True,
+        "whatsapp_enabled": settings.WHATSAPP_ENABLED,
+        **resultado,
+        "fecha_ejecucion": datetime.now().isoformat()
+    }
+
+@app.post("/api/notificaciones/enviar-recordatorios", tags=["Notificaciones"])
+async def enviar_recordatorios():
+    """Encolar recordatorios de pagos que vencen en los próximos 3 días laborables"""
+    resultado = await async_db_service.encolar_recordatorios(dias_laborables=3)
     return {
         "success": True,
         "whatsapp_enabled": settings.WHATSAPP_ENABLED,
-        "total_clientes": resultado['total'],
-        "mensajes_enviados": len(enviados),
-        "mensajes_fallidos": len(errores),
-        "enviados": enviados,
-        "errores": errores,
+        **resultado,
         "fecha_ejecucion": datetime.now().isoformat()
     }
 
+# ==================== PLANTILLAS DE MENSAJES ====================
+
+@app.get("/api/plantillas", response_model=List[PlantillaMensaje], tags=["Notificaciones"])
+async def listar_plantillas(
+    idioma: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Plantillas vigentes de cada tipo de notificación"""
+    return await async_db_service.run(motor_plantillas.listar, idioma)
+
+@app.put("/api/plantillas/{tipo}", response_model=PlantillaMensaje, tags=["Notificaciones"])
+async def actualizar_plantilla(
+    tipo: TipoPlantilla,
+    datos: PlantillaActualizar,
+    idioma: str = settings.PLANTILLAS_IDIOMA,
+    current_user: dict = Depends(get_current_user)
+):
+    """Guardar una plantilla en BD (tiene prioridad sobre el archivo)"""
+    try:
+        plantilla = await async_db_service.run(motor_plantillas.guardar, tipo.value, idioma, datos.cuerpo)
+    except PlantillaInvalidaError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return plantilla.como_dict()
+
+@app.delete("/api/plantillas/{tipo}", response_model=PlantillaMensaje, tags=["Notificaciones"])
+async def restaurar_plantilla(
+    tipo: TipoPlantilla,
+    idioma: str = settings.PLANTILLAS_IDIOMA,
+    current_user: dict = Depends(get_current_user)
+):
+    """Descartar la plantilla de BD y volver a la del archivo"""
+    await async_db_service.run(motor_plantillas.restaurar, tipo.value, idioma)
+    try:
+        plantilla = await async_db_service.run(motor_plantillas.obtener, tipo.value, idioma)
+    except PlantillaInvalidaError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return plantilla.como_dict()
+
 # ==================== HEALTH CHECK ====================
 
 @app.get("/", tags=["Sistema"])
@@ -391,6 +621,75 @@ async def health():
         "database": "connected"
     }
 
+@app.get("/api/metricas", tags=["Sistema"])
+async def metricas(current_user: dict = Depends(get_current_user)):
+    """Métricas internas de rendimiento"""
+    return {
+        "pool_conexiones": pool.stats(),
+        "cache_usuarios": user_cache.stats(),
+        "hash_passwords": password_hasher.stats(),
+        "cache_licencias": db_service.license_cache.stats(),
+        "cache_respuestas": cache_respuestas.stats(),
+        "heartbeats_licencias": db_service.heartbeats.stats(),
+        "outbox_notificaciones": await async_db_service.run(db_service.outbox.stats),
+        "tareas_programadas": scheduler.stats(),
+        "consulta_cedulas": cedula_service.stats(),
+        "feed_eventos": bus_eventos.stats()
+    }
+
+@app.get("/api/events", tags=["Sistema"])
+async def eventos_stream(
+    request: Request,
+    ultimo_id: Optional[int] = Query(None, description="Alternativa a la cabecera Last-Event-ID"),
+    current_user: dict = Depends(get_current_user_stream("eventos"))
+):
+    """Feed de cambios (Server-Sent Events); reanuda desde Last-Event-ID"""
+    cabecera = request.headers.get("last-event-id", "")
+    if cabecera.isdigit():
+        ultimo_id = int(cabecera)
+    
+    async def generar():
+        # Suscribirse antes de leer lo pendiente: lo que llegue entretanto se descarta por id
+        suscripcion = bus_eventos.suscribir()
+        ultimo = ultimo_id
+        try:
+            yield "retry: 3000\n\n"
+            if ultimo is not None:
+                pendientes = await async_db_service.run(bus_eventos.pendientes, ultimo)
+                if pendientes is None:
+                    # Demasiado atrás para reanudar: el cliente debe recargar todo
+                    yield "event: reinicio\ndata: {}\n\n"
+                    ultimo = None
+                else:
+                    for evento in pendientes:
+                        yield formatear_sse(evento)
+                        ultimo = evento['id']
+            
+            while True:
+                try:
+                    evento = await asyncio.wait_for(
+                        suscripcion.cola.get(), timeout=settings.EVENTOS_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if evento is None:
+                    break
+                if ultimo is not None and evento['id'] <= ultimo:
+                    continue
+                ultimo = evento['id']
+                yield formatear_sse(evento)
+        finally:
+            bus_eventos.desuscribir(suscripcion)
+    
+    return StreamingResponse(
+        generar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ==================== WEBAUTHN (BIOMETRÍA REAL) ====================
 
 @app.post("/api/webauthn/register/begin", tags=["WebAuthn"])
@@ -425,7 +724,7 @@ async def webauthn_register_complete(
 async def webauthn_auth_begin(username: str):
     """Iniciar autenticación biométrica"""
     # Buscar usuario por username
-    user = authenticate_user(username, None)
+    user = await async_db_service.run(authenticate_user, username, None)
     if not user:
         # No revelar si el usuario existe o no
         raise HTTPException(status_code=400, detail="Error al generar desafío")
@@ -443,7 +742,7 @@ async def webauthn_auth_begin(username: str):
 async def webauthn_auth_complete(username: str, credential: dict):
     """Completar autenticación biométrica"""
     # Buscar usuario
-    user = authenticate_user(username, None)
+    user = await async_db_service.run(authenticate_user, username, None)
     if not user:
         raise HTTPException(status_code=401, detail="Autenticación fallida")
     
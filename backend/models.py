@@ -2,7 +2,7 @@
 Modelos de datos (Pydantic)
 """
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import date, datetime
 from enum import Enum
 
@@ -32,6 +32,29 @@ class EstadoLicencia(str, Enum):
     SUSPENDIDA = "Suspendida"
     EXPIRADA = "Expirada"
 
+class EstadoPagoCliente(str, Enum):
+    AL_DIA = "al_dia"
+    POR_VENCER = "por_vencer"
+    ATRASADO = "atrasado"
+
+class OrdenClientes(str, Enum):
+    NOMBRE = "nombre"
+    VENCIMIENTO = "vencimiento"
+    RECIENTES = "recientes"
+
+class FormatoExportacion(str, Enum):
+    CSV = "csv"
+    XLSX = "xlsx"
+
+class FechaExportacion(str, Enum):
+    PAGO = "pago"
+    VENCIMIENTO = "vencimiento"
+
+class TipoPlantilla(str, Enum):
+    MORA = "mora"
+    PAGO_RECIBIDO = "pago_recibido"
+    RECORDATORIO = "recordatorio"
+
 # Modelos de Cliente
 class ClienteRentaBase(BaseModel):
     nombre_empresa: str
@@ -59,6 +82,7 @@ class ClienteRenta(ClienteRentaBase):
     id: int
     estado: EstadoCliente
     licencia_key: str
+    telefono_e164: Optional[str] = None
     fecha_creacion: datetime
     dias_hasta_vencimiento: Optional[int] = None
     proximo_pago: Optional[date] = None
@@ -89,6 +113,14 @@ class PagoRenta(PagoRentaBase):
     class Config:
         from_attributes = True
 
+class PagoDetalle(PagoRenta):
+    nombre_empresa: str
+    plan: PlanType
+
+class PaginaPagos(BaseModel):
+    pagos: List[PagoDetalle]
+    siguiente_cursor: Optional[str] = None
+
 # Modelos de Licencia
 class LicenciaBase(BaseModel):
     licencia_key: str
@@ -108,11 +140,29 @@ class Licencia(LicenciaBase):
     class Config:
         from_attributes = True
 
+class VerificacionLicenciasLote(BaseModel):
+    licencia_keys: List[str] = Field(min_length=1)
+
+class LeaseSolicitud(BaseModel):
+    licencia_key: str
+    dispositivo_id: Optional[str] = None
+
+class LeaseRenovacion(BaseModel):
+    lease: str
+
 # Modelos de Autenticación
 class Token(BaseModel):
     access_token: str
     token_type: str
 
+class UsoTokenTemporal(str, Enum):
+    EXPORTACION = "exportacion"
+    EVENTOS = "eventos"
+
+class TokenTemporal(BaseModel):
+    token: str
+    expira_en: int  # segundos
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
@@ -155,6 +205,65 @@ class DashboardData(BaseModel):
     total_clientes: int
     ingresos_proyectados: float
 
+# Modelos de Reportes
+class IngresoMensual(BaseModel):
+    mes: str
+    cobrado: float
+    pendiente: float
+    atrasado: float
+    pagos: int
+
+class IngresoPorPlan(BaseModel):
+    plan: PlanType
+    ingresos: float
+    pagos: int
+    clientes: int
+
+class IngresoPorMetodo(BaseModel):
+    metodo_pago: Optional[MetodoPago] = None
+    ingresos: float
+    pagos: int
+
+class TasaCobro(BaseModel):
+    facturado: float
+    cobrado: float
+    pendiente: float
+    atrasado: float
+    tasa_cobro: float
+
+class TopCliente(BaseModel):
+    id: int
+    nombre_empresa: str
+    plan: PlanType
+    ingresos: float
+    pagos: int
+
+class ConteoClientes(BaseModel):
+    total: int
+    activos: int
+    suspendidos: int
+
+class ReporteResumen(BaseModel):
+    desde: date
+    hasta: date
+    ingresos_mensuales: List[IngresoMensual]
+    ingresos_por_plan: List[IngresoPorPlan]
+    ingresos_por_metodo: List[IngresoPorMetodo]
+    tasa_cobro: TasaCobro
+    top_clientes: List[TopCliente]
+    clientes: ConteoClientes
+
+# Modelos de Plantillas de mensajes
+class PlantillaActualizar(BaseModel):
+    cuerpo: str = Field(..., min_length=1, max_length=4000)
+
+class PlantillaMensaje(BaseModel):
+    tipo: TipoPlantilla
+    idioma: str
+    origen: str  # "archivo" o "bd"
+    cuerpo: str
+    campos: List[str]
+
 # Modelo de Notificación
 class Notificacion(BaseModel):
     id: int
@@ -0,0 +1,229 @@
+"""
+Outbox de notificaciones
+Las notificaciones se encolan en `notificaciones_outbox` (en la misma transacción
+que el cambio que las origina) y un hilo en segundo plano las envía por lotes,
+con reintentos y backoff exponencial
+"""
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Tipo en el outbox -> tipo en la tabla `notificaciones`
+TIPOS_NOTIFICACION = {
+    'mora': 'atraso',
+    'pago_recibido': 'pago_recibido',
+    'recordatorio': 'vencimiento',
+}
+
+
+def _fecha_sql(momento: datetime) -> str:
+    # Mismo formato UTC que CURRENT_TIMESTAMP de SQLite
+    return momento.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def encolar(cursor, idempotency_key: str, cliente_id: int, tipo: str, telefono: str, mensaje: str) -> bool:
+    """Encola una notificación usando el cursor de la transacción en curso.
+
+    Devuelve False si ya existía una con la misma `idempotency_key`.
+    """
+    if tipo not in TIPOS_NOTIFICACION:
+        raise ValueError(f"Tipo de notificación desconocido: {tipo}")
+    cursor.execute("""
+        INSERT OR IGNORE INTO notificaciones_outbox
+        (idempotency_key, cliente_renta_id, tipo, telefono, mensaje)
+        VALUES (?, ?, ?, ?, ?)
+    """, (idempotency_key, cliente_id, tipo, telefono, mensaje))
+    return cursor.rowcount > 0
+
+
+class NotificationOutbox:
+    def __init__(
+        self,
+        pool,
+        sender,
+        batch_size: int = 50,
+        poll_interval: float = 5.0,
+        max_attempts: int = 6,
+        backoff_base: float = 30.0,
+        backoff_max: float = 3600.0,
+        lock_seconds: float = 300.0,
+    ):
+        self.pool = pool
+        # Debe ofrecer `async enviar_masivo(envios)` (ver whatsapp_service)
+        self.sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lock_seconds = lock_seconds
+
+        self._lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.errors = 0
+        self.last_batch_ms = 0.0
+
+    def backoff(self, intentos: int) -> float:
+        """Segundos hasta el siguiente intento, con jitter para no sincronizar reintentos"""
+        espera = min(self.backoff_max, self.backoff_base * (2 ** max(0, intentos - 1)))
+        return espera * random.uniform(0.8, 1.2)
+
+    def _reclamar_lote(self) -> list:
+        """Marca como 'Enviando' un lote de pendientes vencidas.
+
+        BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer, así dos
+        procesos no reclaman las mismas filas. Las que quedaron 'Enviando' por
+        una caída se recuperan al vencer su bloqueo.
+        """
+        ahora = datetime.now(timezone.utc)
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, cliente_renta_id, tipo, telefono, mensaje, intentos
+                FROM notificaciones_outbox
+                WHERE (estado = 'Pendiente' AND proximo_intento <= ?)
+                   OR (estado = 'Enviando' AND bloqueado_hasta <= ?)
+                ORDER BY proximo_intento
+                LIMIT ?
+            """, (_fecha_sql(ahora), _fecha_sql(ahora), self.batch_size))
+            lote = [dict(row) for row in cursor.fetchall()]
+            if lote:
+                cursor.executemany("""
+                    UPDATE notificaciones_outbox SET estado = 'Enviando', bloqueado_hasta = ?
+                    WHERE id = ?
+                """, [(_fecha_sql(ahora + timedelta(seconds=self.lock_seconds)), n['id']) for n in lote])
+            conn.commit()
+        return lote
+
+    def _registrar_resultados(self, lote: list, resultados: list):
+        ahora = datetime.now(timezone.utc)
+        enviados = []
+        reintentos = []
+        fallidos = []
+        for notificacion, resultado in zip(lote, resultados):
+            if resultado.get('success'):
+                enviados.append((notificacion, resultado))
+                continue
+            intentos = notificacion['intentos'] + 1
+            error = resultado.get('error') or resultado.get('message') or 'Error desconocido'
+            if intentos >= self.max_attempts:
+                fallidos.append((intentos, error, notificacion['id']))
+            else:
+                proximo = ahora + timedelta(seconds=self.backoff(intentos))
+                reintentos.append((intentos, error, _fecha_sql(proximo), notificacion['id']))
+
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                UPDATE notificaciones_outbox
+                SET estado = 'Enviado', intentos = intentos + 1, message_sid = ?,
+                    fecha_envio = CURRENT_TIMESTAMP, ultimo_error = NULL, bloqueado_hasta = NULL
+                WHERE id = ?
+            """, [(resultado.get('message_sid'), n['id']) for n, resultado in enviados])
+            cursor.executemany("""
+                INSERT INTO notificaciones (cliente_renta_id, tipo, mensaje)
+                VALUES (?, ?, ?)
+            """, [(n['cliente_renta_id'], TIPOS_NOTIFICACION[n['tipo']], n['mensaje']) for n, _ in enviados])
+            cursor.executemany("""
+                UPDATE notificaciones_outbox
+                SET estado = 'Pendiente', intentos = ?, ultimo_error = ?, proximo_intento = ?,
+                    bloqueado_hasta = NULL
+                WHERE id = ?
+            """, reintentos)
+            cursor.executemany("""
+                UPDATE notificaciones_outbox
+                SET estado = 'Fallido', intentos = ?, ultimo_error = ?, bloqueado_hasta = NULL
+                WHERE id = ?
+            """, fallidos)
+            conn.commit()
+
+        with self._lock:
+            self.sent += len(enviados)
+            self.retried += len(reintentos)
+            self.failed += len(fallidos)
+
+    def procesar_lote(self) -> int:
+        """Envía un lote de notificaciones pendientes; devuelve cuántas se procesaron"""
+        with self._process_lock:
+            lote = self._reclamar_lote()
+            if not lote:
+                return 0
+
+            inicio = time.perf_counter()
+            envios = [
+                {"indice": i, "telefono": n['telefono'], "mensaje": n['mensaje']}
+                for i, n in enumerate(lote)
+            ]
+            # Hilo propio: un event loop por lote para reutilizar el envío concurrente
+            resultado = asyncio.run(self.sender.enviar_masivo(envios))
+            # Enviados y errores vienen por separado; `indice` los devuelve al orden del lote
+            resultados = [None] * len(lote)
+            for r in resultado['enviados'] + resultado['errores']:
+                resultados[r['indice']] = r
+            self._registrar_resultados(lote, resultados)
+
+            with self._lock:
+                self.batches += 1
+                self.last_batch_ms = round((time.perf_counter() - inicio) * 1000, 3)
+            return len(lote)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                procesadas = self.procesar_lote()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"⚠️  Error al procesar el outbox de notificaciones: {e}")
+                procesadas = 0
+            # Lote lleno: seguir sin esperar
+            if procesadas < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def notificar(self):
+        """Despierta al hilo tras encolar para no esperar al siguiente sondeo"""
+        self._wake.set()
+
+    def start(self):
+        """Inicia el envío en segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notificaciones-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT estado, COUNT(*) AS total FROM notificaciones_outbox GROUP BY estado")
+            por_estado = {row['estado']: row['total'] for row in cursor.fetchall()}
+        with self._lock:
+            return {
+                "por_estado": por_estado,
+                "running": bool(self._thread and self._thread.is_alive()),
+                "batches": self.batches,
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "errors": self.errors,
+                "last_batch_ms": self.last_batch_ms,
+            }
@@ -0,0 +1,165 @@
+"""
+Plantillas de mensajes
+Cuerpos de notificación por tipo e idioma, desde archivos en `plantillas/` o
+sobrescritos en la tabla `plantillas_mensajes`. Cada plantilla se compila una
+vez y se renderiza con un contexto de cliente precalculado
+"""
+import string
+from pathlib import Path
+from typing import Optional
+
+from cache import TTLCache
+from config import settings
+from connection_pool import pool
+
+DIRECTORIO = Path(__file__).resolve().parent / "plantillas"
+
+# Campos que acepta cada tipo: los del cliente más los del envío
+CAMPOS_CLIENTE = {'contacto_nombre', 'nombre_empresa', 'precio_mensual'}
+CAMPOS = {
+    'mora': CAMPOS_CLIENTE | {'dias_mora', 'fecha_vencimiento'},
+    'pago_recibido': CAMPOS_CLIENTE | {'monto', 'fecha_pago'},
+    'recordatorio': CAMPOS_CLIENTE | {'dias_restantes', 'fecha_vencimiento'},
+}
+
+
+class PlantillaInvalidaError(ValueError):
+    """La plantilla no se puede compilar o usa campos que su tipo no ofrece"""
+
+
+class Plantilla:
+    """Plantilla compilada: texto literal y campos alternados"""
+
+    __slots__ = ("tipo", "idioma", "cuerpo", "origen", "_partes")
+
+    def __init__(self, tipo: str, idioma: str, cuerpo: str, origen: str):
+        self.tipo = tipo
+        self.idioma = idioma
+        self.cuerpo = cuerpo
+        self.origen = origen
+        self._partes = self._compilar(tipo, cuerpo)
+
+    @staticmethod
+    def _compilar(tipo: str, cuerpo: str) -> tuple:
+        permitidos = CAMPOS.get(tipo)
+        if permitidos is None:
+            raise PlantillaInvalidaError(f"Tipo de plantilla desconocido: {tipo}")
+        try:
+            elementos = list(string.Formatter().parse(cuerpo))
+        except ValueError as e:
+            raise PlantillaInvalidaError(f"Plantilla mal formada: {e}")
+
+        partes = []
+        for literal, campo, formato, conversion in elementos:
+            if literal:
+                partes.append((True, literal))
+            if campo is None:
+                continue
+            if campo not in permitidos or formato or conversion:
+                raise PlantillaInvalidaError(
+                    f"Campo no permitido en '{tipo}': {{{campo}}}. "
+                    f"Disponibles: {', '.join(sorted(permitidos))}"
+                )
+            partes.append((False, campo))
+        return tuple(partes)
+
+    def renderizar(self, contexto: dict) -> str:
+        return ''.join(valor if literal else str(contexto[valor]) for literal, valor in self._partes)
+
+    def como_dict(self) -> dict:
+        return {
+            "tipo": self.tipo,
+            "idioma": self.idioma,
+            "origen": self.origen,
+            "cuerpo": self.cuerpo,
+            "campos": sorted(CAMPOS[self.tipo]),
+        }
+
+
+def contexto_cliente(cliente: dict) -> dict:
+    """Campos del cliente que usan las plantillas; se calcula una vez por cliente"""
+    return {campo: cliente[campo] for campo in CAMPOS_CLIENTE}
+
+
+class MotorPlantillas:
+    def __init__(self, pool, directorio: Path = DIRECTORIO, ttl: float = 60.0):
+        self.pool = pool
+        self.directorio = Path(directorio)
+        # El TTL hace que los cambios en BD lleguen también a los demás workers
+        self._cache = TTLCache(maxsize=64, ttl=ttl)
+
+    def _leer_archivo(self, tipo: str, idioma: str) -> Optional[str]:
+        ruta = self.directorio / idioma / f"{tipo}.txt"
+        if not ruta.is_file():
+            return None
+        return ruta.read_text(encoding="utf-8").rstrip("\n")
+
+    def _leer_bd(self, tipo: str, idioma: str, cursor=None) -> Optional[str]:
+        if cursor is None:
+            with self.pool.connection() as conn:
+                return self._leer_bd(tipo, idioma, conn.cursor())
+        cursor.execute(
+            "SELECT cuerpo FROM plantillas_mensajes WHERE tipo = ? AND idioma = ?", (tipo, idioma)
+        )
+        row = cursor.fetchone()
+        return row['cuerpo'] if row else None
+
+    def obtener(self, tipo: str, idioma: Optional[str] = None, cursor=None) -> Plantilla:
+        """Plantilla compilada; la de BD tiene prioridad sobre el archivo.
+
+        Quien ya tiene una conexión del pool (con una transacción abierta)
+        pasa su `cursor`: pedir otra conexión mientras se retiene la primera
+        puede agotar el pool con DB_POOL_SIZE escrituras concurrentes.
+        """
+        idioma = idioma or settings.PLANTILLAS_IDIOMA
+        plantilla = self._cache.get((tipo, idioma))
+        if plantilla is not None:
+            return plantilla
+
+        cuerpo, origen = self._leer_bd(tipo, idioma, cursor), "bd"
+        if cuerpo is None:
+            cuerpo, origen = self._leer_archivo(tipo, idioma), "archivo"
+        if cuerpo is None:
+            if idioma != settings.PLANTILLAS_IDIOMA:
+                plantilla = self.obtener(tipo, settings.PLANTILLAS_IDIOMA, cursor)
+                self._cache.set((tipo, idioma), plantilla)
+                return plantilla
+            raise PlantillaInvalidaError(f"No existe la plantilla '{tipo}' ({idioma})")
+
+        plantilla = Plantilla(tipo, idioma, cuerpo, origen)
+        self._cache.set((tipo, idioma), plantilla)
+        return plantilla
+
+    def renderizar(self, tipo: str, contexto: dict, idioma: Optional[str] = None, cursor=None) -> str:
+        return self.obtener(tipo, idioma, cursor).renderizar(contexto)
+
+    def listar(self, idioma: Optional[str] = None) -> list:
+        idioma = idioma or settings.PLANTILLAS_IDIOMA
+        return [self.obtener(tipo, idioma).como_dict() for tipo in CAMPOS]
+
+    def guardar(self, tipo: str, idioma: str, cuerpo: str) -> Plantilla:
+        """Sobrescribe la plantilla en BD; se valida compilándola antes de guardar"""
+        plantilla = Plantilla(tipo, idioma, cuerpo, "bd")
+        with self.pool.connection() as conn:
+            conn.execute("""
+                INSERT INTO plantillas_mensajes (tipo, idioma, cuerpo, fecha_modificacion)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(tipo, idioma) DO UPDATE
+                SET cuerpo = excluded.cuerpo, fecha_modificacion = CURRENT_TIMESTAMP
+            """, (tipo, idioma, cuerpo))
+            conn.commit()
+        self._cache.invalidate((tipo, idioma))
+        return plantilla
+
+    def restaurar(self, tipo: str, idioma: str) -> bool:
+        """Elimina la versión de BD y vuelve a la del archivo"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM plantillas_mensajes WHERE tipo = ? AND idioma = ?", (tipo, idioma))
+            conn.commit()
+            eliminada = cursor.rowcount > 0
+        self._cache.invalidate((tipo, idioma))
+        return eliminada
+
+
+motor_plantillas = MotorPlantillas(pool, ttl=settings.PLANTILLAS_CACHE_TTL_SECONDS)
@@ -0,0 +1,200 @@
+"""
+Resumen del dashboard
+Totales por mes (`resumen_mensual`) y conteos de clientes (`resumen_clientes`)
+mantenidos por triggers en la misma transacción que cada escritura. Aquí se
+clasifica a cada cliente (al_dia / por_vencer / atrasado) y se ofrecen la
+reconstrucción completa y el verificador de consistencia:
+
+    python resumen.py verificar
+    python resumen.py reconstruir
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+from typing import Optional
+
+# Días naturales antes del vencimiento en que un cliente pasa a "por vencer"
+DIAS_POR_VENCER = 3
+
+# Tolerancia al comparar sumas REAL acumuladas por deltas
+_TOLERANCIA = 0.005
+
+# Estado de pago del cliente según su pago pendiente más antiguo
+_CLASIFICACION = """
+    SELECT CASE
+        WHEN MIN(fecha_vencimiento) IS NULL OR MIN(fecha_vencimiento) > ? THEN 'al_dia'
+        WHEN MIN(fecha_vencimiento) < ? THEN 'atrasado'
+        ELSE 'por_vencer'
+    END
+    FROM pagos_renta
+    WHERE cliente_renta_id = clientes_renta.id AND estado IN ('Pendiente', 'Atrasado')
+"""
+
+_MENSUAL = """
+    SELECT substr(fecha_vencimiento, 1, 7) AS mes,
+           COALESCE(SUM(CASE WHEN estado = 'Pagado' THEN monto END), 0) AS cobrado,
+           COALESCE(SUM(CASE WHEN estado IN ('Pendiente', 'Atrasado') THEN monto END), 0) AS pendiente
+    FROM pagos_renta
+    GROUP BY mes
+"""
+
+_CLIENTES = """
+    SELECT COUNT(*) AS total_activos,
+           COALESCE(SUM(precio_mensual), 0) AS ingresos_proyectados,
+           COUNT(CASE WHEN estado_pago = 'al_dia' THEN 1 END) AS al_dia,
+           COUNT(CASE WHEN estado_pago = 'por_vencer' THEN 1 END) AS por_vencer,
+           COUNT(CASE WHEN estado_pago = 'atrasado' THEN 1 END) AS atrasados
+    FROM clientes_renta
+    WHERE estado = 'Activo'
+"""
+
+CAMPOS_CLIENTES = ('total_activos', 'ingresos_proyectados', 'al_dia', 'por_vencer', 'atrasados')
+
+
+def _limites(hoy: date) -> tuple:
+    return (hoy + timedelta(days=DIAS_POR_VENCER)).isoformat(), hoy.isoformat()
+
+
+def clasificar_cliente(cursor, cliente_id: int, hoy: Optional[date] = None):
+    """Recalcula estado_pago de un cliente con el cursor de la transacción en curso"""
+    cursor.execute(
+        f"UPDATE clientes_renta SET estado_pago = ({_CLASIFICACION}) WHERE id = ?",
+        (*_limites(hoy or date.today()), cliente_id),
+    )
+
+
+def clasificar_todos(cursor, hoy: date) -> int:
+    """Reclasifica a todos los clientes para `hoy`; solo escribe las filas que cambian"""
+    limites = _limites(hoy)
+    cursor.execute(f"""
+        UPDATE clientes_renta SET estado_pago = ({_CLASIFICACION})
+        WHERE estado_pago IS NOT ({_CLASIFICACION})
+    """, (*limites, *limites))
+    cambios = cursor.rowcount
+    cursor.execute("UPDATE resumen_clientes SET fecha_estados = ? WHERE id = 1", (hoy.isoformat(),))
+    return cambios
+
+
+def leer(cursor, mes_desde: str) -> dict:
+    """Fila de conteos y totales de los meses >= `mes_desde` (YYYY-MM)"""
+    cursor.execute("SELECT * FROM resumen_clientes WHERE id = 1")
+    fila = cursor.fetchone()
+    resumen = dict(fila) if fila else None
+    if resumen is None:
+        return None
+    cursor.execute("""
+        SELECT COALESCE(SUM(cobrado), 0) AS cobrado, COALESCE(SUM(pendiente), 0) AS pendiente
+        FROM resumen_mensual WHERE mes >= ?
+    """, (mes_desde,))
+    totales = cursor.fetchone()
+    resumen['cobrado'] = round(totales['cobrado'], 2)
+    resumen['pendiente'] = round(totales['pendiente'], 2)
+    resumen['ingresos_proyectados'] = round(resumen['ingresos_proyectados'], 2)
+    return resumen
+
+
+def reconstruir(conn, hoy: Optional[date] = None) -> dict:
+    """Recalcula ambas tablas desde cero dentro de una transacción de escritura"""
+    hoy = hoy or date.today()
+    conn.execute("BEGIN IMMEDIATE")
+    cursor = conn.cursor()
+    cursor.execute("INSERT OR IGNORE INTO resumen_clientes (id) VALUES (1)")
+    clasificar_todos(cursor, hoy)
+
+    cursor.execute("DELETE FROM resumen_mensual")
+    cursor.execute(f"INSERT INTO resumen_mensual (mes, cobrado, pendiente) {_MENSUAL}")
+    meses = cursor.rowcount
+
+    cursor.execute(_CLIENTES)
+    clientes = dict(cursor.fetchone())
+    cursor.execute(f"""
+        UPDATE resumen_clientes SET {', '.join(f'{campo} = ?' for campo in CAMPOS_CLIENTES)}
+        WHERE id = 1
+    """, [clientes[campo] for campo in CAMPOS_CLIENTES])
+    conn.commit()
+    return {"meses": meses, **clientes, "fecha_estados": hoy.isoformat()}
+
+
+def asegurar(conn) -> bool:
+    """Construye el resumen si la base aún no lo tiene (primer arranque tras actualizar)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM resumen_clientes WHERE id = 1")
+    if cursor.fetchone():
+        return False
+    reconstruir(conn)
+    return True
+
+
+def verificar(conn) -> dict:
+    """Compara el resumen guardado con lo calculado desde las tablas base.
+
+    Las clasificaciones se comparan con la fecha en que se calcularon
+    (`fecha_estados`), no con hoy, para no reportar como error un día
+    que el barrido aún no ha procesado.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM resumen_clientes WHERE id = 1")
+    fila = cursor.fetchone()
+    if fila is None:
+        return {"consistente": False, "error": "El resumen no se ha construido"}
+    guardado = dict(fila)
+
+    cursor.execute(_CLIENTES)
+    calculado = dict(cursor.fetchone())
+    clientes = {
+        campo: {"guardado": guardado[campo], "calculado": calculado[campo]}
+        for campo in CAMPOS_CLIENTES
+        if abs(guardado[campo] - calculado[campo]) > _TOLERANCIA
+    }
+
+    cursor.execute("SELECT mes, cobrado, pendiente FROM resumen_mensual")
+    meses_guardados = {row['mes']: (row['cobrado'], row['pendiente']) for row in cursor.fetchall()}
+    cursor.execute(_MENSUAL)
+    meses_calculados = {row['mes']: (row['cobrado'], row['pendiente']) for row in cursor.fetchall()}
+    mensual = {}
+    for mes in sorted(meses_guardados.keys() | meses_calculados.keys()):
+        a = meses_guardados.get(mes, (0, 0))
+        b = meses_calculados.get(mes, (0, 0))
+        if any(abs(x - y) > _TOLERANCIA for x, y in zip(a, b)):
+            mensual[mes] = {"guardado": a, "calculado": b}
+
+    desactualizados = 0
+    if guardado['fecha_estados']:
+        cursor.execute(
+            f"SELECT COUNT(*) AS total FROM clientes_renta WHERE estado_pago IS NOT ({_CLASIFICACION})",
+            _limites(date.fromisoformat(guardado['fecha_estados'])),
+        )
+        desactualizados = cursor.fetchone()['total']
+
+    return {
+        "consistente": not clientes and not mensual and not desactualizados,
+        "fecha_estados": guardado['fecha_estados'],
+        "clientes": clientes,
+        "mensual": mensual,
+        "clasificaciones_desactualizadas": desactualizados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen del dashboard")
+    parser.add_argument("accion", choices=["verificar", "reconstruir"])
+    args = parser.parse_args()
+
+    from connection_pool import pool
+
+    with pool.connection() as conn:
+        if args.accion == "reconstruir":
+            resultado = reconstruir(conn)
+            print(f"✅ Resumen reconstruido: {resultado}")
+            return
+        resultado = verificar(conn)
+
+    if resultado["consistente"]:
+        print(f"✅ Resumen consistente (estados al {resultado['fecha_estados']})")
+        return
+    print(f"❌ Resumen inconsistente: {resultado}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Tareas programadas en proceso
+Cada tarea guarda en `tareas_programadas` su watermark y un bloqueo con
+expiración, de modo que con varios workers de uvicorn solo uno la ejecuta
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from config import settings
+from connection_pool import pool
+
+
+def _fecha_sql(momento: datetime) -> str:
+    # Mismo formato UTC que CURRENT_TIMESTAMP de SQLite
+    return momento.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class Tarea:
+    def __init__(self, nombre: str, intervalo: float, funcion: Callable[[Optional[str]], tuple]):
+        """`funcion(watermark)` devuelve `(nuevo_watermark, resultado)`"""
+        self.nombre = nombre
+        self.intervalo = intervalo
+        self.funcion = funcion
+
+
+class Scheduler:
+    def __init__(self, pool, tick: float = 30.0, lock_seconds: float = 600.0):
+        self.pool = pool
+        self.tick = tick
+        self.lock_seconds = lock_seconds
+        # Identifica a este proceso como dueño del bloqueo
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._tareas = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_results = {}
+
+    def registrar(self, nombre: str, intervalo: float, funcion: Callable[[Optional[str]], tuple]):
+        self._tareas[nombre] = Tarea(nombre, intervalo, funcion)
+
+    def _adquirir(self, tarea: Tarea) -> tuple:
+        """Toma el bloqueo si la tarea toca y nadie la tiene: (adquirido, watermark)"""
+        ahora = datetime.now(timezone.utc)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT OR IGNORE INTO tareas_programadas (nombre) VALUES (?)", (tarea.nombre,)
+            )
+            cursor.execute("""
+                UPDATE tareas_programadas SET lock_owner = ?, lock_expira = ?
+                WHERE nombre = ?
+                  AND (lock_owner IS NULL OR lock_expira <= ?)
+                  AND (ultima_ejecucion IS NULL OR ultima_ejecucion <= ?)
+            """, (
+                self.owner,
+                _fecha_sql(ahora + timedelta(seconds=self.lock_seconds)),
+                tarea.nombre,
+                _fecha_sql(ahora),
+                _fecha_sql(ahora - timedelta(seconds=tarea.intervalo)),
+            ))
+            adquirido = cursor.rowcount == 1
+            cursor.execute("SELECT watermark FROM tareas_programadas WHERE nombre = ?", (tarea.nombre,))
+            watermark = cursor.fetchone()['watermark']
+            conn.commit()
+        return (True, watermark) if adquirido else (False, None)
+
+    def _liberar(self, tarea: Tarea, watermark: Optional[str], error: Optional[str]):
+        with self.pool.connection() as conn:
+            conn.execute("""
+                UPDATE tareas_programadas
+                SET watermark = ?, ultima_ejecucion = CURRENT_TIMESTAMP, ultimo_error = ?,
+                    lock_owner = NULL, lock_expira = NULL
+                WHERE nombre = ? AND lock_owner = ?
+            """, (watermark, error, tarea.nombre, self.owner))
+            conn.commit()
+
+    def ejecutar(self, nombre: str) -> bool:
+        """Ejecuta la tarea si le toca y consigue el bloqueo; devuelve si se ejecutó"""
+        tarea = self._tareas[nombre]
+        adquirido, watermark = self._adquirir(tarea)
+        if not adquirido:
+            with self._lock:
+                self.skipped += 1
+            return False
+
+        inicio = time.perf_counter()
+        try:
+            nuevo_watermark, resultado = tarea.funcion(watermark)
+        except Exception as e:
+            # Se conserva el watermark: la próxima ejecución reintenta el mismo tramo
+            self._liberar(tarea, watermark, str(e))
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️  Error en la tarea programada '{nombre}': {e}")
+            return True
+
+        self._liberar(tarea, nuevo_watermark, None)
+        with self._lock:
+            self.runs += 1
+            self.last_results[nombre] = {
+                "watermark": nuevo_watermark,
+                "resultado": resultado,
+                "duracion_ms": round((time.perf_counter() - inicio) * 1000, 3),
+            }
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            for nombre in list(self._tareas):
+                if self._stop.is_set():
+                    break
+                try:
+                    self.ejecutar(nombre)
+                except Exception as e:
+                    with self._lock:
+                        self.errors += 1
+                    print(f"⚠️  Error al programar la tarea '{nombre}': {e}")
+
+    def start(self):
+        """Inicia el ciclo de tareas en segundo plano"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.tick)
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "owner": self.owner,
+                "running": bool(self._thread and self._thread.is_alive()),
+                "tareas": list(self._tareas),
+                "runs": self.runs,
+                "skipped": self.skipped,
+                "errors": self.errors,
+                "last_results": dict(self.last_results),
+            }
+
+
+scheduler = Scheduler(pool, tick=settings.SCHEDULER_TICK_SECONDS)
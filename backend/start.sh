@@ -1,4 +1,4 @@
 #!/bin/bash
-python database/init_db.py
+python database/migraciones.py aplicar
 python create_admin.py
 uvicorn main:app --host 0.0.0.0 --port ${PORT}
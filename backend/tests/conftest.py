@@ -0,0 +1,11 @@
+"""
+Configuración común de las pruebas
+La base apunta a un directorio temporal antes de que se importe config, así
+ninguna prueba toca database/anthony_system.db
+"""
+import os
+import tempfile
+from pathlib import Path
+
+_DIRECTORIO = tempfile.mkdtemp(prefix="pruebas-")
+os.environ["DATABASE_PATH"] = str(Path(_DIRECTORIO) / "pruebas.db")
@@ -0,0 +1,193 @@
+"""
+Consulta de cédulas contra un proveedor HTTP local
+Un servidor aiohttp en 127.0.0.1 hace de proveedor y la caché vive en una base
+temporal con todas las migraciones
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from aiohttp import web
+
+from cedula_service import CedulaService
+from config import settings
+from connection_pool import ConnectionPool
+from database import migraciones
+
+CEDULA = "00100000011"
+OTRA_CEDULA = "00100000029"
+PERSONA = {"nombres": "Ana", "apellido1": "Pérez", "apellido2": "", "foto": None}
+NO_DISPONIBLE = "Servicio de consulta de cédulas no disponible"
+
+
+class Proveedor:
+    """Servidor local; cada ruta /<nombre>/{cedula} responde según `modo[nombre]`"""
+
+    def __init__(self):
+        self.modo = {}
+        self.llamadas = Counter()
+        self.soltar = asyncio.Event()
+        self._runner = None
+        self.puerto = None
+
+    async def _responder(self, request: web.Request) -> web.Response:
+        nombre = request.match_info["proveedor"]
+        self.llamadas[nombre] += 1
+        modo = self.modo.get(nombre, "ok")
+        if modo == "caido":
+            return web.json_response({"error": "mantenimiento"}, status=503)
+        if modo == "no_existe":
+            return web.json_response({"valid": False}, status=404)
+        if modo == "lento":
+            await asyncio.sleep(0.1)
+        elif modo == "colgado":
+            await self.soltar.wait()
+        return web.json_response({"valid": True, "data": PERSONA})
+
+    async def iniciar(self):
+        app = web.Application()
+        app.router.add_get("/{proveedor}/{cedula}", self._responder)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        self.puerto = self._runner.addresses[0][1]
+
+    async def detener(self):
+        self.soltar.set()
+        await self._runner.cleanup()
+
+    def url(self, nombre: str) -> str:
+        return f"http://127.0.0.1:{self.puerto}/{nombre}/{{cedula}}"
+
+
+@pytest.fixture
+def base_cedulas(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_PATH", str(tmp_path / "cedulas.db"))
+    monkeypatch.setattr(settings, "CEDULA_TIMEOUT_SECONDS", 0.5)
+    monkeypatch.setattr(settings, "CEDULA_BREAKER_FAILURES", 1)
+    monkeypatch.setattr(settings, "CEDULA_BREAKER_RESET_SECONDS", 0.3)
+    monkeypatch.setattr(settings, "CEDULA_NEGATIVE_TTL_HOURS", 2.0)
+    migraciones.aplicar(settings.DATABASE_PATH)
+    pool_pruebas = ConnectionPool(settings.DATABASE_PATH, size=2)
+    yield pool_pruebas
+    pool_pruebas.close_all()
+
+
+@pytest.fixture
+def con_proveedor(base_cedulas, monkeypatch):
+    """Corre `escenario(servicio, proveedor)` con CEDULA_PROVIDER_URLS apuntando al servidor local"""
+
+    def correr(nombres, escenario):
+        async def principal():
+            proveedor = Proveedor()
+            await proveedor.iniciar()
+            monkeypatch.setattr(settings, "CEDULA_PROVIDER_URLS", [proveedor.url(n) for n in nombres])
+            servicio = CedulaService(base_cedulas, settings.CEDULA_PROVIDER_URLS)
+            try:
+                await escenario(servicio, proveedor)
+            finally:
+                await servicio.close()
+                await proveedor.detener()
+
+        asyncio.run(principal())
+
+    return correr
+
+
+def _fila_cache(pool, cedula):
+    with pool.connection() as conn:
+        return conn.execute("SELECT * FROM cedulas_cache WHERE cedula = ?", (cedula,)).fetchone()
+
+
+def test_respuesta_200_se_cachea(base_cedulas, con_proveedor):
+    async def escenario(servicio, proveedor):
+        primera = await servicio.consultar(CEDULA)
+        assert primera["success"] is True
+        assert primera["data"]["nombre_completo"] == "Ana Pérez"
+
+        fila = _fila_cache(base_cedulas, CEDULA)
+        assert fila["encontrada"] == 1
+        assert fila["proveedor"] == f"127.0.0.1:{proveedor.puerto}"
+
+        # La segunda consulta sale de la caché sin tocar el servidor
+        assert await servicio.consultar(CEDULA) == primera
+        assert proveedor.llamadas["a"] == 1
+        assert servicio.hits == 1
+
+    con_proveedor(["a"], escenario)
+
+
+def test_404_se_cachea_con_ttl_negativo(base_cedulas, con_proveedor):
+    async def escenario(servicio, proveedor):
+        proveedor.modo["a"] = "no_existe"
+        resultado = await servicio.consultar(CEDULA)
+        assert resultado == {"success": False, "message": "Cédula no encontrada"}
+
+        fila = _fila_cache(base_cedulas, CEDULA)
+        assert fila["encontrada"] == 0
+        vigencia = datetime.fromisoformat(fila["expira"]) - datetime.fromisoformat(fila["fecha_consulta"])
+        assert abs(vigencia - timedelta(hours=settings.CEDULA_NEGATIVE_TTL_HOURS)) < timedelta(minutes=1)
+
+        assert await servicio.consultar(CEDULA) == resultado
+        assert proveedor.llamadas["a"] == 1
+
+    con_proveedor(["a"], escenario)
+
+
+def test_timeout_abre_el_breaker_y_pasa_al_siguiente(con_proveedor):
+    async def escenario(servicio, proveedor):
+        proveedor.modo["a"] = "colgado"
+        resultado = await servicio.consultar(CEDULA)
+        assert resultado["success"] is True
+        assert proveedor.llamadas == {"a": 1, "b": 1}
+        assert servicio.stats()["proveedores"][proveedor.url("a")]["estado"] == "abierto"
+
+        # Con el breaker abierto el primer proveedor ni se intenta
+        resultado = await servicio.consultar(OTRA_CEDULA)
+        assert resultado["success"] is True
+        assert proveedor.llamadas == {"a": 1, "b": 2}
+
+    con_proveedor(["a", "b"], escenario)
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba(con_proveedor):
+    async def escenario(servicio, proveedor):
+        proveedor.modo["a"] = "caido"
+        assert (await servicio.consultar(CEDULA))["message"] == NO_DISPONIBLE
+        assert (await servicio.consultar(CEDULA))["message"] == NO_DISPONIBLE
+        assert proveedor.llamadas["a"] == 1
+
+        await asyncio.sleep(settings.CEDULA_BREAKER_RESET_SECONDS)
+        proveedor.modo["a"] = "lento"
+        resultados = await asyncio.gather(*(servicio.consultar(CEDULA) for _ in range(5)))
+        assert proveedor.llamadas["a"] == 2
+        assert sum(r["success"] for r in resultados) == 1
+        assert servicio.stats()["proveedores"][proveedor.url("a")]["estado"] == "cerrado"
+
+    con_proveedor(["a"], escenario)
+
+
+def test_prueba_cancelada_no_bloquea_el_proveedor(con_proveedor):
+    async def escenario(servicio, proveedor):
+        proveedor.modo["a"] = "caido"
+        await servicio.consultar(CEDULA)
+        await asyncio.sleep(settings.CEDULA_BREAKER_RESET_SECONDS)
+
+        proveedor.modo["a"] = "colgado"
+        prueba = asyncio.create_task(servicio.consultar(CEDULA))
+        while proveedor.llamadas["a"] < 2:
+            await asyncio.sleep(0.01)
+        # Mientras la prueba sigue en curso las demás se rechazan
+        assert (await servicio.consultar(CEDULA))["message"] == NO_DISPONIBLE
+        prueba.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await prueba
+
+        # La siguiente solicitud puede hacer la prueba y cerrar el breaker
+        proveedor.modo["a"] = "ok"
+        assert (await servicio.consultar(CEDULA))["success"] is True
+        assert proveedor.llamadas["a"] == 3
+        assert servicio.stats()["proveedores"][proveedor.url("a")]["estado"] == "cerrado"
+
+    con_proveedor(["a"], escenario)
@@ -0,0 +1,30 @@
+"""
+Planes de consulta: ninguna operación del servicio recorre una tabla completa
+sin estar en PERMITIDOS (ver verificar_planes.py)
+"""
+import shutil
+from pathlib import Path
+
+import pytest
+
+import verificar_planes
+from config import settings
+from connection_pool import pool
+
+
+@pytest.fixture
+def base_planes(monkeypatch):
+    # conftest ya importó config con su propia base; se redirige a la del verificador
+    ruta = str(Path(verificar_planes._DIRECTORIO) / "planes.db")
+    pool.close_all()
+    monkeypatch.setattr(settings, "DATABASE_PATH", ruta)
+    monkeypatch.setattr(pool, "db_path", ruta)
+    # verificar() instrumenta pool._connect; se restaura al terminar
+    monkeypatch.setattr(pool, "_connect", pool._connect)
+    yield
+    pool.close_all()
+    shutil.rmtree(verificar_planes._DIRECTORIO, ignore_errors=True)
+
+
+def test_sin_recorridos_completos(base_planes):
+    assert verificar_planes.verificar(clientes=60) == 0
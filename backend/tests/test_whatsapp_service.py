@@ -0,0 +1,97 @@
+"""
+Envío masivo de WhatsApp con un cliente de Twilio simulado
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from whatsapp_service import TokenBucket, WhatsAppService
+
+
+class TwilioSimulado:
+    """Imita `client.messages.create`; registra cuántos envíos corren a la vez"""
+
+    def __init__(self, demora: float = 0.05, fallan=(), cuelgan=()):
+        self.demora = demora
+        self.fallan = set(fallan)
+        self.cuelgan = set(cuelgan)
+        self.liberar = threading.Event()
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.enviados = []
+        self._lock = threading.Lock()
+        self.messages = self
+
+    def create(self, from_, body, to):
+        telefono = to.removeprefix('whatsapp:')
+        with self._lock:
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            if telefono in self.cuelgan:
+                self.liberar.wait(5)
+            time.sleep(self.demora)
+            if telefono in self.fallan:
+                raise RuntimeError(f"Twilio rechazó {telefono}")
+            with self._lock:
+                self.enviados.append(telefono)
+            return SimpleNamespace(sid=f"SM{len(self.enviados):04d}", status="queued")
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+
+
+def _servicio(twilio: TwilioSimulado, concurrencia: int, timeout: float = 5.0) -> WhatsAppService:
+    servicio = WhatsAppService(client=twilio)
+    servicio.concurrencia = concurrencia
+    servicio.timeout = timeout
+    servicio.limitador = TokenBucket(0)  # sin límite de ritmo
+    return servicio
+
+
+def _envios(cantidad: int) -> list:
+    return [
+        {"cliente": f"Empresa {i}", "telefono": f"+1809555{i:04d}", "mensaje": f"Mensaje {i}"}
+        for i in range(cantidad)
+    ]
+
+
+def test_concurrencia_acotada():
+    twilio = TwilioSimulado()
+    servicio = _servicio(twilio, concurrencia=3)
+
+    resultado = asyncio.run(servicio.enviar_masivo(_envios(12)))
+
+    assert resultado["total"] == 12
+    assert len(resultado["enviados"]) == 12
+    assert resultado["errores"] == []
+    assert twilio.max_en_curso == 3
+    assert sorted(twilio.enviados) == sorted(e["telefono"] for e in _envios(12))
+
+
+def test_errores_aislados_y_conteo():
+    envios = _envios(8)
+    falla, cuelga = envios[2]["telefono"], envios[5]["telefono"]
+    twilio = TwilioSimulado(fallan={falla}, cuelgan={cuelga})
+    servicio = _servicio(twilio, concurrencia=4, timeout=0.3)
+
+    try:
+        resultado = asyncio.run(servicio.enviar_masivo(envios))
+    finally:
+        twilio.liberar.set()
+
+    assert resultado["total"] == 8
+    assert len(resultado["enviados"]) == 6
+    assert len(resultado["errores"]) == 2
+    assert resultado["timeouts"] == 1
+
+    errores = {r["to"]: r for r in resultado["errores"]}
+    assert "rechazó" in errores[falla]["error"]
+    assert errores[cuelga]["timeout"] is True
+    assert errores[falla]["cliente"] == "Empresa 2"
+
+    # Cada resultado conserva las claves del envío y el sid de Twilio
+    for enviado in resultado["enviados"]:
+        assert enviado["cliente"].startswith("Empresa ")
+        assert enviado["message_sid"].startswith("SM")
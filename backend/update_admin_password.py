@@ -1,13 +1,17 @@
 """
 Script para actualizar la contraseña del usuario admin en la base de datos SQLite.
+También cierra las sesiones abiertas del usuario (usuarios.sesiones_desde). El
+servidor en ejecución guarda los usuarios en caché, así que el cambio se aplica
+allí en a lo sumo USER_CACHE_TTL_SECONDS.
 Uso:
     python update_admin_password.py --password NUEVA_CONTRASENA [--username admin]
 """
 
 import argparse
-import sqlite3
 from auth import get_password_hash
 from config import settings
+from connection_pool import pool
+from database import migraciones
 
 
 def update_password(username: str, new_password: str) -> None:
@@ -17,20 +21,22 @@ def update_password(username: str, new_password: str) -> None:
 
     hash_nuevo = get_password_hash(new_password)
 
-    conn = sqlite3.connect(settings.DATABASE_PATH)
-    cursor = conn.cursor()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute(
-        "UPDATE usuarios SET password_hash = ? WHERE username = ?",
-        (hash_nuevo, username),
-    )
+        cursor.execute(
+            """
+            UPDATE usuarios
+            SET password_hash = ?, sesiones_desde = CAST(strftime('%s', 'now') AS INTEGER)
+            WHERE username = ?
+            """,
+            (hash_nuevo, username),
+        )
 
-    if cursor.rowcount == 0:
-        conn.close()
-        raise RuntimeError(f"No se encontró el usuario '{username}'.")
+        if cursor.rowcount == 0:
+            raise RuntimeError(f"No se encontró el usuario '{username}'.")
 
-    conn.commit()
-    conn.close()
+        conn.commit()
 
 
 def main():
@@ -49,8 +55,14 @@ def main():
     )
 
     args = parser.parse_args()
+    # La columna sesiones_desde llega con la migración 0007
+    migraciones.aplicar(settings.DATABASE_PATH)
     update_password(args.username, args.password)
     print(f"Contraseña actualizada correctamente para el usuario '{args.username}'.")
+    print(
+        f"Las sesiones abiertas quedan revocadas. Un servidor en ejecución aplica el cambio "
+        f"en a lo sumo {settings.USER_CACHE_TTL_SECONDS:g} segundos (caché de usuarios)."
+    )
 
 
 if __name__ == "__main__":
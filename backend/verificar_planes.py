@@ -0,0 +1,258 @@
+"""
+Verificador de planes de consulta
+
+Crea una base temporal con todas las migraciones, la llena con datos de
+prueba y recorre las operaciones de DatabaseService (y de los servicios en
+segundo plano que comparten el pool) registrando cada sentencia que llega a
+SQLite. Después corre EXPLAIN QUERY PLAN sobre cada forma distinta de
+consulta y falla si alguna recorre una tabla completa sin índice.
+
+Los recorridos completos que son intencionales (listados sin filtro,
+reconstrucción del resumen) están en PERMITIDOS con su motivo.
+
+Uso:
+    python verificar_planes.py
+    python verificar_planes.py --detalle
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+# La base temporal tiene que estar configurada antes de importar config
+_DIRECTORIO = tempfile.mkdtemp(prefix="planes-")
+os.environ["DATABASE_PATH"] = str(Path(_DIRECTORIO) / "planes.db")
+
+from config import settings  # noqa: E402
+from connection_pool import pool  # noqa: E402
+from database import migraciones  # noqa: E402
+
+# Fragmento de la sentencia (espacios normalizados) -> motivo por el que
+# puede recorrer la tabla entera
+PERMITIDOS = {
+    "WHERE estado_pago IS NOT (": "reclasificación diaria de todos los clientes",
+    "substr(fecha_vencimiento, 1, 7) AS mes": "reconstrucción y verificación del resumen",
+    "FROM licencias_revocadas ORDER BY": "lista completa de revocadas (sincronización inicial)",
+    "ORDER BY c.id DESC": "clientes más recientes: recorre en orden de id y para en el LIMIT",
+}
+
+# Tablas de una fila por mes, por tarea o fija: recorrerlas no cuesta nada
+TABLAS_PEQUENAS = {"resumen_mensual", "resumen_clientes", "version_datos", "tareas_programadas", "schema_version"}
+
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+_SCAN = re.compile(r"^SCAN (\w+)$")
+_SUBCONSULTA = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\w+)")
+
+
+class Registro:
+    """Sentencias vistas por las conexiones del pool, una por forma"""
+
+    def __init__(self):
+        self.sentencias = {}
+
+    def __call__(self, sql: str):
+        texto = sql.strip()
+        if not texto or texto.startswith("--") or texto.upper().startswith(("EXPLAIN", "PRAGMA")):
+            return
+        if not texto.split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH"):
+            return
+        forma = _ESPACIOS.sub(" ", _LITERALES.sub("?", texto))
+        self.sentencias.setdefault(forma, texto)
+
+
+def _instrumentar(registro: Registro):
+    conectar = pool._connect
+
+    def conectar_con_traza():
+        conn = conectar()
+        conn.set_trace_callback(registro)
+        return conn
+
+    pool._connect = conectar_con_traza
+
+
+def _sembrar(db_service, clientes: int):
+    """Clientes con historial de pagos y licencias, escritos por el propio servicio"""
+    hoy = date.today()
+    planes = ["Basico", "Premium", "Empresarial"]
+    for i in range(clientes):
+        inicio = hoy - timedelta(days=30 * (i % 12) + i % 30)
+        cliente = db_service.create_cliente({
+            "nombre_empresa": f"Empresa {i:04d}",
+            "contacto_nombre": f"Contacto {i}",
+            "telefono": f"809555{i:04d}",
+            "email": f"cliente{i}@example.com",
+            "plan": planes[i % len(planes)],
+            "precio_mensual": 1500.0 + 500 * (i % len(planes)),
+            "fecha_inicio": inicio.isoformat(),
+        })
+        if i % 3 == 0:
+            db_service.create_pago({
+                "cliente_renta_id": cliente["id"],
+                "monto": cliente["precio_mensual"],
+                "fecha_pago": (inicio + timedelta(days=28)).isoformat(),
+                "fecha_vencimiento": (inicio + timedelta(days=30)).isoformat(),
+                "metodo_pago": "Transferencia",
+            }, "verificador")
+        if i % 10 == 0:
+            db_service.suspend_license(cliente["id"])
+
+
+def _recorrer(db_service):
+    """Ejecuta cada operación de lectura y de mantenimiento al menos una vez"""
+    from eventos import bus_eventos
+
+    hoy = date.today()
+    desde = (hoy - timedelta(days=365)).isoformat()
+    hasta = hoy.isoformat()
+
+    clientes = db_service.get_clientes()["clientes"]
+    db_service.get_clientes(estado="Activo")
+    db_service.get_clientes(q="empresa 00", plan="Premium")
+    db_service.get_clientes(q="8095550", estado_pago="al_dia")
+    for orden in ("nombre", "vencimiento", "recientes"):
+        pagina = db_service.get_clientes(orden=orden, limit=5)
+        db_service.get_clientes(orden=orden, limit=5, cursor=pagina["siguiente_cursor"])
+    db_service.get_clientes(estado="Activo", vence_en_dias=7, orden="vencimiento", limit=5)
+    cliente = clientes[0]
+    db_service.get_cliente(cliente["id"])
+    db_service.update_cliente(cliente["id"], {"email": "verificado@example.com"})
+    db_service.get_pagos_cliente(cliente["id"])
+    db_service.get_usuario_activo("admin")
+    db_service.get_version_datos()
+    db_service.normalizar_telefonos()
+
+    pagina = db_service.get_pagos(limit=5)
+    db_service.get_pagos(limit=5, cursor=pagina["siguiente_cursor"])
+    db_service.get_pagos(desde=desde, hasta=hasta, limit=5)
+    db_service.get_pagos(estado="Pendiente", limit=5)
+    db_service.get_pagos(metodo_pago="Transferencia", limit=5)
+    db_service.get_pagos(cliente_id=cliente["id"], limit=5)
+
+    claves = [c["licencia_key"] for c in clientes[:20]]
+    db_service.verify_licenses(claves)
+    db_service.license_cache.clear()
+    db_service.verify_license(claves[0])
+    db_service.heartbeats.record_many(claves)
+    db_service.heartbeats.flush()
+    db_service.get_licencias_revocadas()
+    db_service.get_licencias_revocadas(desde)
+
+    mora = db_service.get_clientes_en_mora(dias_minimos=1, limit=5)
+    if mora["siguiente_cursor"]:
+        db_service.get_clientes_en_mora(dias_minimos=1, limit=5, cursor=mora["siguiente_cursor"])
+    db_service.encolar_notificaciones_mora(dias_minimos=1)
+    db_service.encolar_recordatorios(dias_laborables=30)
+
+    db_service.barrido_pagos_atrasados(None)
+    db_service.barrido_licencias_expiradas(None)
+    db_service.barrido_estado_clientes(None, hoy + timedelta(days=1))
+    db_service.preparar_resumen()
+    db_service.get_dashboard_data()
+
+    db_service.get_ingresos_mensuales(desde, hasta)
+    db_service.get_ingresos_por_plan(desde, hasta)
+    db_service.get_ingresos_por_metodo(desde, hasta)
+    db_service.get_tasa_cobro(desde, hasta)
+    db_service.get_reporte_resumen(desde, hasta)
+
+    filas, despues = db_service.lote_exportacion_pagos(lote=5)
+    db_service.lote_exportacion_pagos(despues=despues, lote=5)
+    db_service.lote_exportacion_pagos(desde=desde, hasta=hasta, estado="Pagado", despues=despues, lote=5)
+    db_service.lote_exportacion_pagos(metodo_pago="Transferencia", lote=5)
+    filas, despues = db_service.lote_exportacion_pagos(desde=desde, hasta=hasta, por="vencimiento", lote=5)
+    db_service.lote_exportacion_pagos(desde=desde, hasta=hasta, por="vencimiento", despues=despues, lote=5)
+    db_service.lote_exportacion_pagos(cliente_id=cliente["id"], lote=5)
+    filas, despues = db_service.lote_exportacion_clientes(lote=5)
+    db_service.lote_exportacion_clientes(estado="Activo", plan="Premium", despues=despues, lote=5)
+    db_service.lote_exportacion_clientes(desde=desde, hasta=hasta, lote=5)
+
+    lote = db_service.outbox._reclamar_lote()
+    db_service.outbox._registrar_resultados(lote, [{"success": False, "error": "verificador"}] * len(lote))
+    db_service.outbox.stats()
+
+    bus_eventos._id_actual()
+    bus_eventos.sondear()
+    bus_eventos._purgar()
+
+    import resumen
+    with pool.connection() as conn:
+        resumen.reconstruir(conn)
+        resumen.verificar(conn)
+
+
+def recorridos_completos(conn, sql: str) -> list:
+    """Tablas que el plan recorre enteras sin usar ningún índice"""
+    subconsultas = set()
+    tablas = []
+    for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        detalle = fila[3]
+        subconsulta = _SUBCONSULTA.match(detalle)
+        if subconsulta:
+            subconsultas.add(subconsulta.group(1))
+            continue
+        recorrido = _SCAN.match(detalle)
+        if recorrido and recorrido.group(1) not in subconsultas | TABLAS_PEQUENAS:
+            tablas.append(recorrido.group(1))
+    return tablas
+
+
+def _permitido(sql: str):
+    texto = _ESPACIOS.sub(" ", sql)
+    for fragmento, motivo in PERMITIDOS.items():
+        if fragmento in texto:
+            return motivo
+    return None
+
+
+def verificar(clientes: int = 300, detalle: bool = False) -> int:
+    migraciones.aplicar(settings.DATABASE_PATH)
+
+    registro = Registro()
+    _instrumentar(registro)
+
+    from database_service import db_service
+    _sembrar(db_service, clientes)
+    _recorrer(db_service)
+
+    errores = 0
+    with pool.connection() as conn:
+        for sql in registro.sentencias.values():
+            tablas = recorridos_completos(conn, sql)
+            motivo = _permitido(sql) if tablas else None
+            resumen_sql = _ESPACIOS.sub(" ", sql)[:110]
+            if tablas and not motivo:
+                errores += 1
+                print(f"❌ SCAN {', '.join(tablas)}: {resumen_sql}")
+            elif tablas:
+                print(f"  · SCAN {', '.join(tablas)} permitido ({motivo})")
+            elif detalle:
+                print(f"✅ {resumen_sql}")
+            if detalle:
+                for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+                    print(f"      {fila[3]}")
+
+    print(f"{len(registro.sentencias)} consultas verificadas, {errores} con recorrido completo")
+    return errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificador de planes de consulta")
+    parser.add_argument("--clientes", type=int, default=300, help="Clientes de prueba a sembrar")
+    parser.add_argument("--detalle", action="store_true", help="Muestra el plan de cada consulta")
+    args = parser.parse_args()
+    try:
+        errores = verificar(args.clientes, args.detalle)
+    finally:
+        pool.close_all()
+        shutil.rmtree(_DIRECTORIO, ignore_errors=True)
+    sys.exit(1 if errores else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,66 +2,116 @@
 Servicio de WhatsApp con Twilio
 Anthony System - Sistema de Gestión de Rentas
 """
-from twilio.rest import Client
-from config import settings
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import List, Optional
 
-class WhatsAppService:
-    def __init__(self):
-        self.enabled = settings.WHATSAPP_ENABLED
-        if self.enabled:
-            self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-            self.from_number = settings.TWILIO_WHATSAPP_FROM
-    
-    def enviar_notificacion_mora(self, cliente: dict, dias_mora: int, fecha_vencimiento: str) -> dict:
-        """Enviar notificación de pago vencido por WhatsApp"""
-        
-        if not self.enabled:
-            return {
-                "success": False,
-                "message": "WhatsApp no está habilitado. Configura WHATSAPP_ENABLED=true en .env"
-            }
-        
-        # Formatear teléfono (debe incluir código de país)
-        telefono = cliente['telefono'].replace('-', '').replace(' ', '')
-        if not telefono.startswith('+'):
-            # Asumir República Dominicana (+1809, +1829, +1849)
-            if telefono.startswith('809') or telefono.startswith('829') or telefono.startswith('849'):
-                telefono = f"+1{telefono}"
-            else:
-                telefono = f"+1809{telefono}"
-        
-        # Mensaje personalizado
-        mensaje = f"""⚠️ *NOTIFICACIÓN DE PAGO VENCIDO*
-*ANTHONY SISTEM*
-
-Hola *{cliente['contacto_nombre']}*,
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+from config import settings
+from plantillas import contexto_cliente, motor_plantillas
 
-Tu pago mensual está *VENCIDO*:
 
-💰 *Monto:* ${cliente['precio_mensual']}
-📅 *Fecha de vencimiento:* {fecha_vencimiento}
-⏰ *Días laborables de mora:* {dias_mora}
+def formatear_telefono(telefono: str) -> str:
+    """Teléfono en formato E.164; sin código de país se asume República Dominicana (+1809, +1829, +1849)"""
+    digitos = ''.join(c for c in telefono if c.isdigit())
+    if telefono.strip().startswith('+'):
+        return f"+{digitos}"
+    if len(digitos) == 11 and digitos.startswith('1'):
+        return f"+{digitos}"
+    if digitos.startswith(('809', '829', '849')):
+        return f"+1{digitos}"
+    return f"+1809{digitos}"
 
-🚫 *Tu servicio está SUSPENDIDO por falta de pago*
 
-*Deposita en cualquiera de estas cuentas:*
+def telefono_destino(cliente: dict) -> str:
+    """Teléfono normalizado guardado con el cliente (o normalizado al vuelo si falta)"""
+    return cliente.get('telefono_e164') or formatear_telefono(cliente['telefono'])
 
-🔴 *BHD León*
-Cuenta: *06584350073*
-A nombre de: Antonio Payano
 
-🔵 *Banreservas*
-Cuenta: *9608461925*
-A nombre de: Antonio Payano
+class TokenBucket:
+    """Limita a `rate` mensajes por segundo, con ráfagas de hasta `capacity`.
+    
+    Cada llamada reserva un token y devuelve cuánto debe esperar; el saldo
+    negativo hace de cola, así que las esperas quedan en orden de llegada.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._actualizado = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reservar(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (ahora - self._actualizado) * self.rate)
+            self._actualizado = ahora
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    async def adquirir(self):
+        espera = self.reservar()
+        if espera > 0:
+            await asyncio.sleep(espera)
 
-📱 Después de depositar, envía tu comprobante por WhatsApp para reactivar tu servicio inmediatamente.
 
-Gracias por tu comprensión.
-_Anthony System - Gestión de Rentas_"""
+class WhatsAppService:
+    def __init__(self, client=None):
+        """`client` reemplaza al Client de Twilio (por ejemplo, un stub en pruebas)"""
+        self.enabled = settings.WHATSAPP_ENABLED or client is not None
+        self.client = client
+        self.from_number = settings.TWILIO_WHATSAPP_FROM
+        if self.enabled and self.client is None:
+            # El timeout HTTP libera el hilo aunque el envío ya se haya dado por vencido
+            self.client = Client(
+                settings.TWILIO_ACCOUNT_SID,
+                settings.TWILIO_AUTH_TOKEN,
+                http_client=TwilioHttpClient(timeout=settings.WHATSAPP_SEND_TIMEOUT_SECONDS),
+            )
+        
+        self.concurrencia = max(1, settings.WHATSAPP_MAX_CONCURRENCY)
+        self.timeout = settings.WHATSAPP_SEND_TIMEOUT_SECONDS
+        self.limitador = TokenBucket(settings.WHATSAPP_MESSAGES_PER_SECOND)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+    
+    # ==================== MENSAJES ====================
+    # Los cuerpos salen de plantillas compiladas (ver plantillas.py). Dentro de
+    # una transacción se pasa el `cursor` para no pedir otra conexión al pool
+    
+    def mensaje_mora(self, cliente: dict, dias_mora: int, fecha_vencimiento: str, cursor=None) -> str:
+        return motor_plantillas.renderizar('mora', {
+            **contexto_cliente(cliente), 'dias_mora': dias_mora, 'fecha_vencimiento': fecha_vencimiento
+        }, cursor=cursor)
+    
+    def mensaje_confirmacion_pago(self, cliente: dict, monto: float, fecha_pago: str, cursor=None) -> str:
+        return motor_plantillas.renderizar('pago_recibido', {
+            **contexto_cliente(cliente), 'monto': monto, 'fecha_pago': fecha_pago
+        }, cursor=cursor)
+    
+    def mensaje_recordatorio(self, cliente: dict, dias_restantes: int, fecha_vencimiento: str, cursor=None) -> str:
+        return motor_plantillas.renderizar('recordatorio', {
+            **contexto_cliente(cliente), 'dias_restantes': dias_restantes, 'fecha_vencimiento': fecha_vencimiento
+        }, cursor=cursor)
+    
+    # ==================== ENVÍO ====================
+    
+    def _enviar(self, telefono: str, mensaje: str) -> dict:
+        """Envía un mensaje (llamada HTTP bloqueante a Twilio)"""
+        if not self.enabled:
+            return {
+                "success": False,
+                "message": "WhatsApp no está habilitado. Configura WHATSAPP_ENABLED=true en .env"
+            }
         
         try:
-            # Enviar mensaje
             message = self.client.messages.create(
                 from_=self.from_number,
                 body=mensaje,
@@ -83,107 +133,91 @@ _Anthony System - Gestión de Rentas_"""
                 "to": telefono
             }
     
+    def enviar_notificacion_mora(self, cliente: dict, dias_mora: int, fecha_vencimiento: str) -> dict:
+        """Enviar notificación de pago vencido por WhatsApp"""
+        return self._enviar(
+            telefono_destino(cliente),
+            self.mensaje_mora(cliente, dias_mora, fecha_vencimiento),
+        )
+    
     def enviar_confirmacion_pago(self, cliente: dict, monto: float, fecha_pago: str) -> dict:
         """Enviar confirmación de pago recibido"""
-        
-        if not self.enabled:
-            return {"success": False, "message": "WhatsApp no habilitado"}
-        
-        telefono = cliente['telefono'].replace('-', '').replace(' ', '')
-        if not telefono.startswith('+'):
-            if telefono.startswith('809') or telefono.startswith('829') or telefono.startswith('849'):
-                telefono = f"+1{telefono}"
-            else:
-                telefono = f"+1809{telefono}"
-        
-        mensaje = f"""✅ *PAGO RECIBIDO*
-*ANTHONY SISTEM*
-
-Hola *{cliente['contacto_nombre']}*,
-
-Hemos recibido tu pago:
-
-💰 *Monto:* ${monto}
-📅 *Fecha:* {fecha_pago}
-🏢 *Empresa:* {cliente['nombre_empresa']}
-
-✅ *Tu servicio ha sido REACTIVADO*
-
-Gracias por tu pago puntual.
-_Anthony System - Gestión de Rentas_"""
-        
-        try:
-            message = self.client.messages.create(
-                from_=self.from_number,
-                body=mensaje,
-                to=f'whatsapp:{telefono}'
-            )
-            
-            return {
-                "success": True,
-                "message_sid": message.sid,
-                "status": message.status
-            }
-        
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
-            }
+        return self._enviar(
+            telefono_destino(cliente),
+            self.mensaje_confirmacion_pago(cliente, monto, fecha_pago),
+        )
     
     def enviar_recordatorio_proximo_vencimiento(self, cliente: dict, dias_restantes: int, fecha_vencimiento: str) -> dict:
         """Enviar recordatorio de próximo vencimiento (3 días antes)"""
+        return self._enviar(
+            telefono_destino(cliente),
+            self.mensaje_recordatorio(cliente, dias_restantes, fecha_vencimiento),
+        )
+    
+    # ==================== ENVÍO MASIVO ====================
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.concurrencia, thread_name_prefix="whatsapp"
+                )
+            return self._executor
+    
+    async def enviar_masivo(self, envios: List[dict]) -> dict:
+        """Envía varios mensajes a la vez sin bloquear el event loop.
         
-        if not self.enabled:
-            return {"success": False, "message": "WhatsApp no habilitado"}
+        Cada envío es un dict con `telefono` (E.164) y `mensaje`; el resto de sus
+        claves se copia al resultado para identificarlo. A lo sumo
+        `WHATSAPP_MAX_CONCURRENCY` envíos en curso, al ritmo de
+        `WHATSAPP_MESSAGES_PER_SECOND`, y cada uno con su propio timeout.
+        """
+        inicio = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        semaforo = asyncio.Semaphore(self.concurrencia)
         
-        telefono = cliente['telefono'].replace('-', '').replace(' ', '')
-        if not telefono.startswith('+'):
-            if telefono.startswith('809') or telefono.startswith('829') or telefono.startswith('849'):
-                telefono = f"+1{telefono}"
-            else:
-                telefono = f"+1809{telefono}"
+        async def enviar(envio: dict) -> dict:
+            datos = {k: v for k, v in envio.items() if k not in ('telefono', 'mensaje')}
+            telefono = envio['telefono']
+            async with semaforo:
+                await self.limitador.adquirir()
+                try:
+                    resultado = await asyncio.wait_for(
+                        loop.run_in_executor(executor, self._enviar, telefono, envio['mensaje']),
+                        timeout=self.timeout,
+                    )
+                except asyncio.TimeoutError:
+                    resultado = {
+                        "success": False,
+                        "error": f"Tiempo de espera agotado ({self.timeout:g} s)",
+                        "timeout": True,
+                        "to": telefono
+                    }
+            return {**datos, **resultado}
         
-        mensaje = f"""🔔 *RECORDATORIO DE PAGO*
-*ANTHONY SISTEM*
-
-Hola *{cliente['contacto_nombre']}*,
-
-Te recordamos que tu pago vence pronto:
-
-💰 *Monto:* ${cliente['precio_mensual']}
-📅 *Fecha de vencimiento:* {fecha_vencimiento}
-⏰ *Días restantes:* {dias_restantes}
-
-*Deposita en cualquiera de estas cuentas:*
-
-🔴 *BHD León*: 06584350073
-🔵 *Banreservas*: 9608461925
-A nombre de: Antonio Payano
-
-📱 Envía tu comprobante después de depositar.
-
-Gracias.
-_Anthony System_"""
-        
-        try:
-            message = self.client.messages.create(
-                from_=self.from_number,
-                body=mensaje,
-                to=f'whatsapp:{telefono}'
-            )
-            
-            return {
-                "success": True,
-                "message_sid": message.sid,
-                "status": message.status
-            }
+        resultados = await asyncio.gather(*(enviar(envio) for envio in envios))
         
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e)
+        enviados = [r for r in resultados if r['success']]
+        errores = [r for r in resultados if not r['success']]
+        return {
+            "total": len(resultados),
+            "enviados": enviados,
+            "errores": errores,
+            "timeouts": sum(1 for r in errores if r.get('timeout')),
+            "duracion_s": round(time.perf_counter() - inicio, 3)
+        }
+    
+    async def enviar_notificaciones_mora(self, clientes: List[dict]) -> dict:
+        """Notificación de mora a cada cliente (con `dias_mora` y `fecha_vencimiento`)"""
+        return await self.enviar_masivo([
+            {
+                "cliente": cliente['nombre_empresa'],
+                "telefono": telefono_destino(cliente),
+                "mensaje": self.mensaje_mora(cliente, cliente['dias_mora'], cliente['fecha_vencimiento'])
             }
+            for cliente in clientes
+        ])
 
 # Instancia global
 whatsapp_service = WhatsAppService()
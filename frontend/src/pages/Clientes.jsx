@@ -1,60 +1,61 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { Link } from 'react-router-dom'
 import { Search, Plus, Phone, Mail, Calendar } from 'lucide-react'
 import api from '../services/api'
 
+const POR_PAGINA = 50
+
 export default function Clientes() {
   const [clientes, setClientes] = useState([])
-  const [filteredClientes, setFilteredClientes] = useState([])
+  const [siguienteCursor, setSiguienteCursor] = useState(null)
   const [loading, setLoading] = useState(true)
+  const [cargandoMas, setCargandoMas] = useState(false)
   const [searchTerm, setSearchTerm] = useState('')
   const [filtroEstado, setFiltroEstado] = useState('todos')
+  const ultimaBusqueda = useRef(0)
 
+  // Búsqueda y filtros en el servidor; se espera a que el usuario deje de escribir
   useEffect(() => {
-    loadClientes()
-  }, [])
-
-  useEffect(() => {
-    filterClientes()
-  }, [searchTerm, filtroEstado, clientes])
+    const espera = setTimeout(() => loadClientes(), searchTerm ? 250 : 0)
+    return () => clearTimeout(espera)
+  }, [searchTerm, filtroEstado])
+
+  const parametros = (cursor) => {
+    const params = { limit: POR_PAGINA }
+    if (searchTerm.trim()) params.q = searchTerm.trim()
+    if (filtroEstado !== 'todos') params.estado_pago = filtroEstado
+    if (cursor) params.cursor = cursor
+    return params
+  }
 
   const loadClientes = async () => {
+    // Descarta respuestas de búsquedas que ya quedaron atrás
+    const busqueda = ++ultimaBusqueda.current
     try {
-      const response = await api.get('/clientes')
+      const response = await api.get('/clientes', { params: parametros() })
+      if (busqueda !== ultimaBusqueda.current) return
       setClientes(response.data)
+      setSiguienteCursor(response.headers['x-next-cursor'] || null)
     } catch (error) {
       console.error('Error loading clientes:', error)
     } finally {
-      setLoading(false)
+      if (busqueda === ultimaBusqueda.current) setLoading(false)
     }
   }
 
-  const filterClientes = () => {
-    let filtered = clientes
-
-    // Filtrar por búsqueda
-    if (searchTerm) {
-      filtered = filtered.filter(cliente =>
-        cliente.nombre_empresa.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        cliente.contacto_nombre.toLowerCase().includes(searchTerm.toLowerCase())
-      )
-    }
-
-    // Filtrar por estado
-    if (filtroEstado !== 'todos') {
-      filtered = filtered.filter(cliente => {
-        if (filtroEstado === 'al_dia') {
-          return cliente.dias_hasta_vencimiento > 3
-        } else if (filtroEstado === 'por_vencer') {
-          return cliente.dias_hasta_vencimiento >= 0 && cliente.dias_hasta_vencimiento <= 3
-        } else if (filtroEstado === 'atrasados') {
-          return cliente.dias_hasta_vencimiento < 0
-        }
-        return true
-      })
+  const cargarMas = async () => {
+    const busqueda = ultimaBusqueda.current
+    setCargandoMas(true)
+    try {
+      const response = await api.get('/clientes', { params: parametros(siguienteCursor) })
+      if (busqueda !== ultimaBusqueda.current) return
+      setClientes(actuales => [...actuales, ...response.data])
+      setSiguienteCursor(response.headers['x-next-cursor'] || null)
+    } catch (error) {
+      console.error('Error loading clientes:', error)
+    } finally {
+      setCargandoMas(false)
     }
-
-    setFilteredClientes(filtered)
   }
 
   const getEstadoBadge = (dias) => {
@@ -78,7 +79,9 @@ export default function Clientes() {
       <div className="flex justify-between items-center">
         <div>
           <h1 className="text-3xl font-bold text-gray-900">Clientes</h1>
-          <p className="text-gray-600 mt-1">{filteredClientes.length} clientes encontrados</p>
+          <p className="text-gray-600 mt-1">
+            {clientes.length}{siguienteCursor ? '+' : ''} clientes encontrados
+          </p>
         </div>
         <Link to="/clientes/nuevo" className="btn-primary flex items-center space-x-2">
           <Plus className="h-5 w-5" />
@@ -94,7 +97,7 @@ export default function Clientes() {
             <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 h-5 w-5 text-gray-400" />
             <input
               type="text"
-              placeholder="Buscar cliente..."
+              placeholder="Buscar por empresa, contacto, teléfono o cédula..."
               value={searchTerm}
               onChange={(e) => setSearchTerm(e.target.value)}
               className="input pl-10"
@@ -110,14 +113,14 @@ export default function Clientes() {
             <option value="todos">Todos los clientes</option>
             <option value="al_dia">Al día</option>
             <option value="por_vencer">Por vencer</option>
-            <option value="atrasados">Atrasados</option>
+            <option value="atrasado">Atrasados</option>
           </select>
         </div>
       </div>
 
       {/* Clientes List */}
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-        {filteredClientes.map((cliente) => {
+        {clientes.map((cliente) => {
           const estado = getEstadoBadge(cliente.dias_hasta_vencimiento)
           return (
             <Link
@@ -162,7 +165,15 @@ export default function Clientes() {
         })}
       </div>
 
-      {filteredClientes.length === 0 && (
+      {siguienteCursor && (
+        <div className="text-center">
+          <button onClick={cargarMas} disabled={cargandoMas} className="btn-secondary">
+            {cargandoMas ? 'Cargando...' : 'Cargar más'}
+          </button>
+        </div>
+      )}
+
+      {clientes.length === 0 && (
         <div className="text-center py-12">
           <p className="text-gray-500">No se encontraron clientes</p>
         </div>
@@ -1,11 +1,17 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { DollarSign, TrendingUp, TrendingDown, Calendar, Download, Filter } from 'lucide-react'
-import { format, startOfMonth, endOfMonth, subMonths } from 'date-fns'
+import { format, parseISO, startOfMonth, endOfMonth } from 'date-fns'
 import api from '../services/api'
+import { descargarExportacion } from '../services/exportacion'
+
+const POR_PAGINA = 100
 
 export default function Contabilidad() {
   const [loading, setLoading] = useState(true)
   const [pagos, setPagos] = useState([])
+  const [siguienteCursor, setSiguienteCursor] = useState(null)
+  const [cargandoMas, setCargandoMas] = useState(false)
+  const [tasa, setTasa] = useState(null)
   const [clientes, setClientes] = useState([])
   const [filtros, setFiltros] = useState({
     fechaInicio: format(startOfMonth(new Date()), 'yyyy-MM-dd'),
@@ -13,95 +19,76 @@ export default function Contabilidad() {
     estado: 'todos',
     cliente: 'todos'
   })
+  const ultimaConsulta = useRef(0)
 
   useEffect(() => {
-    loadData()
+    api.get('/clientes')
+      .then(response => setClientes(response.data))
+      .catch(error => console.error('Error al cargar clientes:', error))
   }, [])
 
+  // Filtros, totales y paginación en el servidor
+  useEffect(() => {
+    if (filtros.fechaInicio && filtros.fechaFin && filtros.fechaInicio <= filtros.fechaFin) loadData()
+  }, [filtros])
+
+  const parametros = (cursor) => {
+    const params = { desde: filtros.fechaInicio, hasta: filtros.fechaFin, limit: POR_PAGINA }
+    if (filtros.estado !== 'todos') params.estado = filtros.estado
+    if (filtros.cliente !== 'todos') params.cliente_id = filtros.cliente
+    if (cursor) params.cursor = cursor
+    return params
+  }
+
   const loadData = async () => {
+    // Descarta respuestas de filtros que ya quedaron atrás
+    const consulta = ++ultimaConsulta.current
     try {
-      const [pagosRes, clientesRes] = await Promise.all([
-        api.get('/clientes'),
-        api.get('/clientes')
+      const [pagosRes, tasaRes] = await Promise.all([
+        api.get('/pagos', { params: parametros() }),
+        api.get('/reportes/tasa-cobro', { params: { desde: filtros.fechaInicio, hasta: filtros.fechaFin } })
       ])
-      
-      // Obtener todos los pagos de todos los clientes
-      const todosLosPagos = []
-      for (const cliente of clientesRes.data) {
-        try {
-          const pagosCliente = await api.get(`/clientes/${cliente.id}/pagos`)
-          todosLosPagos.push(...pagosCliente.data.map(p => ({
-            ...p,
-            cliente_nombre: cliente.nombre_empresa,
-            cliente_id: cliente.id
-          })))
-        } catch (error) {
-          console.error(`Error cargando pagos del cliente ${cliente.id}:`, error)
-        }
-      }
-      
-      setPagos(todosLosPagos)
-      setClientes(clientesRes.data)
+      if (consulta !== ultimaConsulta.current) return
+      setPagos(pagosRes.data.pagos)
+      setSiguienteCursor(pagosRes.data.siguiente_cursor)
+      setTasa(tasaRes.data)
     } catch (error) {
       console.error('Error al cargar datos:', error)
     } finally {
-      setLoading(false)
+      if (consulta === ultimaConsulta.current) setLoading(false)
     }
   }
 
-  const pagosFiltrados = pagos.filter(pago => {
-    const fechaPago = new Date(pago.fecha_pago)
-    const fechaInicio = new Date(filtros.fechaInicio)
-    const fechaFin = new Date(filtros.fechaFin)
-    
-    const cumpleFecha = fechaPago >= fechaInicio && fechaPago <= fechaFin
-    const cumpleEstado = filtros.estado === 'todos' || pago.estado === filtros.estado
-    const cumpleCliente = filtros.cliente === 'todos' || pago.cliente_id === parseInt(filtros.cliente)
-    
-    return cumpleFecha && cumpleEstado && cumpleCliente
-  })
-
-  const calcularEstadisticas = () => {
-    const totalIngresos = pagosFiltrados
-      .filter(p => p.estado === 'Pagado')
-      .reduce((sum, p) => sum + p.monto, 0)
-    
-    const totalPendiente = pagosFiltrados
-      .filter(p => p.estado === 'Pendiente')
-      .reduce((sum, p) => sum + p.monto, 0)
-    
-    const totalAtrasado = pagosFiltrados
-      .filter(p => p.estado === 'Atrasado')
-      .reduce((sum, p) => sum + p.monto, 0)
-    
-    return { totalIngresos, totalPendiente, totalAtrasado }
+  const cargarMas = async () => {
+    const consulta = ultimaConsulta.current
+    setCargandoMas(true)
+    try {
+      const response = await api.get('/pagos', { params: parametros(siguienteCursor) })
+      if (consulta !== ultimaConsulta.current) return
+      setPagos(actuales => [...actuales, ...response.data.pagos])
+      setSiguienteCursor(response.data.siguiente_cursor)
+    } catch (error) {
+      console.error('Error al cargar pagos:', error)
+    } finally {
+      setCargandoMas(false)
+    }
   }
 
-  const stats = calcularEstadisticas()
+  const porcentaje = (monto) => tasa.facturado > 0 ? ((monto / tasa.facturado) * 100).toFixed(1) : '0.0'
 
-  const exportarExcel = () => {
-    const csv = [
-      ['Fecha', 'Cliente', 'Monto', 'Estado', 'Método', 'Referencia'].join(','),
-      ...pagosFiltrados.map(p => [
-        format(new Date(p.fecha_pago), 'dd/MM/yyyy'),
-        p.cliente_nombre,
-        p.monto,
-        p.estado,
-        p.metodo_pago || '',
-        p.referencia || ''
-      ].join(','))
-    ].join('\n')
-    
-    const blob = new Blob([csv], { type: 'text/csv' })
-    const url = URL.createObjectURL(blob)
-    const link = document.createElement('a')
-    link.href = url
-    link.download = `contabilidad-${format(new Date(), 'yyyy-MM-dd')}.csv`
-    link.click()
-    URL.revokeObjectURL(url)
+  // El servidor genera el archivo por lotes con los mismos filtros
+  const exportar = (formato) => {
+    descargarExportacion('pagos', {
+      formato,
+      desde: filtros.fechaInicio,
+      hasta: filtros.fechaFin,
+      por: 'vencimiento',
+      estado: filtros.estado !== 'todos' ? filtros.estado : undefined,
+      cliente_id: filtros.cliente !== 'todos' ? filtros.cliente : undefined
+    })
   }
 
-  if (loading) {
+  if (loading || !tasa) {
     return (
       <div className="flex items-center justify-center h-64">
         <div className="text-center">
@@ -120,14 +107,14 @@ export default function Contabilidad() {
         <p className="text-gray-600 mt-1">Gestión financiera y control de ingresos</p>
       </div>
 
-      {/* Estadísticas */}
+      {/* Estadísticas: todo lo que vence en el período */}
       <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
         <div className="card bg-green-50 border-green-200">
           <div className="flex items-center justify-between">
             <div>
               <p className="text-sm text-green-600 font-medium">Ingresos</p>
-              <p className="text-3xl font-bold text-green-700">${stats.totalIngresos.toFixed(2)}</p>
-              <p className="text-xs text-green-600 mt-1">{pagosFiltrados.filter(p => p.estado === 'Pagado').length} pagos</p>
+              <p className="text-3xl font-bold text-green-700">${tasa.cobrado.toFixed(2)}</p>
+              <p className="text-xs text-green-600 mt-1">{(tasa.tasa_cobro * 100).toFixed(1)}% de ${tasa.facturado.toFixed(2)} facturado</p>
             </div>
             <TrendingUp className="h-12 w-12 text-green-500" />
           </div>
@@ -137,8 +124,8 @@ export default function Contabilidad() {
           <div className="flex items-center justify-between">
             <div>
               <p className="text-sm text-yellow-600 font-medium">Pendiente</p>
-              <p className="text-3xl font-bold text-yellow-700">${stats.totalPendiente.toFixed(2)}</p>
-              <p className="text-xs text-yellow-600 mt-1">{pagosFiltrados.filter(p => p.estado === 'Pendiente').length} pagos</p>
+              <p className="text-3xl font-bold text-yellow-700">${tasa.pendiente.toFixed(2)}</p>
+              <p className="text-xs text-yellow-600 mt-1">{porcentaje(tasa.pendiente)}% de lo facturado</p>
             </div>
             <Calendar className="h-12 w-12 text-yellow-500" />
           </div>
@@ -148,8 +135,8 @@ export default function Contabilidad() {
           <div className="flex items-center justify-between">
             <div>
               <p className="text-sm text-red-600 font-medium">Atrasado</p>
-              <p className="text-3xl font-bold text-red-700">${stats.totalAtrasado.toFixed(2)}</p>
-              <p className="text-xs text-red-600 mt-1">{pagosFiltrados.filter(p => p.estado === 'Atrasado').length} pagos</p>
+              <p className="text-3xl font-bold text-red-700">${tasa.atrasado.toFixed(2)}</p>
+              <p className="text-xs text-red-600 mt-1">{porcentaje(tasa.atrasado)}% de lo facturado</p>
             </div>
             <TrendingDown className="h-12 w-12 text-red-500" />
           </div>
@@ -163,19 +150,28 @@ export default function Contabilidad() {
             <Filter className="h-5 w-5 mr-2" />
             Filtros
           </h2>
-          <button
-            onClick={exportarExcel}
-            className="btn-secondary flex items-center space-x-2"
-          >
-            <Download className="h-5 w-5" />
-            <span>Exportar CSV</span>
-          </button>
+          <div className="flex items-center space-x-2">
+            <button
+              onClick={() => exportar('csv')}
+              className="btn-secondary flex items-center space-x-2"
+            >
+              <Download className="h-5 w-5" />
+              <span>Exportar CSV</span>
+            </button>
+            <button
+              onClick={() => exportar('xlsx')}
+              className="btn-secondary flex items-center space-x-2"
+            >
+              <Download className="h-5 w-5" />
+              <span>Exportar Excel</span>
+            </button>
+          </div>
         </div>
 
         <div className="grid grid-cols-1 md:grid-cols-4 gap-4">
           <div>
             <label className="block text-sm font-medium text-gray-700 mb-2">
-              Fecha Inicio
+              Vence desde
             </label>
             <input
               type="date"
@@ -187,7 +183,7 @@ export default function Contabilidad() {
 
           <div>
             <label className="block text-sm font-medium text-gray-700 mb-2">
-              Fecha Fin
+              Vence hasta
             </label>
             <input
               type="date"
@@ -234,7 +230,7 @@ export default function Contabilidad() {
       {/* Tabla de Pagos */}
       <div className="card">
         <h2 className="text-lg font-semibold text-gray-900 mb-4">
-          Transacciones ({pagosFiltrados.length})
+          Transacciones ({pagos.length}{siguienteCursor ? '+' : ''})
         </h2>
         
         <div className="overflow-x-auto">
@@ -244,6 +240,9 @@ export default function Contabilidad() {
                 <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">
                   Fecha
                 </th>
+                <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">
+                  Vence
+                </th>
                 <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">
                   Cliente
                 </th>
@@ -262,13 +261,16 @@ export default function Contabilidad() {
               </tr>
             </thead>
             <tbody className="bg-white divide-y divide-gray-200">
-              {pagosFiltrados.map((pago) => (
+              {pagos.map((pago) => (
                 <tr key={pago.id} className="hover:bg-gray-50">
                   <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
                     {format(new Date(pago.fecha_pago), 'dd/MM/yyyy')}
                   </td>
+                  <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-600">
+                    {format(parseISO(pago.fecha_vencimiento), 'dd/MM/yyyy')}
+                  </td>
                   <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
-                    {pago.cliente_nombre}
+                    {pago.nombre_empresa}
                   </td>
                   <td className="px-6 py-4 whitespace-nowrap text-sm font-semibold text-gray-900">
                     ${pago.monto.toFixed(2)}
@@ -294,7 +296,15 @@ export default function Contabilidad() {
           </table>
         </div>
 
-        {pagosFiltrados.length === 0 && (
+        {siguienteCursor && (
+          <div className="text-center pt-4">
+            <button onClick={cargarMas} disabled={cargandoMas} className="btn-secondary">
+              {cargandoMas ? 'Cargando...' : 'Cargar más'}
+            </button>
+          </div>
+        )}
+
+        {pagos.length === 0 && (
           <div className="text-center py-12">
             <DollarSign className="h-12 w-12 text-gray-400 mx-auto mb-4" />
             <p className="text-gray-500">No hay transacciones para mostrar</p>
@@ -2,6 +2,7 @@ import { useState, useEffect } from 'react'
 import { Bell, Send, Clock, CheckCircle, AlertTriangle } from 'lucide-react'
 import { format, addDays, differenceInDays } from 'date-fns'
 import api from '../services/api'
+import { suscribirEventos } from '../services/eventos'
 
 export default function Notificaciones() {
   const [clientes, setClientes] = useState([])
@@ -10,6 +11,10 @@ export default function Notificaciones() {
 
   useEffect(() => {
     loadClientes()
+    return suscribirEventos(
+      ['cliente_creado', 'cliente_actualizado', 'cliente_suspendido', 'pago_registrado'],
+      loadClientes
+    )
   }, [])
 
   const loadClientes = async () => {
@@ -1,127 +1,61 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { BarChart3, PieChart, TrendingUp, Download, Calendar, FileText } from 'lucide-react'
-import { format, startOfMonth, endOfMonth, subMonths, eachMonthOfInterval } from 'date-fns'
-import api from '../services/api'
+import { format, startOfMonth, endOfMonth, subMonths } from 'date-fns'
+import { cargarResumen, serieMensual } from '../services/reportes'
+import { descargarExportacion } from '../services/exportacion'
 import html2canvas from 'html2canvas'
 
+const PLANES = ['Basico', 'Premium', 'Empresarial']
+
 export default function Reportes() {
   const [loading, setLoading] = useState(true)
-  const [clientes, setClientes] = useState([])
-  const [pagos, setPagos] = useState([])
+  const [resumen, setResumen] = useState(null)
   const [tipoReporte, setTipoReporte] = useState('mensual')
   const [periodo, setPeriodo] = useState({
     inicio: format(startOfMonth(subMonths(new Date(), 5)), 'yyyy-MM-dd'),
     fin: format(endOfMonth(new Date()), 'yyyy-MM-dd')
   })
+  const ultimaConsulta = useRef(0)
 
   useEffect(() => {
-    loadData()
-  }, [])
+    if (periodo.inicio && periodo.fin && periodo.inicio <= periodo.fin) loadData()
+  }, [periodo.inicio, periodo.fin])
 
   const loadData = async () => {
+    // Descarta respuestas de períodos que ya quedaron atrás
+    const consulta = ++ultimaConsulta.current
     try {
-      const clientesRes = await api.get('/clientes')
-      const todosLosPagos = []
-      
-      for (const cliente of clientesRes.data) {
-        try {
-          const pagosCliente = await api.get(`/clientes/${cliente.id}/pagos`)
-          todosLosPagos.push(...pagosCliente.data.map(p => ({
-            ...p,
-            cliente_nombre: cliente.nombre_empresa,
-            cliente_plan: cliente.plan
-          })))
-        } catch (error) {
-          console.error(`Error cargando pagos del cliente ${cliente.id}:`, error)
-        }
-      }
-      
-      setClientes(clientesRes.data)
-      setPagos(todosLosPagos)
+      const datos = await cargarResumen(periodo)
+      if (consulta === ultimaConsulta.current) setResumen(datos)
     } catch (error) {
       console.error('Error al cargar datos:', error)
     } finally {
-      setLoading(false)
+      if (consulta === ultimaConsulta.current) setLoading(false)
     }
   }
 
-  const calcularIngresosPorMes = () => {
-    const meses = eachMonthOfInterval({
-      start: new Date(periodo.inicio),
-      end: new Date(periodo.fin)
-    })
-
-    return meses.map(mes => {
-      const ingresosMes = pagos
-        .filter(p => {
-          const fechaPago = new Date(p.fecha_pago)
-          return fechaPago.getMonth() === mes.getMonth() &&
-                 fechaPago.getFullYear() === mes.getFullYear() &&
-                 p.estado === 'Pagado'
-        })
-        .reduce((sum, p) => sum + p.monto, 0)
-
-      return {
-        mes: format(mes, 'MMM yyyy'),
-        ingresos: ingresosMes
-      }
-    })
-  }
-
   const calcularIngresosPorPlan = () => {
-    const planes = ['Basico', 'Premium', 'Empresarial']
-    
-    return planes.map(plan => {
-      const ingresosPlan = pagos
-        .filter(p => p.cliente_plan === plan && p.estado === 'Pagado')
-        .reduce((sum, p) => sum + p.monto, 0)
-
+    return PLANES.map(plan => {
+      const datos = resumen.ingresos_por_plan.find(p => p.plan === plan)
       return {
         plan,
-        ingresos: ingresosPlan,
-        clientes: clientes.filter(c => c.plan === plan).length
-      }
-    })
-  }
-
-  const calcularTopClientes = () => {
-    const clientesConIngresos = clientes.map(cliente => {
-      const ingresos = pagos
-        .filter(p => p.cliente_nombre === cliente.nombre_empresa && p.estado === 'Pagado')
-        .reduce((sum, p) => sum + p.monto, 0)
-
-      return {
-        ...cliente,
-        ingresos
+        ingresos: datos ? datos.ingresos : 0,
+        clientes: datos ? datos.clientes : 0
       }
     })
-
-    return clientesConIngresos
-      .sort((a, b) => b.ingresos - a.ingresos)
-      .slice(0, 10)
   }
 
   const calcularEstadisticasGenerales = () => {
-    const totalIngresos = pagos
-      .filter(p => p.estado === 'Pagado')
-      .reduce((sum, p) => sum + p.monto, 0)
-
-    const totalPendiente = pagos
-      .filter(p => p.estado === 'Pendiente' || p.estado === 'Atrasado')
-      .reduce((sum, p) => sum + p.monto, 0)
-
-    const clientesActivos = clientes.filter(c => c.estado === 'Activo').length
-    const clientesSuspendidos = clientes.filter(c => c.estado === 'Suspendido').length
-
-    const promedioIngresoPorCliente = clientesActivos > 0 ? totalIngresos / clientesActivos : 0
+    const { tasa_cobro: tasa, clientes } = resumen
+    const totalIngresos = resumen.ingresos_mensuales.reduce((sum, m) => sum + m.cobrado, 0)
 
     return {
       totalIngresos,
-      totalPendiente,
-      clientesActivos,
-      clientesSuspendidos,
-      promedioIngresoPorCliente,
-      totalClientes: clientes.length
+      totalPendiente: tasa.pendiente + tasa.atrasado,
+      clientesActivos: clientes.activos,
+      clientesSuspendidos: clientes.suspendidos,
+      promedioIngresoPorCliente: clientes.activos > 0 ? totalIngresos / clientes.activos : 0,
+      totalClientes: clientes.total
     }
   }
 
@@ -148,12 +82,7 @@ export default function Reportes() {
     }
   }
 
-  const ingresosPorMes = calcularIngresosPorMes()
-  const ingresosPorPlan = calcularIngresosPorPlan()
-  const topClientes = calcularTopClientes()
-  const stats = calcularEstadisticasGenerales()
-
-  if (loading) {
+  if (loading || !resumen) {
     return (
       <div className="flex items-center justify-center h-64">
         <div className="text-center">
@@ -164,6 +93,11 @@ export default function Reportes() {
     )
   }
 
+  const ingresosPorMes = serieMensual(resumen).map(m => ({ mes: m.mes, ingresos: m.cobrado }))
+  const ingresosPorPlan = calcularIngresosPorPlan()
+  const topClientes = resumen.top_clientes
+  const stats = calcularEstadisticasGenerales()
+
   return (
     <div className="space-y-6">
       {/* Header */}
@@ -172,13 +106,22 @@ export default function Reportes() {
           <h1 className="text-3xl font-bold text-gray-900">Reportes</h1>
           <p className="text-gray-600 mt-1">Análisis y estadísticas del negocio</p>
         </div>
-        <button
-          onClick={exportarReporte}
-          className="btn-primary flex items-center space-x-2"
-        >
-          <Download className="h-5 w-5" />
-          <span>Exportar Reporte</span>
-        </button>
+        <div className="flex items-center space-x-2">
+          <button
+            onClick={() => descargarExportacion('pagos', { formato: 'xlsx', desde: periodo.inicio, hasta: periodo.fin })}
+            className="btn-secondary flex items-center space-x-2"
+          >
+            <FileText className="h-5 w-5" />
+            <span>Pagos del Período (Excel)</span>
+          </button>
+          <button
+            onClick={exportarReporte}
+            className="btn-primary flex items-center space-x-2"
+          >
+            <Download className="h-5 w-5" />
+            <span>Exportar Reporte</span>
+          </button>
+        </div>
       </div>
 
       {/* Filtros */}
@@ -1,53 +1,40 @@
 import { useState, useEffect } from 'react'
 import { BarChart3, PieChart, TrendingUp, Download, RefreshCw, Activity } from 'lucide-react'
-import { format, startOfMonth, endOfMonth, subMonths, eachMonthOfInterval } from 'date-fns'
-import api from '../services/api'
+import { format, startOfMonth, endOfMonth, subMonths } from 'date-fns'
+import { cargarResumen, serieMensual } from '../services/reportes'
+import { suscribirEventos } from '../services/eventos'
 import html2canvas from 'html2canvas'
 import {
   LineChart, Line, BarChart, Bar, PieChart as RechartsPie, Pie, Cell,
   XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, Area, AreaChart
 } from 'recharts'
 
+const PLANES = ['Basico', 'Premium', 'Empresarial']
+
 export default function ReportesGraficos() {
   const [loading, setLoading] = useState(true)
   const [actualizando, setActualizando] = useState(false)
-  const [clientes, setClientes] = useState([])
-  const [pagos, setPagos] = useState([])
+  const [resumen, setResumen] = useState(null)
+  const [ultimaActualizacion, setUltimaActualizacion] = useState(new Date())
   const [tipoGrafico, setTipoGrafico] = useState('lineas')
-  const [periodo, setPeriodo] = useState({
+  const [periodo] = useState({
     inicio: format(startOfMonth(subMonths(new Date(), 5)), 'yyyy-MM-dd'),
     fin: format(endOfMonth(new Date()), 'yyyy-MM-dd')
   })
 
   useEffect(() => {
     loadData()
-    // Actualizar cada 30 segundos
-    const interval = setInterval(() => {
-      actualizarDatos()
-    }, 30000)
-    return () => clearInterval(interval)
+    // Actualizar cuando el servidor avisa de cambios en clientes o pagos
+    return suscribirEventos(
+      ['cliente_creado', 'cliente_actualizado', 'cliente_suspendido', 'pago_registrado'],
+      actualizarDatos
+    )
   }, [])
 
   const loadData = async () => {
     try {
-      const clientesRes = await api.get('/clientes')
-      const todosLosPagos = []
-      
-      for (const cliente of clientesRes.data) {
-        try {
-          const pagosCliente = await api.get(`/clientes/${cliente.id}/pagos`)
-          todosLosPagos.push(...pagosCliente.data.map(p => ({
-            ...p,
-            cliente_nombre: cliente.nombre_empresa,
-            cliente_plan: cliente.plan
-          })))
-        } catch (error) {
-          console.error(`Error cargando pagos del cliente ${cliente.id}:`, error)
-        }
-      }
-      
-      setClientes(clientesRes.data)
-      setPagos(todosLosPagos)
+      setResumen(await cargarResumen(periodo))
+      setUltimaActualizacion(new Date())
     } catch (error) {
       console.error('Error al cargar datos:', error)
     } finally {
@@ -63,67 +50,33 @@ export default function ReportesGraficos() {
 
   // Datos para gráfico de líneas - Ingresos mensuales
   const datosIngresosMensuales = () => {
-    const meses = eachMonthOfInterval({
-      start: new Date(periodo.inicio),
-      end: new Date(periodo.fin)
-    })
-
-    return meses.map(mes => {
-      const ingresosMes = pagos
-        .filter(p => {
-          const fechaPago = new Date(p.fecha_pago)
-          return fechaPago.getMonth() === mes.getMonth() &&
-                 fechaPago.getFullYear() === mes.getFullYear() &&
-                 p.estado === 'Pagado'
-        })
-        .reduce((sum, p) => sum + p.monto, 0)
-
-      const pendientesMes = pagos
-        .filter(p => {
-          const fechaPago = new Date(p.fecha_pago)
-          return fechaPago.getMonth() === mes.getMonth() &&
-                 fechaPago.getFullYear() === mes.getFullYear() &&
-                 p.estado === 'Pendiente'
-        })
-        .reduce((sum, p) => sum + p.monto, 0)
-
-      return {
-        mes: format(mes, 'MMM yyyy'),
-        ingresos: parseFloat(ingresosMes.toFixed(2)),
-        pendientes: parseFloat(pendientesMes.toFixed(2))
-      }
-    })
+    return serieMensual(resumen).map(m => ({
+      mes: m.mes,
+      ingresos: m.cobrado,
+      pendientes: m.pendiente
+    }))
   }
 
   // Datos para gráfico de barras - Por plan
   const datosIngresosPorPlan = () => {
-    const planes = ['Basico', 'Premium', 'Empresarial']
-    
-    return planes.map(plan => {
-      const ingresosPlan = pagos
-        .filter(p => p.cliente_plan === plan && p.estado === 'Pagado')
-        .reduce((sum, p) => sum + p.monto, 0)
-
-      const clientesPlan = clientes.filter(c => c.plan === plan).length
-
+    return PLANES.map(plan => {
+      const datos = resumen.ingresos_por_plan.find(p => p.plan === plan)
       return {
         plan,
-        ingresos: parseFloat(ingresosPlan.toFixed(2)),
-        clientes: clientesPlan
+        ingresos: datos ? datos.ingresos : 0,
+        clientes: datos ? datos.clientes : 0
       }
     })
   }
 
-  // Datos para gráfico circular - Estados de pago
+  // Datos para gráfico circular - Montos por estado de lo que vence en el período
   const datosEstadosPago = () => {
-    const estados = ['Pagado', 'Pendiente', 'Atrasado']
-    const colores = ['#10b981', '#f59e0b', '#ef4444']
-    
-    return estados.map((estado, index) => ({
-      name: estado,
-      value: pagos.filter(p => p.estado === estado).length,
-      color: colores[index]
-    }))
+    const { cobrado, pendiente, atrasado } = resumen.tasa_cobro
+    return [
+      { name: 'Pagado', value: cobrado, color: '#10b981' },
+      { name: 'Pendiente', value: pendiente, color: '#f59e0b' },
+      { name: 'Atrasado', value: atrasado, color: '#ef4444' }
+    ]
   }
 
   // Datos para área - Tendencia acumulada
@@ -164,28 +117,18 @@ export default function ReportesGraficos() {
   }
 
   const calcularEstadisticas = () => {
-    const totalIngresos = pagos
-      .filter(p => p.estado === 'Pagado')
-      .reduce((sum, p) => sum + p.monto, 0)
-
-    const totalPendiente = pagos
-      .filter(p => p.estado === 'Pendiente' || p.estado === 'Atrasado')
-      .reduce((sum, p) => sum + p.monto, 0)
-
-    const clientesActivos = clientes.filter(c => c.estado === 'Activo').length
-    const promedioMensual = datosIngresosMensuales().reduce((sum, m) => sum + m.ingresos, 0) / datosIngresosMensuales().length
+    const meses = datosIngresosMensuales()
+    const totalIngresos = meses.reduce((sum, m) => sum + m.ingresos, 0)
 
     return {
       totalIngresos,
-      totalPendiente,
-      clientesActivos,
-      promedioMensual
+      totalPendiente: resumen.tasa_cobro.pendiente + resumen.tasa_cobro.atrasado,
+      clientesActivos: resumen.clientes.activos,
+      promedioMensual: meses.length > 0 ? totalIngresos / meses.length : 0
     }
   }
 
-  const stats = calcularEstadisticas()
-
-  if (loading) {
+  if (loading || !resumen) {
     return (
       <div className="flex items-center justify-center h-64">
         <div className="text-center">
@@ -196,6 +139,8 @@ export default function ReportesGraficos() {
     )
   }
 
+  const stats = calcularEstadisticas()
+
   return (
     <div className="space-y-6">
       {/* Header */}
@@ -236,10 +181,10 @@ export default function ReportesGraficos() {
             </div>
             <div>
               <p className="font-semibold text-gray-900">Datos en Tiempo Real</p>
-              <p className="text-sm text-gray-600">Actualización automática cada 30 segundos</p>
+              <p className="text-sm text-gray-600">Se actualiza cuando se registran clientes o pagos</p>
             </div>
           </div>
-          <p className="text-sm text-gray-500">Última actualización: {format(new Date(), 'HH:mm:ss')}</p>
+          <p className="text-sm text-gray-500">Última actualización: {format(ultimaActualizacion, 'HH:mm:ss')}</p>
         </div>
       </div>
 
@@ -369,7 +314,7 @@ export default function ReportesGraficos() {
         {tipoGrafico === 'circular' && (
           <div className="card">
             <h2 className="text-xl font-semibold text-gray-900 mb-6">
-              🥧 Distribución de Estados de Pago
+              🥧 Montos por Estado de Pago
             </h2>
             <ResponsiveContainer width="100%" height={400}>
               <RechartsPie>
@@ -27,4 +27,13 @@ api.interceptors.response.use(
   }
 )
 
+/**
+ * Token de corta duración para el `?token=` de las URLs que no pueden llevar
+ * cabecera; `uso` es 'exportacion' o 'eventos'
+ */
+export async function obtenerTokenTemporal(uso) {
+  const response = await api.post('/auth/token-temporal', null, { params: { uso } })
+  return response.data.token
+}
+
 export default api
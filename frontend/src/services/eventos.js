@@ -0,0 +1,68 @@
+/**
+ * Feed de cambios del servidor (Server-Sent Events)
+ * EventSource reconecta solo y reanuda desde el último evento (Last-Event-ID).
+ * La conexión se abre con un token temporal de eventos: si vence antes de un
+ * reintento, el servidor lo rechaza y se abre otra con un token nuevo.
+ */
+
+import api, { obtenerTokenTemporal } from './api'
+
+const ESPERA_RECONEXION = 3000
+
+/**
+ * Llama a `onCambio` cuando llega alguno de los `tipos` de evento.
+ * Las ráfagas se agrupan en una sola llamada. Devuelve la función para cerrar el stream.
+ */
+export function suscribirEventos(tipos, onCambio, espera = 500) {
+  if (!localStorage.getItem('token') || typeof EventSource === 'undefined') return () => {}
+
+  let fuente = null
+  let cerrado = false
+  let ultimoId = null
+  let temporizador = null
+  let reconexion = null
+
+  const manejar = (evento) => {
+    if (evento.lastEventId) ultimoId = evento.lastEventId
+    clearTimeout(temporizador)
+    temporizador = setTimeout(onCambio, espera)
+  }
+
+  const reconectar = () => {
+    if (!cerrado) reconexion = setTimeout(conectar, ESPERA_RECONEXION)
+  }
+
+  const conectar = async () => {
+    let token
+    try {
+      token = await obtenerTokenTemporal('eventos')
+    } catch (error) {
+      console.error('Error al autorizar el feed de eventos:', error)
+      reconectar()
+      return
+    }
+    if (cerrado) return
+
+    const params = new URLSearchParams({ token })
+    if (ultimoId) params.set('ultimo_id', ultimoId)
+    fuente = new EventSource(`${api.defaults.baseURL}/events?${params}`)
+
+    // 'reinicio': el servidor no pudo reanudar y hay que recargar todo
+    for (const tipo of [...tipos, 'reinicio']) {
+      fuente.addEventListener(tipo, manejar)
+    }
+    // CLOSED: el navegador dejó de reintentar (p. ej. 401 por token vencido)
+    fuente.onerror = () => {
+      if (fuente.readyState === EventSource.CLOSED) reconectar()
+    }
+  }
+
+  conectar()
+
+  return () => {
+    cerrado = true
+    clearTimeout(temporizador)
+    clearTimeout(reconexion)
+    if (fuente) fuente.close()
+  }
+}
@@ -0,0 +1,27 @@
+/**
+ * Exportaciones CSV / XLSX generadas por el servidor
+ * El navegador descarga el archivo a medida que llega, sin cargar los pagos en
+ * memoria. Un enlace no envía cabeceras: va en `?token=` un token temporal de
+ * exportación, nunca el de sesión (la URL queda en el historial y los logs).
+ */
+
+import api, { obtenerTokenTemporal } from './api'
+
+/** Descarga `/export/{recurso}` (pagos o clientes); los filtros vacíos se omiten */
+export async function descargarExportacion(recurso, filtros = {}) {
+  const params = new URLSearchParams()
+  for (const [clave, valor] of Object.entries(filtros)) {
+    if (valor !== undefined && valor !== null && valor !== '') params.set(clave, valor)
+  }
+
+  try {
+    params.set('token', await obtenerTokenTemporal('exportacion'))
+  } catch (error) {
+    console.error('Error al autorizar la exportación:', error)
+    return
+  }
+
+  const link = document.createElement('a')
+  link.href = `${api.defaults.baseURL}/export/${recurso}?${params}`
+  link.click()
+}
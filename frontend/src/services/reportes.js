@@ -0,0 +1,32 @@
+/**
+ * Reportes agregados por el servidor
+ * Una sola solicitud trae todo lo que muestran las páginas de reportes, sin
+ * descargar los pagos de cada cliente.
+ */
+
+import { format, eachMonthOfInterval, parseISO } from 'date-fns'
+import api from './api'
+
+/** `/reportes/resumen` del período { inicio, fin } (YYYY-MM-DD) */
+export async function cargarResumen(periodo) {
+  const response = await api.get('/reportes/resumen', {
+    params: { desde: periodo.inicio, hasta: periodo.fin }
+  })
+  return response.data
+}
+
+/** Un punto por mes del período; los meses sin pagos van en cero */
+export function serieMensual(resumen) {
+  const porMes = Object.fromEntries(resumen.ingresos_mensuales.map(m => [m.mes, m]))
+  const meses = eachMonthOfInterval({ start: parseISO(resumen.desde), end: parseISO(resumen.hasta) })
+
+  return meses.map(mes => {
+    const datos = porMes[format(mes, 'yyyy-MM')]
+    return {
+      mes: format(mes, 'MMM yyyy'),
+      cobrado: datos ? datos.cobrado : 0,
+      pendiente: datos ? datos.pendiente : 0,
+      atrasado: datos ? datos.atrasado : 0
+    }
+  })
+}
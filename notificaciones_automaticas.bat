@@ -12,6 +12,7 @@ echo ========================================
 echo.
 
 :: Llamar al endpoint de notificaciones
+:: Responde total_clientes / encolados / duplicados: el servidor envia la cola en segundo plano
 curl -X POST http://localhost:8000/api/notificaciones/enviar-automaticas
 
 echo.